@@ -5,11 +5,12 @@ from typing import Annotated
 from passlib.context import CryptContext
 from fastapi.security import OAuth2PasswordRequestForm, OAuth2PasswordBearer
 from jose import jwt, JWTError
-from db.connection import db_dependency
+from db.connection import async_db_dependency
 from utils.token_verify import user_dependency
 from models import userModels
 from models.userModels import Users, OTP, Wallet
-from sqlalchemy import or_
+from sqlalchemy import or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
 import json
 from schemas.schemas import CreateUserRequest, Token, FromData
 from schemas.returnSchemas import ReturnUser
@@ -21,6 +22,7 @@ from dotenv import load_dotenv
 import os
 import random
 import base64
+import asyncio
 
 # Load environment variables from .env file
 load_dotenv()
@@ -37,6 +39,20 @@ AFRITON_FRONT_PASSWORD = os.getenv("AFRITON_FRONT_PASSWORD")
 bcrypt_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_bearer = OAuth2PasswordBearer(tokenUrl="auth/token")
 
+# bcrypt is deliberately slow, run it off the event loop
+async def hash_password(password: str) -> str:
+    return await asyncio.to_thread(bcrypt_context.hash, password)
+
+async def verify_password(password: str, password_hash: str) -> bool:
+    return await asyncio.to_thread(bcrypt_context.verify, password, password_hash)
+
+async def generate_account_id(db: AsyncSession) -> str:
+    """Random unused 10-digit account ID"""
+    while True:
+        account_id = str(random.randint(1000000000, 9999999999))
+        if not await db.scalar(select(Users.id).where(Users.account_id == account_id).limit(1)):
+            return account_id
+
 # ------------------------================================
 #                                   for frontend user 
 #                                                         ===========================--------------------------------
@@ -82,7 +98,7 @@ user_Front_dependency = Annotated[dict, Depends(get_front_current_user)]
 
 # handel register User
 @router.post("/register")
-async def register_user(userFront: user_Front_dependency, db: db_dependency, create_user_request: CreateUserRequest):
+async def register_user(userFront: user_Front_dependency, db: async_db_dependency, create_user_request: CreateUserRequest):
     # if isinstance(userFront, HTTPException):
     #     raise userFront
 
@@ -91,7 +107,7 @@ async def register_user(userFront: user_Front_dependency, db: db_dependency, cre
 
     try:
         # Check if email exists
-        existing_user = db.query(Users).filter(Users.email == create_user_request.email).first()
+        existing_user = await db.scalar(select(Users).where(Users.email == create_user_request.email).limit(1))
         
         if existing_user:
             if existing_user.acc_status:
@@ -104,18 +120,15 @@ async def register_user(userFront: user_Front_dependency, db: db_dependency, cre
                 existing_user.gender = create_user_request.gender
                 existing_user.avatar = create_user_request.avatar
                 existing_user.phone = create_user_request.phone
-                existing_user.password_hash = bcrypt_context.hash(create_user_request.password)
+                existing_user.password_hash = await hash_password(create_user_request.password)
                 existing_user.acc_status = True
                 
-                db.commit()
-                db.refresh(existing_user)
+                await db.commit()
+                await db.refresh(existing_user)
                 return {"message": "Account updated successfully!", "user": create_user_request}
         
         # Create new user if email doesn't exist
-        while True:
-            account_id = str(random.randint(1000000000, 9999999999))
-            if not db.query(Users).filter(Users.account_id == account_id).first():
-                break
+        account_id = await generate_account_id(db)
 
         new_user = Users(
             account_id=account_id,
@@ -125,25 +138,25 @@ async def register_user(userFront: user_Front_dependency, db: db_dependency, cre
             gender=create_user_request.gender,
             avatar=create_user_request.avatar,
             phone=create_user_request.phone,
-            password_hash=bcrypt_context.hash(create_user_request.password),
+            password_hash=await hash_password(create_user_request.password),
             acc_status=True
         )
 
         db.add(new_user)
-        db.commit()
-        db.refresh(new_user)
+        await db.commit()
+        await db.refresh(new_user)
         return {"message": "User registered successfully!", "user": create_user_request}
 
     except HTTPException as http_ex:
         raise http_ex
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=str(e))
 
 # ------Login user and create token
 @router.post("/login")
 async def login_for_access_token(
-    userFront: user_Front_dependency, form_data: FromData, db: db_dependency
+    userFront: user_Front_dependency, form_data: FromData, db: async_db_dependency
 ):
     # if isinstance(userFront, HTTPException):
     #     raise userFront
@@ -153,7 +166,7 @@ async def login_for_access_token(
     #         status_code=403, detail="Not Allowed To This Action, only Afriton apps allowed!"
     #     )
 
-    user = authenticate_user(form_data.username, form_data.password, db)
+    user = await authenticate_user(form_data.username, form_data.password, db)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -174,20 +187,20 @@ async def login_for_access_token(
     }
 
 
-def authenticate_user(username: str, password: str, db):
-    user = (
-        db.query(userModels.Users)
-        .filter(
+async def authenticate_user(username: str, password: str, db: AsyncSession):
+    user = await db.scalar(
+        select(userModels.Users)
+        .where(
             or_(
                 userModels.Users.email == username,
                 # userModels.Users.N_id == username,
             )
         )
-        .first()
+        .limit(1)
     )
     if not user:
         return False
-    if not bcrypt_context.verify(password, user.password_hash):
+    if not await verify_password(password, user.password_hash):
         return False
     return user
 
@@ -225,7 +238,7 @@ async def get_current_user(token: Annotated[str, Depends(oauth2_bearer)]):
 async def sign_up_with_google(
     userFront: user_Front_dependency,
     create_user_request: dict,
-    db: db_dependency,
+    db: async_db_dependency,
 ):
     # Check if userFront is an HTTPException
     # if isinstance(userFront, HTTPException):
@@ -236,7 +249,7 @@ async def sign_up_with_google(
     #     raise HTTPException(status_code=403, detail="Not Allowed To This Action; only Afriton apps are allowed!")
 
     # Check if email exists
-    existing_user = db.query(Users).filter(Users.email == create_user_request['email']).first()
+    existing_user = await db.scalar(select(Users).where(Users.email == create_user_request['email']).limit(1))
 
     if existing_user:
         # Check if the account is verified
@@ -263,10 +276,7 @@ async def sign_up_with_google(
     # If the email doesn't exist, create a new user
     try:
         # Generate unique 10-digit account ID
-        while True:
-            account_id = str(random.randint(1000000000, 9999999999))
-            if not db.query(Users).filter(Users.account_id == account_id).first():
-                break
+        account_id = await generate_account_id(db)
 
         # Create the user model
         new_user = Users(
@@ -277,13 +287,13 @@ async def sign_up_with_google(
             gender=create_user_request.get('gender', ''),
             avatar=create_user_request.get('avatar', ''),
             acc_status=True,
-            password_hash=bcrypt_context.hash(create_user_request.get('email', '')),
+            password_hash=await hash_password(create_user_request.get('email', '')),
         )
 
         # Add to the database and commit
         db.add(new_user)
-        db.commit()
-        db.refresh(new_user)
+        await db.commit()
+        await db.refresh(new_user)
 
         # Return the token of the created user
         token = create_access_token(
@@ -343,7 +353,7 @@ async def sign_up_with_google(
         
         # Send welcome email
         msg = custom_email(new_user.fname, heading, body)
-        if send_new_email(new_user.email, sub, msg):
+        if await asyncio.to_thread(send_new_email, new_user.email, sub, msg):
             return {
                 "access_token": token, 
                 "token_type": "bearer", 
@@ -358,7 +368,7 @@ async def sign_up_with_google(
 async def create_token_for_google_signup(
     userFront: user_Front_dependency,
     data: dict,
-    db: db_dependency,
+    db: async_db_dependency,
 ):
     """
     Endpoint for Google OAuth token verification and user login/signup
@@ -383,25 +393,22 @@ async def create_token_for_google_signup(
             )
 
         # Check if user exists
-        existing_user = db.query(Users).filter(Users.email == email).first()
+        existing_user = await db.scalar(select(Users).where(Users.email == email).limit(1))
 
         if not existing_user:
             # If user doesn't exist, create new user with Google auth
-            while True:
-                account_id = str(random.randint(1000000000, 9999999999))
-                if not db.query(Users).filter(Users.account_id == account_id).first():
-                    break
+            account_id = await generate_account_id(db)
 
             new_user = Users(
                 account_id=account_id,
                 fname=email.split('@')[0],  # Use email prefix as fname
                 email=email,
                 acc_status=True,  # Auto verify Google users
-                password_hash=bcrypt_context.hash(email),  # Use email as password for Google users
+                password_hash=await hash_password(email),  # Use email as password for Google users
             )
             db.add(new_user)
-            db.commit()
-            db.refresh(new_user)
+            await db.commit()
+            await db.refresh(new_user)
             existing_user = new_user
 
         # Generate token
@@ -432,7 +439,7 @@ async def create_token_for_google_signup(
 @router.post("/reset-password")
 async def reset_password(
     userFront: user_Front_dependency,
-    db: db_dependency,
+    db: async_db_dependency,
     email: str,
     new_password: str
 ):
@@ -444,25 +451,25 @@ async def reset_password(
 
     try:
         # Find user by email
-        user = db.query(Users).filter(Users.email == email).first()
+        user = await db.scalar(select(Users).where(Users.email == email).limit(1))
         if not user:
             raise HTTPException(status_code=404, detail="User not found")
 
         # Update password - no need to check verification code since we already verified
-        user.password_hash = bcrypt_context.hash(new_password)
-        db.commit()
+        user.password_hash = await hash_password(new_password)
+        await db.commit()
 
         return {"message": "Password reset successfully"}
     except HTTPException as http_ex:
         raise http_ex
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/user-profile")
 async def get_user_profile(
     user: user_dependency,
-    db: db_dependency
+    db: async_db_dependency
 ):
     """Get user profile information"""
     if isinstance(user, HTTPException):
@@ -470,14 +477,14 @@ async def get_user_profile(
 
     try:
         # Get user details
-        user_data = db.query(Users).filter(Users.id == user['user_id']).first()
+        user_data = await db.scalar(select(Users).where(Users.id == int(user['user_id'])).limit(1))
         if not user_data:
             raise HTTPException(status_code=404, detail="User not found")
 
         # Get user's wallets
-        wallets = db.query(Wallet).filter(
+        wallets = (await db.scalars(select(Wallet).where(
             Wallet.account_id == user_data.account_id
-        ).all()
+        ))).all()
 
         # Format wallet data
         wallet_details = [{
@@ -513,7 +520,7 @@ async def get_user_profile(
 @router.post("/update-profile")
 async def update_profile(
     user: user_dependency,
-    db: db_dependency,
+    db: async_db_dependency,
     fname: str = None,
     mname: str = None,
     lname: str = None,
@@ -525,7 +532,7 @@ async def update_profile(
 
     try:
         # Get user details
-        user_data = db.query(Users).filter(Users.id == user['user_id']).first()
+        user_data = await db.scalar(select(Users).where(Users.id == int(user['user_id'])).limit(1))
         if not user_data:
             raise HTTPException(status_code=404, detail="User not found")
 
@@ -539,8 +546,8 @@ async def update_profile(
         if phone and phone.strip():
             user_data.phone = phone
 
-        db.commit()
-        db.refresh(user_data)  # Refresh the instance
+        await db.commit()
+        await db.refresh(user_data)  # Refresh the instance
 
         return {
             "message": "Profile updated successfully",
@@ -552,14 +559,14 @@ async def update_profile(
             }
         }
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         print(f"Error updating profile: {str(e)}")  # Add logging
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/update-avatar")
 async def update_avatar(
     user: user_dependency,
-    db: db_dependency,
+    db: async_db_dependency,
     avatar: UploadFile = File(...)
 ):
     """Update user's avatar"""
@@ -568,7 +575,7 @@ async def update_avatar(
 
     try:
         # Get user details
-        user_data = db.query(Users).filter(Users.id == user['user_id']).first()
+        user_data = await db.scalar(select(Users).where(Users.id == int(user['user_id'])).limit(1))
         if not user_data:
             raise HTTPException(status_code=404, detail="User not found")
 
@@ -581,11 +588,11 @@ async def update_avatar(
         base64_image = base64.b64encode(contents).decode()
         user_data.avatar = f"data:{avatar.content_type};base64,{base64_image}"
 
-        db.commit()
+        await db.commit()
 
         return {"message": "Avatar updated successfully"}
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=str(e))
 
 
@@ -1,169 +1,84 @@
-from fastapi import APIRouter, HTTPException, Depends
-from typing import Dict, Any, List
+from fastapi import APIRouter, HTTPException, Depends, Header, Response
+from typing import Dict, Any, List, Optional
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from models.userModels import CurrencyCategory, CurrencyRate
 from db.connection import db_dependency
 from db.VerifyToken import user_dependency
+from functions.rate_cache import rate_cache, cross_rate_matrix
 from datetime import datetime
+import json
+from decimal import Decimal
+from functions.money import to_decimal, round_afriton, round_money
+from pydantic import BaseModel
 
 router = APIRouter(prefix="/rate", tags=["rate"])
 
-# Function to initialize default rates
-async def initialize_default_rates(db: Session):
-    try:
-        # Check if rates already exist
-        if db.query(CurrencyRate).count() > 0:
-            return
-        
-        # Create categories
-        categories = {
-            "african_currencies": "African Currencies",
-            "european_currencies": "European Currencies",
-            "other_global_currencies": "Other Global Currencies",
-            "afriton": "Afriton Conversion Rates"
-        }
-        
-        category_ids = {}
-        for cat_name, description in categories.items():
-            cat = CurrencyCategory(name=cat_name, description=description)
-            db.add(cat)
-            db.commit()
-            db.refresh(cat)
-            category_ids[cat_name] = cat.id
+# Serialized /conversion-rates body, rebuilt only when the rate table version changes
+_conversion_rates_payload = {"version": None, "body": None}
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Check an If-None-Match header value against our ETag"""
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or any(tag.replace("W/", "", 1) == etag for tag in candidates)
 
-        # Add default rates
-        default_rates = [
-            # African Currencies
-            ("rwandan_franc", "RWF", 12000, "african_currencies"),
-            ("nigerian_naira", "NGN", 7500, "african_currencies"),
-            ("south_african_rand", "ZAR", 180, "african_currencies"),
-            ("ghanaian_cedi", "GHS", 110, "african_currencies"),
-            ("kenyan_shilling", "KES", 1480, "african_currencies"),
-            ("ugandan_shilling", "UGX", 37000, "african_currencies"),
-            ("egyptian_pound", "EGP", 310, "african_currencies"),
-            ("moroccan_dirham", "MAD", 100, "african_currencies"),
-            ("tanzanian_shilling", "TZS", 25000, "african_currencies"),
-            ("zambian_kwacha", "ZMW", 220, "african_currencies"),
-            ("ethiopian_birr", "ETB", 550, "african_currencies"),
-            ("angolan_kwanza", "AOA", 8330, "african_currencies"),
-            ("congolese_franc", "CDF", 25000, "african_currencies"),
-            ("malawian_kwacha", "MWK", 16500, "african_currencies"),
-            ("mozambican_metical", "MZN", 630, "african_currencies"),
-            ("namibian_dollar", "NAD", 180, "african_currencies"),
-            ("seychellois_rupee", "SCR", 130, "african_currencies"),
-            ("somali_shilling", "SOS", 57000, "african_currencies"),
-            ("sudanese_pound", "SDG", 6000, "african_currencies"),
-            ("tunisian_dinar", "TND", 31, "african_currencies"),
-            
-            # European Currencies
-            ("euro", "EUR", 9.3, "european_currencies"),
-            ("british_pound", "GBP", 7.7, "european_currencies"),
-            ("swiss_franc", "CHF", 8.8, "european_currencies"),
-            ("norwegian_krone", "NOK", 108, "european_currencies"),
-            ("swedish_krona", "SEK", 105, "european_currencies"),
-            ("danish_krone", "DKK", 69.6, "european_currencies"),
-            ("polish_zloty", "PLN", 42, "european_currencies"),
-            ("hungarian_forint", "HUF", 3610, "european_currencies"),
-            ("czech_koruna", "CZK", 230, "european_currencies"),
-            ("romanian_leu", "RON", 46, "european_currencies"),
-            ("bulgarian_lev", "BGN", 18.2, "european_currencies"),
-            ("croatian_kuna", "HRK", 70, "european_currencies"),
-            
-            # Other Global Currencies
-            ("us_dollar", "USD", 10, "other_global_currencies"),  # Base rate: 1 Afriton = 10 USD
-            ("canadian_dollar", "CAD", 13.6, "other_global_currencies"),
-            ("australian_dollar", "AUD", 15.3, "other_global_currencies"),
-            ("chinese_yuan", "CNY", 72, "other_global_currencies"),
-            ("japanese_yen", "JPY", 1500, "other_global_currencies"),
-            ("indian_rupee", "INR", 830, "other_global_currencies"),
-            ("brazilian_real", "BRL", 52, "other_global_currencies"),
-            ("mexican_peso", "MXN", 170, "other_global_currencies"),
-            ("turkish_lira", "TRY", 280, "other_global_currencies"),
-            ("pakistani_rupee", "PKR", 3000, "other_global_currencies"),
-            ("bangladeshi_taka", "BDT", 1100, "other_global_currencies"),
-            ("russian_ruble", "RUB", 920, "other_global_currencies"),
-            ("indonesian_rupiah", "IDR", 156000, "other_global_currencies"),
-            ("malaysian_ringgit", "MYR", 47, "other_global_currencies"),
-            ("singapore_dollar", "SGD", 13.5, "other_global_currencies"),
-            ("thai_baht", "THB", 360, "other_global_currencies"),
-            ("south_korean_won", "KRW", 13000, "other_global_currencies"),
-            ("new_zealand_dollar", "NZD", 16.5, "other_global_currencies"),
-            ("hong_kong_dollar", "HKD", 78, "other_global_currencies"),
-            ("taiwanese_dollar", "TWD", 320, "other_global_currencies"),
-            
-            # Afriton conversions with unique codes
-            ("afriton_to_dollar", "AFT_USD", 10, "afriton"),
-            ("afriton_to_rwandan_franc", "AFT_RWF", 12000, "afriton"),
-            ("afriton_to_nigerian_naira", "AFT_NGN", 7500, "afriton"),
-            ("afriton_to_south_african_rand", "AFT_ZAR", 180, "afriton"),
-            ("afriton_to_ghanaian_cedi", "AFT_GHS", 110, "afriton"),
-            ("afriton_to_kenyan_shilling", "AFT_KES", 1480, "afriton"),
-            ("afriton_to_ugandan_shilling", "AFT_UGX", 37000, "afriton"),
-            ("afriton_to_euro", "AFT_EUR", 9.3, "afriton"),
-        ]
+@router.get("/conversion-rates")
+async def get_conversion_rates(
+    db: db_dependency,
+    if_none_match: Optional[str] = Header(None)
+) -> Response:
+    snapshot = rate_cache.snapshot(db)
 
-        for name, code, rate_afriton, category in default_rates:
-            rate = CurrencyRate(
-                category_id=category_ids[category],
-                currency_name=name,
-                currency_code=code,
-                rate_to_afriton=rate_afriton
+    etag = f'"{snapshot.version}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if _etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+
+    if _conversion_rates_payload["version"] != snapshot.version:
+        rates = {name: {} for name in snapshot.categories}
+        for curr in snapshot.rates:
+            rates[curr["category"]][curr["currency_name"]] = (
+                f"1 afriton = {curr['rate_to_afriton'].normalize():f} {curr['currency_code']}"
             )
-            db.add(rate)
-            
-        db.commit()
-        
-    except Exception as e:
-        db.rollback()
-        print(f"Error initializing rates: {str(e)}")
-        raise HTTPException(
-            status_code=500,
-            detail=f"Failed to initialize currency rates: {str(e)}"
-        )
+        _conversion_rates_payload["body"] = json.dumps(rates).encode("utf-8")
+        _conversion_rates_payload["version"] = snapshot.version
 
-@router.get("/conversion-rates")
-async def get_conversion_rates(db: db_dependency) -> Dict[str, Any]:
-    await initialize_default_rates(db)
-    
-    categories = db.query(CurrencyCategory).all()
-    rates = {}
-    
-    for category in categories:
-        currencies = db.query(CurrencyRate).filter(
-            CurrencyRate.category_id == category.id,
-            CurrencyRate.is_active == True
-        ).all()
-        
-        rates[category.name] = {
-            curr.currency_name: f"1 afriton = {curr.rate_to_afriton} {curr.currency_code}"
-            for curr in currencies
-        }
-    
-    return rates
+    return Response(
+        content=_conversion_rates_payload["body"],
+        media_type="application/json",
+        headers=headers
+    )
 
-def convert_to_afriton(amount: float, currency_code: str, db: Session) -> float:
-    """Convert any currency to Afriton"""
-    rate = db.query(CurrencyRate).filter(
-        CurrencyRate.currency_code == currency_code,
-        CurrencyRate.is_active == True
-    ).first()
-    
-    if not rate:
+def _to_afriton(amount: Decimal, rate: Optional[dict]) -> Decimal:
+    # A zero rate can't be divided by, so that currency can't be converted from
+    if not rate or not rate["rate_to_afriton"]:
         raise HTTPException(status_code=400, detail="Unsupported currency")
     
-    return amount / rate.rate_to_afriton
+    return round_afriton(to_decimal(amount) / rate["rate_to_afriton"])
 
-def convert_from_afriton(amount: float, currency_code: str, db: Session) -> float:
-    """Convert Afriton to any currency"""
-    rate = db.query(CurrencyRate).filter(
-        CurrencyRate.currency_code == currency_code,
-        CurrencyRate.is_active == True
-    ).first()
-    
+def _from_afriton(amount: Decimal, currency_code: str, rate: Optional[dict]) -> Decimal:
     if not rate:
         raise HTTPException(status_code=400, detail="Unsupported currency")
     
-    return amount * rate.rate_to_afriton
+    return round_money(to_decimal(amount) * rate["rate_to_afriton"], currency_code)
+
+def convert_to_afriton(amount: Decimal, currency_code: str, db: Session) -> Decimal:
+    """Convert any currency to Afriton, rounded to Afriton precision"""
+    return _to_afriton(amount, rate_cache.get_rate(currency_code, db))
+
+def convert_from_afriton(amount: Decimal, currency_code: str, db: Session) -> Decimal:
+    """Convert Afriton to any currency, rounded to that currency's precision"""
+    return _from_afriton(amount, currency_code, rate_cache.get_rate(currency_code, db))
+
+async def convert_to_afriton_async(amount: Decimal, currency_code: str, db: AsyncSession) -> Decimal:
+    """convert_to_afriton() for handlers using the async session"""
+    return _to_afriton(amount, await rate_cache.get_rate_async(currency_code, db))
+
+async def convert_from_afriton_async(amount: Decimal, currency_code: str, db: AsyncSession) -> Decimal:
+    """convert_from_afriton() for handlers using the async session"""
+    return _from_afriton(amount, currency_code, await rate_cache.get_rate_async(currency_code, db))
 
 @router.post("/add-rate")
 async def add_currency_rate(
@@ -172,7 +87,7 @@ async def add_currency_rate(
     category_name: str,
     currency_name: str,
     currency_code: str,
-    rate_to_afriton: float
+    rate_to_afriton: Decimal
 ):
     if not user.get("is_admin"):
         raise HTTPException(status_code=403, detail="Admin access required")
@@ -189,13 +104,14 @@ async def add_currency_rate(
     )
     db.add(new_rate)
     db.commit()
+    rate_cache.invalidate()
     
     return {"message": "Currency rate added successfully"}
 
 @router.put("/update-rate/{currency_code}")
 async def update_currency_rate(
     currency_code: str,
-    rate_to_afriton: float,
+    rate_to_afriton: Decimal,
     user: user_dependency,
     db: db_dependency
 ):
@@ -210,6 +126,7 @@ async def update_currency_rate(
     rate.last_updated = datetime.utcnow()
     
     db.commit()
+    rate_cache.invalidate()
     return {"message": "Currency rate updated successfully"}
 
 @router.get("/convert/{amount}/{from_currency}/to/{to_currency}",
@@ -281,23 +198,127 @@ async def update_currency_rate(
     ```
     """)
 async def convert_currency(
-    amount: float,
+    amount: Decimal,
     from_currency: str,
     to_currency: str,
     db: db_dependency
 ):
     if from_currency == "afriton":
         converted = convert_from_afriton(amount, to_currency, db)
+    elif to_currency == "afriton":
+        converted = convert_to_afriton(amount, from_currency, db)
     else:
-        afriton_amount = convert_to_afriton(amount, from_currency, db)
-        if to_currency == "afriton":
-            converted = afriton_amount
-        else:
-            converted = convert_from_afriton(afriton_amount, to_currency, db)
+        # Pivot through Afriton without rounding the intermediate amount
+        from_rate = rate_cache.get_rate(from_currency, db)
+        to_rate = rate_cache.get_rate(to_currency, db)
+        if not from_rate or not to_rate or not from_rate["rate_to_afriton"]:
+            raise HTTPException(status_code=400, detail="Unsupported currency")
+        converted = round_money(
+            amount / from_rate["rate_to_afriton"] * to_rate["rate_to_afriton"],
+            to_currency
+        )
     
     return {
         "original_amount": amount,
         "original_currency": from_currency,
         "converted_amount": converted,
         "target_currency": to_currency
-    }
\ No newline at end of file
+    }
+
+
+# Largest number of conversions accepted in one batch request
+MAX_BATCH_CONVERSIONS = 500
+
+class ConversionItem(BaseModel):
+    amount: Decimal
+    from_currency: str
+    to_currency: str
+
+@router.post("/convert/batch",
+    description="""
+    Convert many amounts in one request, using Afriton as intermediary.
+    Results are returned in the same order as the request.
+
+    ### Request Body:
+    ```json
+    [
+        {"amount": 1000, "from_currency": "RWF", "to_currency": "afriton"},
+        {"amount": 5, "from_currency": "afriton", "to_currency": "KES"},
+        {"amount": 100, "from_currency": "EUR", "to_currency": "NGN"}
+    ]
+    ```
+    """)
+async def convert_currency_batch(
+    conversions: List[ConversionItem],
+    db: db_dependency
+):
+    if len(conversions) > MAX_BATCH_CONVERSIONS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {MAX_BATCH_CONVERSIONS} conversions are allowed per request"
+        )
+
+    # Resolve every currency once against a single rate snapshot
+    snapshot = rate_cache.snapshot(db)
+    codes = {item.from_currency for item in conversions} | {item.to_currency for item in conversions}
+    codes.discard("afriton")
+    unsupported = {code for code in codes if code not in snapshot.by_code}
+    # Reject what convert_currency rejects: afriton to afriton, and amounts in a
+    # currency whose rate is zero, which can't be divided by
+    for item in conversions:
+        if item.from_currency == item.to_currency == "afriton":
+            unsupported.add("afriton")
+        rate = snapshot.by_code.get(item.from_currency)
+        if rate and not rate["rate_to_afriton"]:
+            unsupported.add(item.from_currency)
+    if unsupported:
+        raise HTTPException(status_code=400, detail=f"Unsupported currency: {', '.join(sorted(unsupported))}")
+    rates = {code: snapshot.by_code[code]["rate_to_afriton"] for code in codes}
+    rates["afriton"] = Decimal(1)
+
+    # Same math and rounding as convert_currency
+    return [{
+        "original_amount": item.amount,
+        "original_currency": item.from_currency,
+        "converted_amount": round_money(
+            item.amount / rates[item.from_currency] * rates[item.to_currency],
+            item.to_currency
+        ),
+        "target_currency": item.to_currency
+    } for item in conversions]
+
+@router.get("/cross-rates",
+    description="""
+    Get the full cross-rate matrix between all active currencies (and afriton).
+
+    `rates[i][j]` is the amount of `currencies[j]` that one unit of `currencies[i]` buys.
+    Pass `base` to get only that currency's row.
+
+    ### Examples:
+    ```
+    GET /rate/cross-rates
+    GET /rate/cross-rates?base=EUR
+    ```
+    """)
+async def get_cross_rates(
+    db: db_dependency,
+    base: Optional[str] = None
+):
+    table = cross_rate_matrix(rate_cache.snapshot(db))
+
+    if base is None:
+        return {
+            "version": table["version"],
+            "currencies": table["currencies"],
+            "rates": table["matrix"]
+        }
+
+    if base not in table["index"]:
+        raise HTTPException(status_code=400, detail="Unsupported currency")
+
+    return {
+        "version": table["version"],
+        "base": base,
+        "currencies": table["currencies"],
+        "rates": table["matrix"][table["index"][base]]
+    }
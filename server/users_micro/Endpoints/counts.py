@@ -1,19 +1,38 @@
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, HTTPException, status, Depends
 from utils.token_verify import user_dependency
-from db.connection import db_dependency
-from models.userModels import Users, Transaction_history, Withdrawal_request, Wallet, Workers, Profit
-from sqlalchemy import func, and_, case, cast, String, Integer, DateTime
+from db.connection import db_dependency, read_db_dependency, note_write
+from models.userModels import Users, Transaction_history, Withdrawal_request, Wallet, Workers
+from sqlalchemy import func, Integer
 from datetime import datetime, timedelta
-from typing import Dict, List
-from sqlalchemy.orm import Session
-from sqlalchemy.types import DateTime
+from typing import Dict, List, Optional
+from sqlalchemy.orm import Session, aliased
+from functions.pagination import paginate, PaginationMode
+from functions.money import round_afriton
+from functions.admin_dashboard import admin_dashboard_cache
 
 router = APIRouter(prefix="/counts", tags=["Counts"])
 
+# Day names by day-of-week number as both dialects count it (0 = Sunday)
+WEEKDAYS = ["Sun", "Mon", "Tue", "Wed", "Thu", "Fri", "Sat"]
+
+
+def _hour_of(db: Session, column):
+    """Hour of day (0-23) of a timestamp column, in SQL"""
+    if db.get_bind().dialect.name == "sqlite":
+        return func.cast(func.strftime('%H', column), Integer)
+    return func.extract('hour', column)
+
+
+def _weekday_of(db: Session, column):
+    """Day of week (0 = Sunday) of a timestamp column, in SQL"""
+    if db.get_bind().dialect.name == "sqlite":
+        return func.cast(func.strftime('%w', column), Integer)
+    return func.extract('dow', column)
+
 @router.get("/agent-dashboard-metrics")
 async def get_agent_dashboard_metrics(
     user: user_dependency,
-    db: db_dependency
+    db: read_db_dependency
 ) -> Dict:
     """Get all metrics for agent dashboard"""
     if isinstance(user, HTTPException):
@@ -34,20 +53,32 @@ async def get_agent_dashboard_metrics(
         Wallet.wallet_type == "agent-wallet"
     ).first()
 
-    # Calculate total deposits and withdrawals handled by agent
-    transactions = db.query(Transaction_history).filter(
-        Transaction_history.done_by == str(user['user_id'])
-    ).all()
+    # Calculate total deposits and withdrawals handled by agent, summed by the database in one pass
+    totals = db.query(
+        func.coalesce(func.sum(Transaction_history.amount).filter(
+            Transaction_history.transaction_type == "deposit",
+            Transaction_history.amount > 0
+        ), 0).label("deposits"),
+        func.coalesce(func.sum(func.abs(Transaction_history.amount)).filter(
+            Transaction_history.transaction_type == "withdrawal",
+            Transaction_history.amount < 0
+        ), 0).label("withdrawals"),
+        func.count(Transaction_history.id).label("transactions")
+    ).filter(
+        Transaction_history.done_by == int(user['user_id'])
+    ).one()
 
-    total_deposits = sum(tx.amount for tx in transactions if tx.transaction_type == "deposit" and tx.amount > 0)
-    total_withdrawals = sum(abs(tx.amount) for tx in transactions if tx.transaction_type == "withdrawal" and tx.amount < 0)
-    total_commission = agent_wallet.balance if agent_wallet else 0
+    # Amounts have 4 decimals so the exact sums do too, rounding only drops float noise on SQLite
+    total_deposits = float(round_afriton(totals.deposits))
+    total_withdrawals = float(round_afriton(totals.withdrawals))
+    total_transactions = totals.transactions
+    total_commission = float(agent_wallet.balance) if agent_wallet else 0
 
     # Calculate percentages
     deposit_percentage = min((total_deposits / 1000000) * 100, 100) if total_deposits > 0 else 0
     withdrawal_percentage = min((total_withdrawals / 1000000) * 100, 100) if total_withdrawals > 0 else 0
     commission_percentage = min((total_commission / 10000) * 100, 100) if total_commission > 0 else 0
-    transaction_percentage = min((len(transactions) / 100) * 100, 100) if transactions else 0
+    transaction_percentage = min((total_transactions / 100) * 100, 100) if total_transactions else 0
 
     return {
         "metrics": {
@@ -67,9 +98,9 @@ async def get_agent_dashboard_metrics(
                 "formatted_total": f"₳{total_commission/1000:.1f}K"
             },
             "transactions": {
-                "total": len(transactions),
+                "total": total_transactions,
                 "percentage": transaction_percentage,
-                "formatted_total": str(len(transactions))
+                "formatted_total": str(total_transactions)
             }
         }
     }
@@ -77,7 +108,7 @@ async def get_agent_dashboard_metrics(
 @router.get("/agent-daily-transactions")
 async def get_agent_daily_transactions(
     user: user_dependency,
-    db: db_dependency
+    db: read_db_dependency
 ) -> Dict:
     """Get daily transaction activity for agent"""
     if isinstance(user, HTTPException):
@@ -93,47 +124,37 @@ async def get_agent_daily_transactions(
         if not agent:
             raise HTTPException(status_code=403, detail="Only agents can access this endpoint")
 
-        # Get today's date in UTC
-        today = datetime.utcnow().date()
-        
-        # Initialize hours with zero values
-        hours = {f"{h:02d}:00": {"deposits": 0.0, "withdrawals": 0.0} 
-                for h in range(24)}
-
-        # Get all transactions for today using date comparison
-        transactions = db.query(Transaction_history).filter(
-            Transaction_history.done_by == str(user['user_id']),
-            func.date(Transaction_history.created_at) == today
-        ).all()
-
-        # Process transactions
-        for tx in transactions:
-            try:
-                # Format hour with leading zero
-                hour = tx.created_at.strftime('%H:00')
-                
-                # Handle transaction types
-                if tx.transaction_type == 'deposit':
-                    amount = float(tx.amount) if tx.amount else 0.0
-                    if amount > 0:
-                        hours[hour]['deposits'] += amount
-                elif tx.transaction_type == 'withdrawal':
-                    amount = float(tx.amount) if tx.amount else 0.0
-                    if amount < 0:
-                        hours[hour]['withdrawals'] += abs(amount)
-            except (ValueError, AttributeError) as e:
-                print(f"Error processing transaction {tx.id}: {str(e)}")
-                continue
-
-        # Convert to list format and ensure proper number formatting
-        hourly_data = [
-            {
-                "hour": hour,
-                "deposits": round(data["deposits"], 2),
-                "withdrawals": round(data["withdrawals"], 2)
-            }
-            for hour, data in sorted(hours.items())  # Sort by hour
-        ]
+        # Today's range in UTC, a plain range so the (done_by, created_at) index is used
+        today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+
+        # One row per hour that had activity, bucketed and summed by the database
+        hour = _hour_of(db, Transaction_history.created_at).label("hour")
+        buckets = db.query(
+            hour,
+            func.sum(Transaction_history.amount).filter(
+                Transaction_history.transaction_type == "deposit",
+                Transaction_history.amount > 0
+            ).label("deposits"),
+            func.sum(func.abs(Transaction_history.amount)).filter(
+                Transaction_history.transaction_type == "withdrawal",
+                Transaction_history.amount < 0
+            ).label("withdrawals")
+        ).filter(
+            Transaction_history.done_by == int(user['user_id']),
+            Transaction_history.created_at >= today,
+            Transaction_history.created_at < today + timedelta(days=1)
+        ).group_by(hour).all()
+        by_hour = {int(bucket.hour): bucket for bucket in buckets}
+
+        # Fill in the hours without transactions
+        hourly_data = []
+        for h in range(24):
+            bucket = by_hour.get(h)
+            hourly_data.append({
+                "hour": f"{h:02d}:00",
+                "deposits": round(float(round_afriton(bucket.deposits)), 2) if bucket else 0.0,
+                "withdrawals": round(float(round_afriton(bucket.withdrawals)), 2) if bucket else 0.0
+            })
 
         return {"daily_transactions": hourly_data}
     except Exception as e:
@@ -146,7 +167,7 @@ async def get_agent_daily_transactions(
 @router.get("/agent-weekly-activity")
 async def get_agent_weekly_activity(
     user: user_dependency,
-    db: db_dependency
+    db: read_db_dependency
 ) -> Dict:
     """Get weekly wallet activity for agent"""
     if isinstance(user, HTTPException):
@@ -157,49 +178,53 @@ async def get_agent_weekly_activity(
         end_date = datetime.utcnow()
         start_date = end_date - timedelta(days=7)
 
-        # Initialize days with zero values
+        # One row per weekday that had activity, bucketed and summed by the database
+        weekday = _weekday_of(db, Transaction_history.created_at).label("weekday")
+        buckets = db.query(
+            weekday,
+            func.sum(Transaction_history.amount).filter(
+                Transaction_history.transaction_type == "deposit",
+                Transaction_history.amount > 0
+            ).label("deposits"),
+            func.sum(func.abs(Transaction_history.amount)).filter(
+                Transaction_history.transaction_type == "withdrawal",
+                Transaction_history.amount < 0
+            ).label("withdrawals"),
+            func.sum(func.abs(Transaction_history.amount)).filter(
+                Transaction_history.wallet_type == "agent-wallet"
+            ).label("commission")
+        ).filter(
+            Transaction_history.done_by == int(user['user_id']),
+            Transaction_history.created_at.between(start_date, end_date)
+        ).group_by(weekday).all()
+        by_weekday = {WEEKDAYS[int(bucket.weekday)]: bucket for bucket in buckets}
+
+        # Get agent's wallet balance
+        agent_wallet_balance = db.query(Wallet.balance).join(
+            Users, Users.account_id == Wallet.account_id
+        ).filter(
+            Users.id == user['user_id'],
+            Wallet.wallet_type == "agent-wallet"
+        ).limit(1).scalar()
+
+        wallet_balance = float(agent_wallet_balance) if agent_wallet_balance is not None else 0.0
+
+        # Days in order starting from a week ago, the 8-day range shares that weekday with today.
+        # The wallet balance is only shown on days with activity
         days = {}
         current = start_date
         while current <= end_date:
             day_key = current.strftime('%a')
+            bucket = by_weekday.get(day_key)
             days[day_key] = {
                 "day": day_key,
-                "deposits": 0.0,
-                "withdrawals": 0.0,
-                "commission": 0.0,
-                "wallet": 0.0
+                "deposits": float(round_afriton(bucket.deposits)) if bucket else 0.0,
+                "withdrawals": float(round_afriton(bucket.withdrawals)) if bucket else 0.0,
+                "commission": float(round_afriton(bucket.commission)) if bucket else 0.0,
+                "wallet": wallet_balance if bucket else 0.0
             }
             current += timedelta(days=1)
 
-        # Get all transactions for the period
-        transactions = db.query(Transaction_history).filter(
-            Transaction_history.done_by == str(user['user_id']),
-            Transaction_history.created_at.between(start_date, end_date)
-        ).all()
-
-        # Get agent's wallet balance
-        agent_wallet = db.query(Wallet).filter(
-            Wallet.account_id == db.query(Users.account_id).filter(Users.id == user['user_id']).scalar(),
-            Wallet.wallet_type == "agent-wallet"
-        ).first()
-
-        wallet_balance = float(agent_wallet.balance) if agent_wallet else 0.0
-
-        # Process transactions
-        for tx in transactions:
-            day = tx.created_at.strftime('%a')
-            amount = abs(float(tx.amount))
-
-            if tx.transaction_type == 'deposit' and tx.amount > 0:
-                days[day]['deposits'] += amount
-            elif tx.transaction_type == 'withdrawal' and tx.amount < 0:
-                days[day]['withdrawals'] += amount
-
-            if tx.wallet_type == 'agent-wallet':
-                days[day]['commission'] += amount
-
-            days[day]['wallet'] = wallet_balance
-
         # Convert to list format
         weekly_data = list(days.values())
 
@@ -211,7 +236,7 @@ async def get_agent_weekly_activity(
 @router.get("/agent-commission-breakdown")
 async def get_agent_commission_breakdown(
     user: user_dependency,
-    db: db_dependency
+    db: read_db_dependency
 ) -> Dict:
     """Get commission breakdown for agent"""
     if isinstance(user, HTTPException):
@@ -222,34 +247,34 @@ async def get_agent_commission_breakdown(
         Transaction_history.transaction_type,
         func.sum(Transaction_history.amount).label('total')
     ).filter(
-        Transaction_history.done_by == str(user['user_id']),
+        Transaction_history.done_by == int(user['user_id']),
         Transaction_history.wallet_type == 'agent-wallet'
     ).group_by(
         Transaction_history.transaction_type
     ).all()
 
     # Calculate percentages and format for frontend
-    total_commission = sum(abs(c.total) for c in commission_data)
+    total_commission = float(sum(abs(c.total) for c in commission_data))
     
     commission_breakdown = [
         {
             "name": "Deposits",
-            "value": next((abs(c.total) for c in commission_data if c.transaction_type == 'deposit'), 0),
+            "value": next((float(abs(c.total)) for c in commission_data if c.transaction_type == 'deposit'), 0),
             "color": '#3b82f6'
         },
         {
             "name": "Withdrawals",
-            "value": next((abs(c.total) for c in commission_data if c.transaction_type == 'withdrawal'), 0),
+            "value": next((float(abs(c.total)) for c in commission_data if c.transaction_type == 'withdrawal'), 0),
             "color": '#ef4444'
         },
         {
             "name": "Transfers",
-            "value": next((abs(c.total) for c in commission_data if c.transaction_type == 'transfer'), 0),
+            "value": next((float(abs(c.total)) for c in commission_data if c.transaction_type == 'transfer'), 0),
             "color": '#10b981'
         },
         {
             "name": "Other",
-            "value": next((abs(c.total) for c in commission_data if c.transaction_type not in ['deposit', 'withdrawal', 'transfer']), 0),
+            "value": next((float(abs(c.total)) for c in commission_data if c.transaction_type not in ['deposit', 'withdrawal', 'transfer']), 0),
             "color": '#f59e0b'
         }
     ]
@@ -259,9 +284,12 @@ async def get_agent_commission_breakdown(
 @router.get("/manager-transactions")
 async def get_manager_transactions(
     user: user_dependency,
-    db: db_dependency,
+    db: read_db_dependency,
     page: int = 1,
-    per_page: int = 10
+    per_page: int = 10,
+    pagination: PaginationMode = "offset",
+    cursor: Optional[str] = None,
+    with_total: Optional[bool] = None
 ):
     """Get all transactions for a manager's network"""
     if isinstance(user, HTTPException):
@@ -280,24 +308,37 @@ async def get_manager_transactions(
         ).all()
         agent_ids = [agent.id for agent in agents]
 
-        # Get all transactions from these agents
-        base_query = db.query(Transaction_history).filter(
-            Transaction_history.done_by.in_([str(id) for id in agent_ids])
+        # Get all transactions from these agents, with the agent joined in so a page is one query
+        agent = aliased(Users)
+        base_query = db.query(
+            Transaction_history,
+            agent.fname.label("agent_fname"),
+            agent.lname.label("agent_lname"),
+            agent.account_id.label("agent_account_id")
+        ).outerjoin(
+            agent, agent.id == Transaction_history.done_by
+        ).filter(
+            Transaction_history.done_by.in_(agent_ids)
         )
 
-        # Calculate pagination
-        total_items = base_query.count()
-        total_pages = (total_items + per_page - 1) // per_page
-        skip = (page - 1) * per_page
-
-        transactions = base_query.order_by(
-            Transaction_history.created_at.desc()
-        ).offset(skip).limit(per_page).all()
+        result = paginate(
+            base_query,
+            Transaction_history.created_at,
+            Transaction_history.id,
+            mode=pagination,
+            cursor=cursor,
+            skip=(page - 1) * per_page,
+            limit=per_page,
+            with_total=with_total,
+            key=lambda row: row.Transaction_history
+        )
+        total_items = result["total_items"]
+        total_pages = (total_items + per_page - 1) // per_page if total_items is not None else None
 
         # Format transactions
         transaction_list = []
-        for tx in transactions:
-            agent = db.query(Users).filter(Users.id == int(tx.done_by)).first()
+        for row in result["rows"]:
+            tx = row.Transaction_history
             transaction_list.append({
                 "id": tx.id,
                 "amount": tx.amount,
@@ -305,8 +346,8 @@ async def get_manager_transactions(
                 "wallet_type": tx.wallet_type,
                 "created_at": tx.created_at,
                 "status": tx.status,
-                "agent_name": f"{agent.fname} {agent.lname}" if agent else "Unknown",
-                "agent_id": agent.account_id if agent else None
+                "agent_name": f"{row.agent_fname} {row.agent_lname}" if row.agent_fname is not None else "Unknown",
+                "agent_id": row.agent_account_id
             })
 
         return {
@@ -314,11 +355,15 @@ async def get_manager_transactions(
             "pagination": {
                 "total_items": total_items,
                 "total_pages": total_pages,
-                "current_page": page,
-                "per_page": per_page
+                "current_page": page if pagination == "offset" else None,
+                "per_page": per_page,
+                "has_next": result["has_next"],
+                "next_cursor": result["next_cursor"]
             }
         }
 
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error fetching manager transactions: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -326,7 +371,7 @@ async def get_manager_transactions(
 @router.get("/manager-commission-stats")
 async def get_manager_commission_stats(
     user: user_dependency,
-    db: db_dependency
+    db: read_db_dependency
 ):
     """Get commission statistics for a manager's network"""
     if isinstance(user, HTTPException):
@@ -367,7 +412,7 @@ async def get_manager_commission_stats(
                     "agent_id": agent.account_id,
                     "commission": agent_wallet.balance,
                     "transaction_count": db.query(Transaction_history).filter(
-                        Transaction_history.done_by == str(agent.id)
+                        Transaction_history.done_by == agent.id
                     ).count()
                 })
 
@@ -397,7 +442,7 @@ async def get_manager_commission_stats(
 @router.get("/manager-agents")
 async def get_manager_agents(
     user: user_dependency,
-    db: db_dependency
+    db: read_db_dependency
 ):
     """Get all agents under a manager"""
     if isinstance(user, HTTPException):
@@ -438,7 +483,7 @@ async def get_manager_agents(
         print(f"Error fetching manager agents: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.post("/promote-to-agent")
+@router.post("/promote-to-agent", dependencies=[Depends(note_write)])
 async def promote_to_agent(
     user: user_dependency,
     db: db_dependency,
@@ -489,7 +534,7 @@ async def promote_to_agent(
         print(f"Error promoting user to agent: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.put("/update-agent/{agent_id}")
+@router.put("/update-agent/{agent_id}", dependencies=[Depends(note_write)])
 async def update_agent(
     user: user_dependency,
     db: db_dependency,
@@ -537,7 +582,7 @@ async def update_agent(
 @router.get("/manager-stats")
 async def get_manager_stats(
     user: user_dependency,
-    db: db_dependency
+    db: read_db_dependency
 ):
     """Get statistics for manager dashboard"""
     if isinstance(user, HTTPException):
@@ -562,7 +607,7 @@ async def get_manager_stats(
         # Calculate active agents (those who have processed transactions in last 30 days)
         thirty_days_ago = datetime.utcnow() - timedelta(days=30)
         active_agents = db.query(Transaction_history.done_by).distinct().filter(
-            Transaction_history.done_by.in_([str(id) for id in agent_ids]),
+            Transaction_history.done_by.in_(agent_ids),
             Transaction_history.created_at >= thirty_days_ago
         ).count()
 
@@ -577,12 +622,12 @@ async def get_manager_stats(
         last_month = (this_month - timedelta(days=1)).replace(day=1)
         
         this_month_transactions = db.query(Transaction_history).filter(
-            Transaction_history.done_by.in_([str(id) for id in agent_ids]),
+            Transaction_history.done_by.in_(agent_ids),
             Transaction_history.created_at >= this_month
         ).count()
         
         last_month_transactions = db.query(Transaction_history).filter(
-            Transaction_history.done_by.in_([str(id) for id in agent_ids]),
+            Transaction_history.done_by.in_(agent_ids),
             Transaction_history.created_at >= last_month,
             Transaction_history.created_at < this_month
         ).count()
@@ -607,7 +652,7 @@ async def get_manager_stats(
 
                 # Get agent's transaction count
                 transaction_count = db.query(Transaction_history).filter(
-                    Transaction_history.done_by == str(agent.user_id)
+                    Transaction_history.done_by == agent.user_id
                 ).count()
 
                 performance_metrics.append({
@@ -633,9 +678,12 @@ async def get_manager_stats(
 @router.get("/admin-dashboard-stats")
 async def get_admin_dashboard_stats(
     user: user_dependency,
-    db: db_dependency
+    db: read_db_dependency
 ):
-    """Get comprehensive statistics for admin dashboard"""
+    """Get comprehensive statistics for admin dashboard.
+
+    Served from a snapshot refreshed in the background, as_of tells when it was computed.
+    """
     if isinstance(user, HTTPException):
         raise user
 
@@ -648,120 +696,10 @@ async def get_admin_dashboard_stats(
         if not admin:
             raise HTTPException(status_code=403, detail="Access denied")
 
-        # Get current time references
-        now = datetime.utcnow()
-        today = now.date()
-        this_month = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        last_month = (this_month - timedelta(days=1)).replace(day=1)
-        thirty_days_ago = now - timedelta(days=30)
-
-        # User Statistics
-        total_users = db.query(Users).count()
-        total_agents = db.query(Users).filter(Users.user_type == "agent").count()
-        total_managers = db.query(Users).filter(Users.user_type == "manager").count()
-        active_users = db.query(Users).filter(Users.acc_status == True).count()
-
-        # Transaction Statistics
-        transactions = db.query(Transaction_history).filter(
-            func.cast(Transaction_history.created_at, DateTime) >= thirty_days_ago
-        ).all()
-
-        total_volume = sum(abs(float(tx.amount)) for tx in transactions if tx.amount is not None)
-        total_deposits = sum(float(tx.amount) for tx in transactions if tx.transaction_type == "deposit" and tx.amount is not None and tx.amount > 0)
-        total_withdrawals = sum(abs(float(tx.amount)) for tx in transactions if tx.transaction_type == "withdrawal" and tx.amount is not None and tx.amount < 0)
-
-        # Commission and Profit Statistics
-        total_commission = db.query(func.coalesce(func.sum(Wallet.balance), 0)).filter(
-            Wallet.wallet_type.in_(["agent-wallet", "manager-wallet"])
-        ).scalar()
-
-        total_profit = db.query(func.coalesce(func.sum(Profit.amount), 0)).scalar()
-
-        # Monthly Growth
-        this_month_transactions = db.query(Transaction_history).filter(
-            func.cast(Transaction_history.created_at, DateTime) >= this_month
-        ).count()
-        
-        last_month_transactions = db.query(Transaction_history).filter(
-            func.cast(Transaction_history.created_at, DateTime) >= last_month,
-            func.cast(Transaction_history.created_at, DateTime) < this_month
-        ).count()
-
-        # User growth - using proper casting
-        new_users = db.query(Users).filter(
-            func.cast(Users.created_at, DateTime) >= thirty_days_ago
-        ).count()
-
-        # Location Statistics with proper date casting
-        location_stats = db.query(
-            Workers.location,
-            func.count(Workers.id).label('agent_count'),
-            func.coalesce(func.sum(Transaction_history.amount), 0).label('volume')
-        ).outerjoin(
-            Transaction_history,
-            Transaction_history.done_by == cast(Workers.user_id, String)
-        ).group_by(Workers.location).all()
-
-        # Recent Activities with proper date casting
-        recent_activities = db.query(
-            Transaction_history,
-            Users.fname,
-            Users.lname,
-            Users.email
-        ).join(
-            Users,
-            Users.id == cast(Transaction_history.done_by, Integer)
-        ).filter(
-            func.cast(Transaction_history.created_at, DateTime) >= thirty_days_ago
-        ).order_by(
-            Transaction_history.created_at.desc()
-        ).limit(10).all()
-
-        return {
-            "overview": {
-                "total_users": total_users,
-                "total_agents": total_agents,
-                "total_managers": total_managers,
-                "active_users": active_users,
-                "total_volume": float(total_volume),
-                "total_deposits": float(total_deposits),
-                "total_withdrawals": float(total_withdrawals),
-                "total_commission": float(total_commission),
-                "total_profit": float(total_profit)
-            },
-            "growth": {
-                "monthly_transaction_growth": (
-                    ((this_month_transactions - last_month_transactions) / last_month_transactions * 100)
-                    if last_month_transactions > 0 else 0
-                ),
-                "user_growth": new_users
-            },
-            "location_stats": [{
-                "location": stat.location,
-                "agent_count": stat.agent_count,
-                "volume": float(stat.volume) if stat.volume else 0
-            } for stat in location_stats],
-            "recent_activities": [{
-                "id": activity.Transaction_history.id,
-                "type": activity.Transaction_history.transaction_type,
-                "amount": float(activity.Transaction_history.amount) if activity.Transaction_history.amount else 0,
-                "created_at": activity.Transaction_history.created_at,
-                "user": f"{activity.fname} {activity.lname}",
-                "email": activity.email
-            } for activity in recent_activities],
-            "daily_stats": {
-                "transactions": db.query(Transaction_history).filter(
-                    func.date(func.cast(Transaction_history.created_at, DateTime)) == today
-                ).count(),
-                "new_users": db.query(Users).filter(
-                    func.date(func.cast(Users.created_at, DateTime)) == today
-                ).count(),
-                "volume": float(db.query(func.coalesce(func.sum(Transaction_history.amount), 0)).filter(
-                    func.date(func.cast(Transaction_history.created_at, DateTime)) == today
-                ).scalar())
-            }
-        }
+        return await admin_dashboard_cache.get()
 
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error fetching admin stats: {str(e)}")
         raise HTTPException(
@@ -772,7 +710,7 @@ async def get_admin_dashboard_stats(
 @router.get("/admin-commission-stats")
 async def get_admin_commission_stats(
     user: user_dependency,
-    db: db_dependency
+    db: read_db_dependency
 ):
     """Get commission statistics for admin dashboard"""
     if isinstance(user, HTTPException):
@@ -793,8 +731,7 @@ async def get_admin_commission_stats(
             func.coalesce(func.sum(Transaction_history.amount), 0)
         ).filter(
             Transaction_history.transaction_type == "commission",
-            func.date_trunc('month', func.cast(Transaction_history.created_at, DateTime)) == 
-            func.date_trunc('month', func.current_timestamp())
+            Transaction_history.created_at >= datetime.utcnow().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
         ).scalar()
 
         # Get agent statistics
@@ -844,7 +781,7 @@ async def get_admin_commission_stats(
             func.coalesce(func.sum(Transaction_history.amount), 0).label('commission')
         ).join(
             Transaction_history,
-            Transaction_history.done_by == cast(Users.id, String)
+            Transaction_history.done_by == Users.id
         ).filter(
             Users.user_type == "agent",
             Transaction_history.transaction_type == "commission"
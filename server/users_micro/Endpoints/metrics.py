@@ -0,0 +1,14 @@
+from fastapi import APIRouter, HTTPException
+from db.VerifyToken import user_Front_dependency
+from db.pool import pool_metrics
+
+router = APIRouter(prefix="/internal", tags=["Internal"])
+
+
+@router.get("/db-pool")
+async def get_db_pool_metrics(userFront: user_Front_dependency):
+    """Connection pool usage and checkout wait times, for sizing workers against max_connections"""
+    if userFront['acc_type'] != "dev":
+        raise HTTPException(status_code=403, detail="Not Allowed To This Action; only Afriton apps allowed!")
+
+    return {"pools": pool_metrics()}
@@ -1,13 +1,16 @@
-from fastapi import APIRouter, HTTPException,status
+from fastapi import APIRouter, HTTPException,status, Depends
 from db.VerifyToken import user_Front_dependency,user_dependency
 from dotenv import load_dotenv
 import random
-from db.connection import db_dependency
-from models.userModels import Users, OTP, Workers, Wallet
+import json
+from db.connection import db_dependency, note_write
+from models.userModels import Users, OTP, Workers, Wallet, BulkEmailJob
 from typing import Literal
 from functions.send_mail import send_new_email
-from functions.send_mulltiple import send_new_multi_email
+from functions.bulk_email import count_recipients
+from functions.pagination import paginate, PaginationMode
 from emailsTemps.custom_email_send import custom_email
+from emailsTemps.registry import escape
 from schemas.emailSchemas import EmailSchema, OtpVerify
 from datetime import datetime,timedelta
 from pydantic import BaseModel
@@ -168,9 +171,12 @@ async def get_all_users(
     page: int = 1,
     limit: int = 10,
     userType: str = "all",
-    status: str = "all"
+    status: str = "all",
+    pagination: PaginationMode = "offset",
+    cursor: Optional[str] = None,
+    with_total: Optional[bool] = None
 ):
-    """Get all users with pagination and filters"""
+    """Get all users with pagination and filters, newest first"""
     if isinstance(user, HTTPException):
         raise user
 
@@ -190,13 +196,20 @@ async def get_all_users(
         if status != "all":
             query = query.filter(Users.acc_status == (status == "active"))
 
-        # Calculate total items and pages
-        total_items = query.count()
-        total_pages = (total_items + limit - 1) // limit
-
         # Apply pagination
-        skip = (page - 1) * limit
-        users = query.offset(skip).limit(limit).all()
+        result = paginate(
+            query,
+            Users.created_at,
+            Users.id,
+            mode=pagination,
+            cursor=cursor,
+            skip=(page - 1) * limit,
+            limit=limit,
+            with_total=with_total
+        )
+        users = result["rows"]
+        total_items = result["total_items"]
+        total_pages = (total_items + limit - 1) // limit if total_items is not None else None
 
         # Format response
         return {
@@ -211,12 +224,15 @@ async def get_all_users(
                 "account_id": user.account_id
             } for user in users],
             "total_pages": total_pages,
-            "current_page": page,
+            "current_page": page if pagination == "offset" else None,
             "total_items": total_items,
-            "has_next": page < total_pages,
-            "has_previous": page > 1
+            "has_next": result["has_next"],
+            "has_previous": page > 1 if pagination == "offset" else cursor is not None,
+            "next_cursor": result["next_cursor"]
         }
 
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error fetching users: {str(e)}")
         raise HTTPException(
@@ -225,13 +241,13 @@ async def get_all_users(
         )
 
 
-@router.post("/send-emails")
+@router.post("/send-emails", status_code=202)
 async def send_emails_to_users(
     db: db_dependency,
     user: user_dependency,
     request: BulkEmailRequest
 ):
-    """Send emails to users based on type or specific email list"""
+    """Queue a bulk email job for users of a type or a specific email list"""
     if isinstance(user, HTTPException):
         raise user
 
@@ -242,96 +258,87 @@ async def send_emails_to_users(
             raise HTTPException(status_code=403, detail="Only admins can send bulk emails")
 
         # Validate request data
-        if not request.subject or not request.message:
-            raise HTTPException(status_code=400, detail="Subject and message are required")
-
-        # Get email list based on user_type if no specific emails provided
-        if not request.emails:
-            query = db.query(Users)
-            if request.user_type != "all":
-                query = query.filter(Users.user_type == request.user_type)
-            users = query.all()
-            emails = [user.email for user in users if user.email]
-        else:
-            emails = [email for email in request.emails if email]
-
-        if not emails:
-            raise HTTPException(status_code=400, detail="No valid recipients found")
-
-        # Create HTML message with proper validation
-        message = str(request.message).strip()
-        subject = str(request.subject).strip()
-
+        message = str(request.message or "").strip()
+        subject = str(request.subject or "").strip()
         if not message or not subject:
             raise HTTPException(status_code=400, detail="Message and subject cannot be empty")
 
-        # Create HTML message directly as a string
-        html_message = f"""
-        <!DOCTYPE html>
-        <html>
-            <head>
-                <meta charset="utf-8">
-            </head>
-            <body style="font-family: Arial, sans-serif; line-height: 1.6; margin: 0; padding: 20px; background-color: #f4f4f4;">
-                <div style="max-width: 600px; margin: 0 auto; background-color: #ffffff; padding: 20px; border-radius: 5px; box-shadow: 0 2px 5px rgba(0,0,0,0.1);">
-                    <h1 style="color: #333333; font-size: 24px; margin-bottom: 20px; padding-bottom: 10px; border-bottom: 2px solid #f0f0f0;">
-                        {subject}
-                    </h1>
-                    <div style="color: #666666; padding: 20px 0;">
-                        {message}
-                    </div>
-                    <div style="margin-top: 20px; padding-top: 20px; border-top: 2px solid #f0f0f0; font-size: 12px; color: #999999; text-align: center;">
-                        This is an automated message from Afriton. Please do not reply to this email.
-                    </div>
-                </div>
-            </body>
-        </html>
-        """
-
-        # Send emails with validated data
-        try:
-            print(f"Sending email to {len(emails)} recipients")
-            print(f"Subject: {subject}")
-            print(f"Message length: {len(html_message)}")
-
-            # Ensure the message is properly encoded
-            encoded_message = html_message.encode('utf-8').decode('utf-8')
-
-            success = send_new_multi_email(
-                Email_to_list=emails,
-                Email_sub=subject,
-                Email_msg=encoded_message
-            )
-            
-            if not success:
-                raise ValueError("Failed to send emails")
-
-            return {
-                "message": "Emails sent successfully!",
-                "details": {
-                    "recipient_count": len(emails),
-                    "user_type": request.user_type,
-                    "emails_sent": emails
-                }
+        emails = [email for email in request.emails if email] if request.emails else None
+        recipient_count = count_recipients(db, request.user_type, emails)
+        if not recipient_count:
+            raise HTTPException(status_code=400, detail="No valid recipients found")
+
+        # The background worker streams recipients and sends, we only record the job
+        job = BulkEmailJob(
+            created_by=admin.id,
+            subject=subject,
+            message=message,
+            user_type=request.user_type,
+            recipients=json.dumps(emails) if emails else None,
+            status="queued",
+            total_recipients=recipient_count
+        )
+        db.add(job)
+        db.commit()
+        db.refresh(job)
+        print(f"Queued bulk email job {job.id} for {recipient_count} recipients")
+
+        return {
+            "message": "Emails queued for sending",
+            "details": {
+                "job_id": job.id,
+                "status": job.status,
+                "recipient_count": recipient_count,
+                "user_type": request.user_type
             }
-        except Exception as e:
-            print(f"Email sending error: {str(e)}")
-            raise HTTPException(
-                status_code=500,
-                detail=f"Failed to send emails: {str(e)}"
-            )
-            
+        }
+
     except HTTPException as he:
         raise he
     except Exception as e:
+        db.rollback()
         print(f"Email sending error: {str(e)}")
         raise HTTPException(
             status_code=400,
-            detail=f"Failed to send emails: {str(e)}"
+            detail=f"Failed to queue emails: {str(e)}"
         )
+
+@router.get("/send-emails/{job_id}")
+async def get_bulk_email_job(
+    job_id: int,
+    db: db_dependency,
+    user: user_dependency
+):
+    """Progress and failures of a bulk email job"""
+    if isinstance(user, HTTPException):
+        raise user
+
+    admin = db.query(Users).filter(Users.id == user['user_id']).first()
+    if not admin or admin.user_type != "admin":
+        raise HTTPException(status_code=403, detail="Only admins can view bulk email jobs")
+
+    job = db.query(BulkEmailJob).filter(BulkEmailJob.id == job_id).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Bulk email job not found")
+
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "subject": job.subject,
+        "user_type": job.user_type,
+        "total_recipients": job.total_recipients,
+        "sent_count": job.sent_count,
+        "failed_count": job.failed_count,
+        "pending_count": max((job.total_recipients or 0) - (job.sent_count or 0) - (job.failed_count or 0), 0),
+        "failed_recipients": json.loads(job.failed_recipients or "[]"),
+        "last_error": job.last_error,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at
+    }
     
 # change user type if your admin can change to any type or manager can user to agent only
-@router.post("/change-user-type")
+@router.post("/change-user-type", dependencies=[Depends(note_write)])
 def change_user_type(
     user: user_dependency, 
     db: db_dependency,
@@ -391,13 +398,21 @@ def change_user_type(
     user_to_change.user_type = request.user_type
     user_to_change.is_wallet_active = True  # Set wallet active when changing role
     
-    # Create commission wallet for the new agent/manager
-    commission_wallet = Wallet(
-        account_id=user_to_change.account_id,
-        balance=0.0,
-        wallet_type=f"{request.user_type}-wallet", #agent-wallet or manager-wallet
-        wallet_status=True
-    )
+    # Create commission wallet for the new agent/manager, a user moved back to a
+    # role they had before keeps their old one (one wallet per account and type)
+    commission_wallet = db.query(Wallet).filter(
+        Wallet.account_id == user_to_change.account_id,
+        Wallet.wallet_type == f"{request.user_type}-wallet"
+    ).first()
+
+    if not commission_wallet:
+        commission_wallet = Wallet(
+            account_id=user_to_change.account_id,
+            balance=0.0,
+            wallet_type=f"{request.user_type}-wallet", #agent-wallet or manager-wallet
+            wallet_status=True
+        )
+        db.add(commission_wallet)
     
     # Create savings wallet if it doesn't exist
     savings_wallet = db.query(Wallet).filter(
@@ -415,16 +430,15 @@ def change_user_type(
         db.add(savings_wallet)
     
     db.add(new_worker)
-    db.add(commission_wallet)
     db.commit()
 
     # Send email notification
     heading = "Afriton Role Update"
     sub = "Your Role Has Been Updated"
     body = f"""
-    <p>Hi {user_to_change.fname},</p>
+    <p>Hi {escape(user_to_change.fname)},</p>
     <p>Your role has been updated to {request.user_type}.</p>
-    <p>Location: {request.location}</p>
+    <p>Location: {escape(request.location)}</p>
     <p>Available Balance: {allowed_balance} Afriton</p>
     <p>Two wallets have been created for you:</p>
     <ul>
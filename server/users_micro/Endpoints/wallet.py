@@ -1,20 +1,27 @@
-from fastapi import APIRouter, HTTPException,status, Request
+from fastapi import APIRouter, HTTPException,status, Request, Header, Depends
 from utils.token_verify import user_dependency
 from dotenv import load_dotenv
 import random
-from db.connection import db_dependency
+from db.connection import db_dependency, async_db_dependency, read_db_dependency, note_write
 from models.userModels import Users, OTP, Wallet,Withdrawal_request,Transaction_history,Workers, Profit
 from typing import Literal
 from functions.send_mail import send_new_email
 from functions.send_mulltiple import send_new_multi_email
 from emailsTemps.custom_email_send import custom_email
+from emailsTemps.registry import escape
 from schemas.emailSchemas import EmailSchema, OtpVerify
 from datetime import datetime,timedelta
-from Endpoints.conversionRate import convert_to_afriton, convert_from_afriton
-from sqlalchemy.orm import Session
+from Endpoints.conversionRate import convert_to_afriton, convert_to_afriton_async, convert_from_afriton_async
+from sqlalchemy.orm import Session, aliased
+from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel
 from typing import Optional
-from sqlalchemy import func
+from sqlalchemy import func, select, update
+from decimal import Decimal
+from functions.email_outbox import queue_email
+from functions.idempotency import get_saved_response, commit_with_response, request_fingerprint
+from functions.money import round_afriton, round_money, fee, TOTAL_FEE_RATE, AGENT_COMMISSION_RATE
+from functions.pagination import paginate, PaginationMode
 
 # Load environment variables from .env file
 load_dotenv()
@@ -24,7 +31,7 @@ router = APIRouter(prefix="/wallet", tags=["Wallet"])
 # ------------------------================================
 #                                   for Updating is_wallet_active
 #                                                         ===========================--------------------------------
-@router.post("/update-wallet-status")
+@router.post("/update-wallet-status", dependencies=[Depends(note_write)])
 async def update_wallet_status(
     user: user_dependency,
     db: db_dependency,
@@ -66,7 +73,7 @@ async def update_wallet_status(
     heading = "Welcome to Afriton!"
     sub = "Your Gateway to Seamless African Payments"
     body = f"""
-    <p>Hi {check_user.fname},</p>
+    <p>Hi {escape(check_user.fname)},</p>
     <p>Your wallet has been activated successfully.</p>
     <p>You can now start enjoying borderless transactions across Africa.</p>
     <p>Start exploring the possibilities today!</p>
@@ -197,46 +204,59 @@ async def admin_view_wallets(user: user_dependency, db: db_dependency):
             detail=f"Failed to fetch wallet statistics: {str(e)}"
         )
     
-@router.post("/create-withdrawal-request")
+@router.post("/create-withdrawal-request", dependencies=[Depends(note_write)])
 async def create_withdrawal_request(
     user: user_dependency,
-    db: db_dependency,
-    amount: float,
+    db: async_db_dependency,
+    amount: Decimal,
     account_id: str,
     withdrawal_currency: str,
-    wallet_type: str
+    wallet_type: str,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")
 ):
     """Create a withdrawal request"""
     if isinstance(user, HTTPException):
         raise user
 
+    # A negative amount would move money the other way
+    if amount <= 0:
+        raise HTTPException(status_code=400, detail="Amount must be greater than zero")
+
+    # Replay the original result for a retried request with the same parameters
+    request_hash = request_fingerprint(
+        amount=amount, account_id=account_id, withdrawal_currency=withdrawal_currency, wallet_type=wallet_type
+    )
+    if idempotency_key:
+        saved = await get_saved_response(db, int(user['user_id']), idempotency_key, "create-withdrawal-request", request_hash)
+        if saved is not None:
+            return saved
+
     try:
         # Verify the user making the request is an agent or manager
-        requester = db.query(Users).filter(
-            Users.id == user['user_id'],
+        requester = await db.scalar(select(Users).where(
+            Users.id == int(user['user_id']),
             Users.user_type.in_(["agent", "manager"])
-        ).first()
+        ).limit(1))
         if not requester:
             raise HTTPException(status_code=403, detail="Only agents or managers can create withdrawal requests")
 
         # Get user details
-        check_user = db.query(Users).filter(Users.account_id == account_id).first()
+        check_user = await db.scalar(select(Users).where(Users.account_id == account_id).limit(1))
         if not check_user:
             raise HTTPException(status_code=404, detail="User not found")
 
         # Get wallet
-        wallet = db.query(Wallet).filter(
+        wallet = await db.scalar(select(Wallet).where(
             Wallet.account_id == account_id,
             Wallet.wallet_type == wallet_type
-        ).first()
+        ).limit(1))
 
         if not wallet:
             raise HTTPException(status_code=404, detail="Wallet not found")
 
         # Calculate fees (5% total)
-        total_fee = amount * 0.05
-        agent_commission = amount * 0.03  # 3% agent commission
-        platform_profit = amount * 0.02   # 2% platform profit
+        amount = round_afriton(amount)
+        total_fee = fee(amount, TOTAL_FEE_RATE)
         total_amount = amount + total_fee
 
         # Check if wallet has sufficient balance
@@ -248,7 +268,7 @@ async def create_withdrawal_request(
 
         # Convert to withdrawal currency
         try:
-            withdrawal_amount = convert_from_afriton(amount, withdrawal_currency, db)
+            withdrawal_amount = await convert_from_afriton_async(amount, withdrawal_currency, db)
         except Exception as e:
             raise HTTPException(status_code=400, detail=str(e))
 
@@ -273,22 +293,21 @@ async def create_withdrawal_request(
             charges=fee_distribution["total_fee"],
             agent_commission=fee_distribution["breakdown"]["agent_commission"],
             platform_profit=fee_distribution["breakdown"]["platform_profit"],
-            done_by=str(user['user_id'])
+            done_by=int(user['user_id'])
         )
 
         db.add(withdrawal)
-        db.commit()
-        db.refresh(withdrawal)
+        await db.flush()  # assign withdrawal.id for the response
 
-        # Send notification email
+        # Queue notification email, it is sent after the commit
         try:
             heading = "Withdrawal Request Submitted"
             sub = "New Withdrawal Request"
             body = f"""
-            <p>Hi {check_user.fname},</p>
+            <p>Hi {escape(check_user.fname)},</p>
             <p>A withdrawal request has been submitted:</p>
             <ul>
-                <li>Amount: {withdrawal_amount} {withdrawal_currency}</li>
+                <li>Amount: {withdrawal_amount} {escape(withdrawal_currency)}</li>
                 <li>Amount in Afriton: {amount} AFT</li>
                 <li>Service Fee (5%): {total_fee} AFT</li>
                 <li>Total Deduction: {total_amount} AFT</li>
@@ -297,11 +316,11 @@ async def create_withdrawal_request(
             <p>You will be notified once your request is processed.</p>
             """
             msg = custom_email(check_user.fname, heading, body)
-            send_new_email(check_user.email, sub, msg)
+            queue_email(db, check_user.email, sub, msg)
         except Exception as e:
             print(f"Email notification error: {str(e)}")
 
-        return {
+        response = {
             "message": "Withdrawal request created successfully",
             "details": {
                 "id": withdrawal.id,
@@ -312,23 +331,27 @@ async def create_withdrawal_request(
                 "charges": total_fee,
                 "status": "Pending",
                 "commission_details": {
-                    "agent_commission": agent_commission,
-                    "platform_profit": platform_profit
+                    "agent_commission": fee_distribution["breakdown"]["agent_commission"],
+                    "platform_profit": fee_distribution["breakdown"]["platform_profit"]
                 }
             }
         }
+        response, _ = await commit_with_response(
+            db, int(user['user_id']), idempotency_key, "create-withdrawal-request", request_hash, response
+        )
+        return response
 
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         print(f"Error creating withdrawal request: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.post("/respond-withdrawal-request/{request_id}")
+@router.post("/respond-withdrawal-request/{request_id}", dependencies=[Depends(note_write)])
 async def respond_withdrawal_request(
     request_id: int,
     action: Literal["Approve", "Reject"],
     user: user_dependency,
-    db: db_dependency
+    db: async_db_dependency
 ):
     """Respond to a withdrawal request"""
     if isinstance(user, HTTPException):
@@ -336,22 +359,22 @@ async def respond_withdrawal_request(
 
     try:
         # Get user's account_id from Users table
-        user_data = db.query(Users).filter(Users.id == user['user_id']).first()
+        user_data = await db.scalar(select(Users).where(Users.id == int(user['user_id'])).limit(1))
         if not user_data:
             raise HTTPException(status_code=404, detail="User not found")
 
         # Validate user and fetch the withdrawal request
-        request = db.query(Withdrawal_request).filter(
+        request = await db.scalar(select(Withdrawal_request).where(
             Withdrawal_request.id == request_id,
             Withdrawal_request.status == "Pending"
-        ).first()
+        ).limit(1))
         if not request:
             raise HTTPException(status_code=404, detail="Withdrawal request not found or already processed")
 
-        wallet = db.query(Wallet).filter(
+        wallet = await db.scalar(select(Wallet).where(
             Wallet.account_id == request.account_id,
             Wallet.wallet_type == request.wallet_type
-        ).first()
+        ).limit(1))
         if not wallet:
             raise HTTPException(status_code=404, detail="Wallet not found")
 
@@ -372,7 +395,7 @@ async def respond_withdrawal_request(
                 amount=-request.total_amount,
                 transaction_type="withdrawal",
                 wallet_type=request.wallet_type,
-                done_by=str(user['user_id'])
+                done_by=int(user['user_id'])
             )
             db.add(transaction)
 
@@ -380,51 +403,51 @@ async def respond_withdrawal_request(
         request.status = action + "d"  # "Approved" or "Rejected"
         request.processed_at = datetime.utcnow()
 
-        db.commit()
-
-        # Send email notification
+        # Queue email notification, it is sent after the commit
         try:
             # Get user details for email
-            user_details = db.query(Users).filter(Users.account_id == request.account_id).first()
-            agent_details = db.query(Users).filter(Users.id == user['user_id']).first()
+            user_details = await db.scalar(select(Users).where(Users.account_id == request.account_id).limit(1))
+            agent_details = user_data
             
             heading = "Withdrawal Request Update"
             sub = f"Withdrawal Request {action}ed"
             
             if action == "Approve":
                 body = f"""
-                <p>Hi {user_details.fname},</p>
+                <p>Hi {escape(user_details.fname)},</p>
                 <p>Your withdrawal request has been approved.</p>
                 <p>Details:</p>
                 <ul>
-                    <li>Amount: {request.withdrawal_amount} {request.withdrawal_currency}</li>
+                    <li>Amount: {request.withdrawal_amount} {escape(request.withdrawal_currency)}</li>
                     <li>Amount in Afriton: {request.amount} AFT</li>
                     <li>Service Fee: {request.charges} AFT</li>
                     <li>Total Deducted: {request.total_amount} AFT</li>
-                    <li>Processed by: {agent_details.fname} {agent_details.lname}</li>
+                    <li>Processed by: {escape(agent_details.fname)} {escape(agent_details.lname)}</li>
                 </ul>
                 <p>The funds will be processed shortly.</p>
                 """
             else:
                 body = f"""
-                <p>Hi {user_details.fname},</p>
+                <p>Hi {escape(user_details.fname)},</p>
                 <p>Your withdrawal request has been rejected.</p>
                 <p>Details of rejected request:</p>
                 <ul>
-                    <li>Amount: {request.withdrawal_amount} {request.withdrawal_currency}</li>
+                    <li>Amount: {request.withdrawal_amount} {escape(request.withdrawal_currency)}</li>
                     <li>Amount in Afriton: {request.amount} AFT</li>
-                    <li>Processed by: {agent_details.fname} {agent_details.lname}</li>
+                    <li>Processed by: {escape(agent_details.fname)} {escape(agent_details.lname)}</li>
                 </ul>
                 <p>Please contact support if you have any questions.</p>
                 """
 
             msg = custom_email(user_details.fname, heading, body)
-            send_new_email(user_details.email, sub, msg)
+            queue_email(db, user_details.email, sub, msg)
 
         except Exception as e:
             print(f"Email notification error: {str(e)}")
             # Continue with the request even if email fails
-            
+
+        await db.commit()
+
         return {
             "message": f"Withdrawal request {action.lower()}ed successfully",
             "request_id": request_id,
@@ -433,35 +456,49 @@ async def respond_withdrawal_request(
         }
 
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=str(e))
 
 # Create a model for the deposit request
 class DepositRequest(BaseModel):
     account_id: str
-    amount: float
+    amount: Decimal
     currency: str
     wallet_type: str
 
-@router.post("/create-deposit-request")
+@router.post("/create-deposit-request", dependencies=[Depends(note_write)])
 async def create_deposit_request(
     user: user_dependency,
-    db: db_dependency,
+    db: async_db_dependency,
     account_id: str,
-    amount: float,
+    amount: Decimal,
     currency: str,
-    wallet_type: str
+    wallet_type: str,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")
 ):
     """Create a deposit request"""
     if isinstance(user, HTTPException):
         raise user
 
+    # A negative amount would move money the other way
+    if amount <= 0:
+        raise HTTPException(status_code=400, detail="Amount must be greater than zero")
+
+    # Replay the original result for a retried request with the same parameters
+    request_hash = request_fingerprint(
+        account_id=account_id, amount=amount, currency=currency, wallet_type=wallet_type
+    )
+    if idempotency_key:
+        saved = await get_saved_response(db, int(user['user_id']), idempotency_key, "create-deposit-request", request_hash)
+        if saved is not None:
+            return saved
+
     try:
         # Verify the user making the request is an agent or manager
-        requester = db.query(Users).filter(
-            Users.id == user['user_id'],
+        requester = await db.scalar(select(Users).where(
+            Users.id == int(user['user_id']),
             Users.user_type.in_(["agent", "manager"])
-        ).first()
+        ).limit(1))
         
         if not requester:
             raise HTTPException(
@@ -470,25 +507,25 @@ async def create_deposit_request(
             )
 
         # Get user details
-        target_user = db.query(Users).filter(
+        target_user = await db.scalar(select(Users).where(
             Users.account_id == account_id
-        ).first()
+        ).limit(1))
         
         if not target_user:
             raise HTTPException(status_code=404, detail="User not found")
 
         # Get wallet
-        wallet = db.query(Wallet).filter(
+        wallet = await db.scalar(select(Wallet).where(
             Wallet.account_id == account_id,
             Wallet.wallet_type == wallet_type
-        ).first()
+        ).limit(1))
 
         if not wallet:
             raise HTTPException(status_code=404, detail="Wallet not found")
 
         # Convert amount to Afriton
         try:
-            afriton_amount = convert_to_afriton(amount, currency, db)
+            afriton_amount = await convert_to_afriton_async(amount, currency, db)
         except Exception as e:
             raise HTTPException(status_code=400, detail=str(e))
 
@@ -507,46 +544,46 @@ async def create_deposit_request(
         transaction = Transaction_history(
             account_id=account_id,
             amount=afriton_amount,
-            original_amount=amount,
+            original_amount=round_money(amount, currency),
             original_currency=currency,
             transaction_type="deposit",
             wallet_type=wallet_type,
-            done_by=str(user['user_id'])
+            done_by=int(user['user_id'])
         )
         
         db.add(transaction)
-        db.commit()
+        await db.flush()  # assign transaction.id for the response
 
-        # Send email notifications
+        # Queue email notifications, they are sent after the commit
         try:
             # Email to customer
             customer_heading = "Deposit Confirmation"
             customer_sub = "New Deposit to Your Wallet"
             customer_body = f"""
-            <p>Hi {target_user.fname},</p>
+            <p>Hi {escape(target_user.fname)},</p>
             <p>A deposit has been made to your {wallet_type} wallet:</p>
             <ul>
-                <li>Amount: {amount} {currency}</li>
+                <li>Amount: {amount} {escape(currency)}</li>
                 <li>Converted Amount: {afriton_amount} Afriton</li>
                 <li>Wallet Type: {wallet_type}</li>
                 <li>New Balance: {wallet.balance} Afriton</li>
                 <li>Transaction ID: {transaction.id}</li>
-                <li>Processed by: {requester.fname} {requester.lname}</li>
+                <li>Processed by: {escape(requester.fname)} {escape(requester.lname)}</li>
             </ul>
             <p>If you did not authorize this transaction, please contact support immediately.</p>
             """
             customer_msg = custom_email(target_user.fname, customer_heading, customer_body)
-            send_new_email(target_user.email, customer_sub, customer_msg)
+            queue_email(db, target_user.email, customer_sub, customer_msg)
 
             # Email to agent/manager
             agent_heading = "Deposit Transaction Successful"
             agent_sub = "Deposit Transaction Confirmation"
             agent_body = f"""
-            <p>Hi {requester.fname},</p>
+            <p>Hi {escape(requester.fname)},</p>
             <p>You have successfully processed a deposit:</p>
             <ul>
-                <li>Customer: {target_user.fname} {target_user.lname}</li>
-                <li>Amount: {amount} {currency}</li>
+                <li>Customer: {escape(target_user.fname)} {escape(target_user.lname)}</li>
+                <li>Amount: {amount} {escape(currency)}</li>
                 <li>Converted Amount: {afriton_amount} Afriton</li>
                 <li>Wallet Type: {wallet_type}</li>
                 <li>Transaction ID: {transaction.id}</li>
@@ -554,14 +591,13 @@ async def create_deposit_request(
             <p>Transaction has been recorded and customer has been notified.</p>
             """
             agent_msg = custom_email(requester.fname, agent_heading, agent_body)
-            send_new_email(requester.email, agent_sub, agent_msg)
+            queue_email(db, requester.email, agent_sub, agent_msg)
 
         except Exception as e:
             print(f"Email notification error: {str(e)}")
-            # Don't raise exception here, as the transaction was successful
-            # Just log the email error
+            # Don't fail the deposit over a notification, just log the email error
 
-        return {
+        response = {
             "message": "Deposit processed successfully",
             "details": {
                 "account_id": account_id,
@@ -573,9 +609,13 @@ async def create_deposit_request(
                 "transaction_id": transaction.id
             }
         }
+        response, _ = await commit_with_response(
+            db, int(user['user_id']), idempotency_key, "create-deposit-request", request_hash, response
+        )
+        return response
 
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/commission-balance")
@@ -618,11 +658,11 @@ async def get_commission_balance(
         "user_type": check_user.user_type
     }
 
-@router.post("/withdraw-commission")
+@router.post("/withdraw-commission", dependencies=[Depends(note_write)])
 async def withdraw_commission(
     user: user_dependency,
     db: db_dependency,
-    amount: float,
+    amount: Decimal,
     currency: str
 ):
     """Request commission withdrawal for agents/managers"""
@@ -677,10 +717,10 @@ async def withdraw_commission(
     heading = "Commission Withdrawal Request"
     sub = "New Commission Withdrawal Request"
     body = f"""
-    <p>Hi {check_user.fname},</p>
+    <p>Hi {escape(check_user.fname)},</p>
     <p>Your commission withdrawal request has been submitted:</p>
     <ul>
-        <li>Amount: {amount} {currency}</li>
+        <li>Amount: {amount} {escape(currency)}</li>
         <li>Converted Amount: {afriton_amount} Afriton</li>
         <li>Status: Pending</li>
     </ul>
@@ -700,7 +740,7 @@ async def withdraw_commission(
     }
 
 # Update the change_user_type function to create commission wallet
-@router.post("/change-user-type")
+@router.post("/change-user-type", dependencies=[Depends(note_write)])
 async def change_user_type(
     user: user_dependency, 
     db: db_dependency,
@@ -721,22 +761,36 @@ async def change_user_type(
 
     # ... rest of the existing code ...
 
-@router.post("/transfer")
+@router.post("/transfer", dependencies=[Depends(note_write)])
 async def transfer_money(
     user: user_dependency,
-    db: db_dependency,
+    db: async_db_dependency,
     recipient_account_id: str,
-    amount: float,
+    amount: Decimal,
     currency: str,
-    from_wallet_type: str
+    from_wallet_type: str,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")
 ):
     """Transfer money between wallets"""
     if isinstance(user, HTTPException):
         raise user
 
+    # A negative amount would move money the other way
+    if amount <= 0:
+        raise HTTPException(status_code=400, detail="Amount must be greater than zero")
+
+    # Replay the original result for a retried request with the same parameters
+    request_hash = request_fingerprint(
+        recipient_account_id=recipient_account_id, amount=amount, currency=currency, from_wallet_type=from_wallet_type
+    )
+    if idempotency_key:
+        saved = await get_saved_response(db, int(user['user_id']), idempotency_key, "transfer", request_hash)
+        if saved is not None:
+            return saved
+
     try:
         # Get sender details
-        sender = db.query(Users).filter(Users.id == user['user_id']).first()
+        sender = await db.scalar(select(Users).where(Users.id == int(user['user_id'])).limit(1))
         if not sender:
             raise HTTPException(status_code=404, detail="Sender not found")
 
@@ -750,11 +804,11 @@ async def transfer_money(
             to_wallet_type = "savings"  # Force transfer to savings wallet
         else:
             # For other transfers, verify recipient
-            recipient = db.query(Users).filter(
+            recipient = await db.scalar(select(Users).where(
                 Users.account_id == recipient_account_id,
                 Users.acc_status == True,
                 Users.is_wallet_active == True
-            ).first()
+            ).limit(1))
             if not recipient:
                 raise HTTPException(
                     status_code=404, 
@@ -763,10 +817,10 @@ async def transfer_money(
             to_wallet_type = "savings"  # Default recipient wallet type
 
         # Get sender's wallet first to check balance
-        sender_wallet = db.query(Wallet).filter(
+        sender_wallet = await db.scalar(select(Wallet).where(
             Wallet.account_id == sender.account_id,
             Wallet.wallet_type == from_wallet_type
-        ).first()
+        ).limit(1))
 
         if not sender_wallet:
             raise HTTPException(status_code=404, detail="Sender wallet not found")
@@ -774,9 +828,9 @@ async def transfer_money(
         # Convert amount if not in AFT
         try:
             if currency.upper() != 'AFT':
-                afriton_amount = convert_to_afriton(amount, currency, db)
+                afriton_amount = await convert_to_afriton_async(amount, currency, db)
             else:
-                afriton_amount = float(amount)  # Convert to float for comparison
+                afriton_amount = round_afriton(amount)
         except HTTPException as e:
             raise e
 
@@ -788,10 +842,10 @@ async def transfer_money(
             )
 
         # Get or create recipient's savings wallet
-        recipient_wallet = db.query(Wallet).filter(
+        recipient_wallet = await db.scalar(select(Wallet).where(
             Wallet.account_id == recipient_account_id,
             Wallet.wallet_type == to_wallet_type
-        ).first()
+        ).limit(1))
         
         if not recipient_wallet:
             recipient_wallet = Wallet(
@@ -800,52 +854,73 @@ async def transfer_money(
                 wallet_type=to_wallet_type
             )
             db.add(recipient_wallet)
+            await db.flush()  # get an id so the wallet can be updated below
 
-        # Perform transfer
-        sender_wallet.balance -= afriton_amount
-        recipient_wallet.balance += afriton_amount
+        # Perform transfer with atomic UPDATEs instead of read-modify-write, touching
+        # wallets in id order so concurrent transfers always lock rows in the same order
+        balance_changes = sorted(
+            [(sender_wallet.id, -afriton_amount), (recipient_wallet.id, afriton_amount)],
+            key=lambda change: change[0]
+        )
+        for wallet_id, delta in balance_changes:
+            statement = update(Wallet).where(Wallet.id == wallet_id)
+            if delta < 0:
+                # Only debit when the balance still covers it at update time
+                statement = statement.where(Wallet.balance >= -delta)
+            result = await db.execute(
+                statement.values(balance=Wallet.balance + delta).execution_options(synchronize_session=False)
+            )
+            if not result.rowcount:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Insufficient balance. Required: {afriton_amount} AFT"
+                )
 
         # Create transaction history for sender
         sender_transaction = Transaction_history(
             account_id=sender.account_id,
             amount=-afriton_amount,
-            original_amount=-amount,
+            original_amount=-round_money(amount, currency),
             original_currency=currency,
             transaction_type="transfer_sent",
             wallet_type=from_wallet_type,
-            done_by=str(user['user_id'])
+            done_by=int(user['user_id'])
         )
 
         # Create transaction history for recipient
         recipient_transaction = Transaction_history(
             account_id=recipient_account_id,
             amount=afriton_amount,
-            original_amount=amount,
+            original_amount=round_money(amount, currency),
             original_currency=currency,
             transaction_type="transfer_received",
             wallet_type=to_wallet_type,
-            done_by=str(user['user_id'])
+            done_by=int(user['user_id'])
         )
 
         db.add(sender_transaction)
         db.add(recipient_transaction)
-        db.commit()
+        await db.flush()
+        # Pick up the balances written by the UPDATEs above
+        await db.refresh(sender_wallet)
+        await db.refresh(recipient_wallet)
 
-        # Send email notifications
+        # Queue email notifications, they are sent after the commit
         try:
             # To sender
             sender_body = f"""
-            <p>Hi {sender.fname},</p>
+            <p>Hi {escape(sender.fname)},</p>
             <p>Your transfer has been completed successfully:</p>
             <ul>
-                <li>Amount Sent: {amount} {currency}</li>
+                <li>Amount Sent: {amount} {escape(currency)}</li>
                 <li>Converted Amount: {afriton_amount} AFT</li>
                 <li>From Wallet: {from_wallet_type}</li>
                 <li>To Wallet: {to_wallet_type}</li>
             </ul>
             <p>Your new balance is: {sender_wallet.balance} AFT</p>
             """
-            send_new_email(
+            queue_email(
+                db,
                 sender.email,
                 "Transfer Confirmation",
                 custom_email(sender.fname, "Transfer Sent", sender_body)
@@ -853,19 +928,20 @@ async def transfer_money(
 
             # To recipient (if different from sender)
             if sender.account_id != recipient_account_id:
-                recipient = db.query(Users).filter(Users.account_id == recipient_account_id).first()
+                recipient = await db.scalar(select(Users).where(Users.account_id == recipient_account_id).limit(1))
                 recipient_body = f"""
-                <p>Hi {recipient.fname},</p>
+                <p>Hi {escape(recipient.fname)},</p>
                 <p>You have received a transfer:</p>
                 <ul>
-                    <li>Amount: {amount} {currency}</li>
+                    <li>Amount: {amount} {escape(currency)}</li>
                     <li>Converted Amount: {afriton_amount} AFT</li>
-                    <li>From: {sender.fname} {sender.lname}</li>
+                    <li>From: {escape(sender.fname)} {escape(sender.lname)}</li>
                     <li>To Wallet: {to_wallet_type}</li>
                 </ul>
                 <p>Your new balance is: {recipient_wallet.balance} AFT</p>
                 """
-                send_new_email(
+                queue_email(
+                    db,
                     recipient.email,
                     "Transfer Received",
                     custom_email(recipient.fname, "Transfer Received", recipient_body)
@@ -874,7 +950,7 @@ async def transfer_money(
         except Exception as e:
             print(f"Email notification error: {str(e)}")
 
-        return {
+        response = {
             "message": "Transfer completed successfully",
             "details": {
                 "amount": amount,
@@ -885,9 +961,13 @@ async def transfer_money(
                 "new_balance": sender_wallet.balance
             }
         }
+        response, _ = await commit_with_response(
+            db, int(user['user_id']), idempotency_key, "transfer", request_hash, response
+        )
+        return response
 
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         print(f"Transfer error: {str(e)}")  # Add logging
         if isinstance(e, HTTPException):
             raise e
@@ -898,7 +978,10 @@ async def get_my_withdrawal_requests(
     user: user_dependency,
     db: db_dependency,
     skip: int = 0,
-    limit: int = 100
+    limit: int = 100,
+    pagination: PaginationMode = "offset",
+    cursor: Optional[str] = None,
+    with_total: Optional[bool] = None
 ):
     """Get all withdrawal requests for the authenticated user"""
     if isinstance(user, HTTPException):
@@ -910,15 +993,26 @@ async def get_my_withdrawal_requests(
         raise HTTPException(status_code=404, detail="User not found")
 
     # Get all withdrawal requests for this user
-    requests = db.query(Withdrawal_request).filter(
-        Withdrawal_request.account_id == check_user.account_id
-    ).order_by(
-        Withdrawal_request.created_at.desc()
-    ).offset(skip).limit(limit).all()
+    result = paginate(
+        db.query(Withdrawal_request).filter(
+            Withdrawal_request.account_id == check_user.account_id
+        ),
+        Withdrawal_request.created_at,
+        Withdrawal_request.id,
+        mode=pagination,
+        cursor=cursor,
+        skip=skip,
+        limit=limit,
+        with_total=with_total
+    )
+    requests = result["rows"]
 
     return {
         "message": "Withdrawal requests retrieved successfully",
         "total_requests": len(requests),
+        "total_items": result["total_items"],
+        "has_next": result["has_next"],
+        "next_cursor": result["next_cursor"],
         "requests": [{
             "id": req.id,
             "amount": req.amount,
@@ -939,7 +1033,10 @@ async def get_created_withdrawal_requests(
     db: db_dependency,
     skip: int = 0,
     limit: int = 100,
-    status: str = None  # Optional status filter
+    status: str = None,  # Optional status filter
+    pagination: PaginationMode = "offset",
+    cursor: Optional[str] = None,
+    with_total: Optional[bool] = None
 ):
     """Get all withdrawal requests created by an agent or manager"""
     if isinstance(user, HTTPException):
@@ -966,20 +1063,32 @@ async def get_created_withdrawal_requests(
 
     # If user is not admin, filter by done_by
     if requester.user_type != "admin":
-        query = query.filter(Withdrawal_request.done_by == str(user['user_id']))
+        query = query.filter(Withdrawal_request.done_by == int(user['user_id']))
 
     # Add status filter if provided
     if status:
         query = query.filter(Withdrawal_request.status == status)
 
     # Execute query with pagination
-    results = query.order_by(
-        Withdrawal_request.created_at.desc()
-    ).offset(skip).limit(limit).all()
+    result = paginate(
+        query,
+        Withdrawal_request.created_at,
+        Withdrawal_request.id,
+        mode=pagination,
+        cursor=cursor,
+        skip=skip,
+        limit=limit,
+        with_total=with_total,
+        key=lambda row: row.Withdrawal_request
+    )
+    results = result["rows"]
 
     return {
         "message": "Withdrawal requests retrieved successfully",
         "total_requests": len(results),
+        "total_items": result["total_items"],
+        "has_next": result["has_next"],
+        "next_cursor": result["next_cursor"],
         "requests": [{
             "id": req.Withdrawal_request.id,
             "user": {
@@ -1000,34 +1109,35 @@ async def get_created_withdrawal_requests(
 
 # Add this function to handle commission and profit distribution
 async def distribute_fees(
-    db: Session,
-    amount: float,
+    db: AsyncSession,
+    amount: Decimal,
     agent_id: str,
     fee_type: Literal["withdrawal", "deposit"]
 ) -> dict:
     """
     Distribute fees between agent and platform.
     Only withdrawals get commission, deposits only track platform profit.
+    Does not commit: the rows are part of the caller's transaction.
     """
     try:
         # Calculate fees
-        total_fee = amount * 0.05  # 5% total fee
+        total_fee = fee(amount, TOTAL_FEE_RATE)  # 5% total fee
         
         if fee_type == "withdrawal":
             # Only withdrawals get agent commission
-            agent_commission = amount * 0.03  # 3% agent commission
-            platform_fee = amount * 0.02  # 2% platform fee
+            agent_commission = fee(amount, AGENT_COMMISSION_RATE)  # 3% agent commission
+            platform_fee = total_fee - agent_commission  # 2% platform fee, keeps the split exact
             
             # Get agent details
-            agent = db.query(Users).filter(Users.id == agent_id).first()
+            agent = await db.scalar(select(Users).where(Users.id == int(agent_id)).limit(1))
             if not agent:
                 raise HTTPException(status_code=404, detail="Agent not found")
 
             # Credit agent's commission wallet
-            agent_wallet = db.query(Wallet).filter(
+            agent_wallet = await db.scalar(select(Wallet).where(
                 Wallet.account_id == agent.account_id,
                 Wallet.wallet_type == "agent-wallet"
-            ).first()
+            ).limit(1))
             
             if agent_wallet:
                 agent_wallet.balance += agent_commission
@@ -1046,12 +1156,12 @@ async def distribute_fees(
                 amount=agent_commission,
                 transaction_type="commission",
                 wallet_type="agent-wallet",
-                done_by=str(agent_id)
+                done_by=int(agent_id)
             )
             db.add(commission_transaction)
         else:
             # For deposits, all fee goes to platform
-            agent_commission = 0
+            agent_commission = Decimal(0)
             platform_fee = total_fee
 
         # Record system profit
@@ -1062,8 +1172,6 @@ async def distribute_fees(
         )
         db.add(profit_entry)
 
-        db.commit()
-
         return {
             "total_fee": total_fee,
             "breakdown": {
@@ -1071,15 +1179,16 @@ async def distribute_fees(
                 "platform_profit": platform_fee
             }
         }
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error in distribute_fees: {str(e)}")
-        db.rollback()
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/transactions/last-transaction")
 async def get_last_transaction(
     user: user_dependency,
-    db: db_dependency,
+    db: read_db_dependency,
     account_id: str,
     wallet_type: str = None  # Make wallet_type optional
 ):
@@ -1096,56 +1205,44 @@ async def get_last_transaction(
     if check_user.account_id != account_id and check_user.user_type not in ["admin", "manager"]:
         raise HTTPException(status_code=403, detail="Not authorized to view these transactions")
 
-    # Base query
-    query = db.query(Transaction_history).filter(
-        Transaction_history.account_id == account_id
+    # Newest transaction per wallet type in one query: number each wallet's rows
+    # newest first and keep the first, walking the (account_id, wallet_type, created_at) index
+    ranked = db.query(
+        Transaction_history.id.label("id"),
+        func.row_number().over(
+            partition_by=Transaction_history.wallet_type,
+            order_by=(Transaction_history.created_at.desc(), Transaction_history.id.desc())
+        ).label("position")
+    ).filter(
+        Transaction_history.account_id == account_id,
+        Transaction_history.wallet_type.isnot(None)
     )
 
     # Add wallet type filter if specified
     if wallet_type:
-        query = query.filter(Transaction_history.wallet_type == wallet_type)
-
-    # Get last transaction for each wallet type
-    last_transactions = {}
-    
-    if wallet_type:
-        # Get single wallet's last transaction
-        last_transaction = query.order_by(Transaction_history.created_at.desc()).first()
-        if last_transaction:
-            last_transactions[wallet_type] = {
-                "id": last_transaction.id,
-                "amount": last_transaction.amount,
-                "original_amount": last_transaction.original_amount,
-                "original_currency": last_transaction.original_currency,
-                "transaction_type": last_transaction.transaction_type,
-                "wallet_type": last_transaction.wallet_type,
-                "created_at": last_transaction.created_at,
-                "status": last_transaction.status,
-                "done_by": last_transaction.done_by
-            }
-    else:
-        # Get last transaction for each wallet type
-        wallet_types = db.query(Transaction_history.wallet_type).filter(
-            Transaction_history.account_id == account_id
-        ).distinct().all()
-        
-        for wt in wallet_types:
-            last_tx = query.filter(
-                Transaction_history.wallet_type == wt[0]
-            ).order_by(Transaction_history.created_at.desc()).first()
-            
-            if last_tx:
-                last_transactions[wt[0]] = {
-                    "id": last_tx.id,
-                    "amount": last_tx.amount,
-                    "original_amount": last_tx.original_amount,
-                    "original_currency": last_tx.original_currency,
-                    "transaction_type": last_tx.transaction_type,
-                    "wallet_type": last_tx.wallet_type,
-                    "created_at": last_tx.created_at,
-                    "status": last_tx.status,
-                    "done_by": last_tx.done_by
-                }
+        ranked = ranked.filter(Transaction_history.wallet_type == wallet_type)
+
+    ranked = ranked.subquery()
+    latest = db.query(Transaction_history).join(
+        ranked, ranked.c.id == Transaction_history.id
+    ).filter(
+        ranked.c.position == 1
+    ).order_by(Transaction_history.wallet_type).all()
+
+    last_transactions = {
+        tx.wallet_type: {
+            "id": tx.id,
+            "amount": tx.amount,
+            "original_amount": tx.original_amount,
+            "original_currency": tx.original_currency,
+            "transaction_type": tx.transaction_type,
+            "wallet_type": tx.wallet_type,
+            "created_at": tx.created_at,
+            "status": tx.status,
+            "done_by": tx.done_by
+        }
+        for tx in latest
+    }
 
     return {
         "message": "Last transactions retrieved successfully",
@@ -1155,15 +1252,22 @@ async def get_last_transaction(
 @router.get("/transactions/all")
 async def get_all_transactions(
     user: user_dependency,
-    db: db_dependency,
+    db: read_db_dependency,
     account_id: Optional[str] = None,
     wallet_type: Optional[str] = None,
     include_processed: Optional[bool] = False,
     page: int = 1,
     per_page: int = 10,
-    done_by: Optional[str] = None
+    done_by: Optional[int] = None,
+    pagination: PaginationMode = "offset",
+    cursor: Optional[str] = None,
+    with_total: Optional[bool] = None
 ):
-    """Get all transactions with pagination"""
+    """Get all transactions with pagination.
+
+    pagination=cursor pages with the next_cursor of the previous page instead
+    of page numbers, and skips the total count unless with_total is set.
+    """
     if isinstance(user, HTTPException):
         raise user
 
@@ -1173,8 +1277,20 @@ async def get_all_transactions(
         if not check_user:
             raise HTTPException(status_code=404, detail="User not found")
 
-        # Base query
-        base_query = db.query(Transaction_history)
+        # Base query, customer and agent names are joined in so a page is one query
+        customer = aliased(Users)
+        agent = aliased(Users)
+        base_query = db.query(
+            Transaction_history,
+            customer.fname.label("user_fname"),
+            customer.lname.label("user_lname"),
+            agent.fname.label("agent_fname"),
+            agent.lname.label("agent_lname")
+        ).outerjoin(
+            customer, customer.account_id == Transaction_history.account_id
+        ).outerjoin(
+            agent, agent.id == Transaction_history.done_by
+        )
 
         # Add filters based on parameters
         if account_id:
@@ -1183,31 +1299,33 @@ async def get_all_transactions(
         if wallet_type:
             base_query = base_query.filter(Transaction_history.wallet_type == wallet_type)
             
-        if done_by:
+        if done_by is not None:
             base_query = base_query.filter(Transaction_history.done_by == done_by)
         elif include_processed:
             # Include transactions processed by this user
             base_query = base_query.filter(
-                Transaction_history.done_by == str(user['user_id'])
+                Transaction_history.done_by == int(user['user_id'])
             )
 
-        # Calculate pagination
-        total_items = base_query.count()
-        total_pages = (total_items + per_page - 1) // per_page
-        skip = (page - 1) * per_page
-
         # Get paginated transactions
-        transactions = base_query.order_by(
-            Transaction_history.created_at.desc()
-        ).offset(skip).limit(per_page).all()
+        result = paginate(
+            base_query,
+            Transaction_history.created_at,
+            Transaction_history.id,
+            mode=pagination,
+            cursor=cursor,
+            skip=(page - 1) * per_page,
+            limit=per_page,
+            with_total=with_total,
+            key=lambda row: row.Transaction_history
+        )
+        total_items = result["total_items"]
+        total_pages = (total_items + per_page - 1) // per_page if total_items is not None else None
 
         # Format the response
         transaction_list = []
-        for tx in transactions:
-            # Get user details for the transaction
-            tx_user = db.query(Users).filter(Users.account_id == tx.account_id).first()
-            tx_agent = db.query(Users).filter(Users.id == int(tx.done_by)).first() if tx.done_by else None
-
+        for row in result["rows"]:
+            tx = row.Transaction_history
             transaction_list.append({
                 "id": tx.id,
                 "amount": tx.amount,
@@ -1218,9 +1336,9 @@ async def get_all_transactions(
                 "created_at": tx.created_at,
                 "status": tx.status,
                 "done_by": tx.done_by,
-                "user_name": f"{tx_user.fname} {tx_user.lname}" if tx_user else "Unknown",
-                "agent_name": f"{tx_agent.fname} {tx_agent.lname}" if tx_agent else None,
-                "is_processed_transaction": tx.done_by == str(user['user_id']),
+                "user_name": f"{row.user_fname} {row.user_lname}" if row.user_fname is not None else "Unknown",
+                "agent_name": f"{row.agent_fname} {row.agent_lname}" if row.agent_fname is not None else None,
+                "is_processed_transaction": tx.done_by == int(user['user_id']),
                 "account_id": tx.account_id
             })
 
@@ -1230,13 +1348,16 @@ async def get_all_transactions(
             "pagination": {
                 "total_items": total_items,
                 "total_pages": total_pages,
-                "current_page": page,
+                "current_page": page if pagination == "offset" else None,
                 "per_page": per_page,
-                "has_next": page < total_pages,
-                "has_prev": page > 1
+                "has_next": result["has_next"],
+                "has_prev": page > 1 if pagination == "offset" else cursor is not None,
+                "next_cursor": result["next_cursor"]
             }
         }
 
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error fetching transactions: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
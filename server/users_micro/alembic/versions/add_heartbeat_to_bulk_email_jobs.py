@@ -0,0 +1,21 @@
+"""add heartbeat_at to bulk email jobs
+
+Revision ID: add_heartbeat_to_bulk_email_jobs
+Revises: convert_users_created_at
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_heartbeat_to_bulk_email_jobs'
+down_revision = 'convert_users_created_at'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    op.add_column('bulk_email_jobs', sa.Column('heartbeat_at', sa.DateTime(), nullable=True))
+
+def downgrade() -> None:
+    op.drop_column('bulk_email_jobs', 'heartbeat_at')
@@ -0,0 +1,89 @@
+"""add composite indexes for hot lookups and unique wallet per account and type
+
+Revision ID: add_hot_path_indexes
+Revises: add_text_body_to_email_outbox
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_hot_path_indexes'
+down_revision = 'add_text_body_to_email_outbox'
+branch_labels = None
+depends_on = None
+
+# (index name, table, columns)
+INDEXES = [
+    ('ix_transaction_history_account_wallet_created', 'Transaction_history', ['account_id', 'wallet_type', 'created_at']),
+    ('ix_transaction_history_account_created', 'Transaction_history', ['account_id', 'created_at']),
+    ('ix_transaction_history_done_by_created', 'Transaction_history', ['done_by', 'created_at']),
+    ('ix_withdrawal_requests_account_created', 'withdrawal_requests', ['account_id', 'created_at']),
+    ('ix_withdrawal_requests_done_by_status_created', 'withdrawal_requests', ['done_by', 'status', 'created_at']),
+    ('ix_workers_user_id', 'workers', ['user_id']),
+    ('ix_workers_managed_by', 'workers', ['managed_by']),
+]
+
+WALLET_UNIQUE = 'unique_wallet_account_type'
+
+
+def _check_duplicate_wallets(bind):
+    """Refuse to continue while an account has two wallets of the same type, they need merging by hand"""
+    duplicates = bind.execute(sa.text(
+        'SELECT account_id, wallet_type, COUNT(*) FROM wallets '
+        'GROUP BY account_id, wallet_type HAVING COUNT(*) > 1 LIMIT 20'
+    )).fetchall()
+    if duplicates:
+        listed = ", ".join(f"{row[0]}/{row[1]} ({row[2]})" for row in duplicates)
+        raise RuntimeError(f"Duplicate wallets must be merged before adding {WALLET_UNIQUE}: {listed}")
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    _check_duplicate_wallets(bind)
+
+    if bind.dialect.name != 'postgresql':
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, columns, unique=False)
+        with op.batch_alter_table('wallets') as batch_op:
+            batch_op.create_unique_constraint(WALLET_UNIQUE, ['account_id', 'wallet_type'])
+        return
+
+    # CREATE INDEX CONCURRENTLY doesn't block writes but can't run inside a transaction.
+    # IF NOT EXISTS lets a rerun skip what finished before a failure (drop any INVALID leftovers first)
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(
+                name, table, columns, unique=False,
+                postgresql_concurrently=True, if_not_exists=True
+            )
+        op.create_index(
+            WALLET_UNIQUE, 'wallets', ['account_id', 'wallet_type'], unique=True,
+            postgresql_concurrently=True, if_not_exists=True
+        )
+        # Promoting the finished index to a constraint only takes a brief lock,
+        # skipped on a rerun where it was already promoted
+        promoted = bind.execute(
+            sa.text("SELECT 1 FROM pg_constraint WHERE conrelid = 'wallets'::regclass AND conname = :name"),
+            {"name": WALLET_UNIQUE}
+        ).scalar()
+        if not promoted:
+            op.execute(f'ALTER TABLE wallets ADD CONSTRAINT {WALLET_UNIQUE} UNIQUE USING INDEX {WALLET_UNIQUE}')
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+
+    if bind.dialect.name != 'postgresql':
+        with op.batch_alter_table('wallets') as batch_op:
+            batch_op.drop_constraint(WALLET_UNIQUE, type_='unique')
+        for name, table, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table)
+        return
+
+    with op.get_context().autocommit_block():
+        # Dropping the constraint drops its index too
+        op.drop_constraint(WALLET_UNIQUE, 'wallets', type_='unique')
+        for name, table, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
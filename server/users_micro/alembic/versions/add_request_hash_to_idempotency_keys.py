@@ -0,0 +1,21 @@
+"""add request_hash to idempotency keys
+
+Revision ID: add_request_hash_to_idempotency_keys
+Revises: add_heartbeat_to_bulk_email_jobs
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_request_hash_to_idempotency_keys'
+down_revision = 'add_heartbeat_to_bulk_email_jobs'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    op.add_column('idempotency_keys', sa.Column('request_hash', sa.String(64), nullable=True))
+
+def downgrade() -> None:
+    op.drop_column('idempotency_keys', 'request_hash')
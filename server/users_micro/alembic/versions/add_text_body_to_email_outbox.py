@@ -0,0 +1,21 @@
+"""add text_body to email outbox
+
+Revision ID: add_text_body_to_email_outbox
+Revises: create_bulk_email_jobs
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_text_body_to_email_outbox'
+down_revision = 'create_bulk_email_jobs'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    op.add_column('email_outbox', sa.Column('text_body', sa.Text(), nullable=True))
+
+def downgrade() -> None:
+    op.drop_column('email_outbox', 'text_body')
@@ -0,0 +1,121 @@
+"""convert done_by from text to an integer foreign key on users
+
+Revision ID: convert_done_by_to_user_fk
+Revises: add_hot_path_indexes
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'convert_done_by_to_user_fk'
+down_revision = 'add_hot_path_indexes'
+branch_labels = None
+depends_on = None
+
+# Rows converted per UPDATE, each batch commits on its own so locks stay short
+BATCH_SIZE = 10000
+
+# table -> (foreign key name, [(index name, columns)]) for the indexes that include done_by
+DONE_BY_TABLES = {
+    'Transaction_history': ('fk_transaction_history_done_by_users', [
+        ('ix_Transaction_history_done_by', ['done_by']),
+        ('ix_transaction_history_done_by_created', ['done_by', 'created_at']),
+    ]),
+    'withdrawal_requests': ('fk_withdrawal_requests_done_by_users', [
+        ('ix_withdrawal_requests_done_by_status_created', ['done_by', 'status', 'created_at']),
+    ]),
+}
+
+
+def _to_user_id_sql(table: str, dialect: str) -> str:
+    """UPDATE filling done_by_new with the user id for numeric done_by values of existing users"""
+    if dialect == 'postgresql':
+        # The CASE keeps the cast from ever seeing a non-numeric value
+        return (
+            f'UPDATE "{table}" AS t SET done_by_new = u.id FROM users u '
+            f"WHERE t.id > :low AND t.id <= :high "
+            f"AND u.id = CASE WHEN t.done_by ~ '^[0-9]{{1,9}}$' THEN t.done_by::integer END"
+        )
+    return (
+        f'UPDATE "{table}" SET done_by_new = '
+        f'(SELECT users.id FROM users WHERE users.id = CAST("{table}".done_by AS INTEGER)) '
+        f"WHERE id > :low AND id <= :high AND done_by != '' AND done_by NOT GLOB '*[^0-9]*'"
+    )
+
+
+def _to_text_sql(table: str, dialect: str) -> str:
+    return (
+        f'UPDATE "{table}" SET done_by_new = CAST(done_by AS VARCHAR) '
+        f'WHERE id > :low AND id <= :high AND done_by IS NOT NULL'
+    )
+
+
+def _backfill(bind, table: str, sql: str, low: int, high: int):
+    for start in range(low, high, BATCH_SIZE):
+        bind.execute(sa.text(sql), {"low": start, "high": min(start + BATCH_SIZE, high)})
+
+
+def _max_id(bind, table: str) -> int:
+    return bind.execute(sa.text(f'SELECT COALESCE(MAX(id), 0) FROM "{table}"')).scalar()
+
+
+def _convert(table: str, new_type, update_sql, to_fk: bool):
+    """Replace done_by with a new_type column, backfilled in batches before the swap"""
+    bind = op.get_bind()
+    dialect = bind.dialect.name
+    fk_name, indexes = DONE_BY_TABLES[table]
+    sql = update_sql(table, dialect)
+
+    op.add_column(table, sa.Column('done_by_new', new_type, nullable=True))
+
+    if dialect != 'postgresql':
+        _backfill(bind, table, sql, 0, _max_id(bind, table))
+        with op.batch_alter_table(table) as batch_op:
+            for name, _ in indexes:
+                batch_op.drop_index(name)
+            batch_op.drop_column('done_by')
+            batch_op.alter_column('done_by_new', new_column_name='done_by')
+        if to_fk:
+            with op.batch_alter_table(table) as batch_op:
+                batch_op.create_foreign_key(fk_name, 'users', ['done_by'], ['id'])
+        for name, columns in indexes:
+            op.create_index(name, table, columns, unique=False)
+        return
+
+    # done_by is only ever set on insert, so rows below the high-water mark are final
+    # once backfilled and only newer rows need a second pass at swap time
+    with op.get_context().autocommit_block():
+        high_water = _max_id(bind, table)
+        _backfill(bind, table, sql, 0, high_water)
+
+    # Swap in the migration's own transaction, holding off writers only for the catch-up
+    op.execute(f'LOCK TABLE "{table}" IN SHARE ROW EXCLUSIVE MODE')
+    _backfill(bind, table, sql, high_water, _max_id(bind, table))
+    # Dropping the column drops its indexes and foreign key with it
+    op.drop_column(table, 'done_by')
+    op.alter_column(table, 'done_by_new', new_column_name='done_by')
+
+    # Entering the block commits the swap
+    with op.get_context().autocommit_block():
+        for name, columns in indexes:
+            op.create_index(name, table, columns, unique=False, postgresql_concurrently=True, if_not_exists=True)
+        if to_fk:
+            # NOT VALID adds the constraint without a scan, VALIDATE then checks rows without blocking writes
+            op.execute(
+                f'ALTER TABLE "{table}" ADD CONSTRAINT {fk_name} '
+                f'FOREIGN KEY (done_by) REFERENCES users (id) NOT VALID'
+            )
+            op.execute(f'ALTER TABLE "{table}" VALIDATE CONSTRAINT {fk_name}')
+
+
+def upgrade() -> None:
+    # Values that are not the id of an existing user (none are expected) end up NULL
+    for table in DONE_BY_TABLES:
+        _convert(table, sa.Integer(), _to_user_id_sql, to_fk=True)
+
+
+def downgrade() -> None:
+    for table in DONE_BY_TABLES:
+        _convert(table, sa.String(), _to_text_sql, to_fk=False)
@@ -0,0 +1,55 @@
+"""convert money columns from float to numeric
+
+Revision ID: convert_money_to_numeric
+Revises: add_location_to_users_v3
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'convert_money_to_numeric'
+down_revision = 'add_location_to_users_v3'
+branch_labels = None
+depends_on = None
+
+# (table, column, precision, scale)
+MONEY_COLUMNS = [
+    ('wallets', 'balance', 20, 4),
+    ('Transaction_history', 'amount', 20, 4),
+    ('Transaction_history', 'original_amount', 20, 4),
+    ('withdrawal_requests', 'amount', 20, 4),
+    ('withdrawal_requests', 'withdrawal_amount', 20, 4),
+    ('withdrawal_requests', 'total_amount', 20, 4),
+    ('withdrawal_requests', 'charges', 20, 4),
+    ('withdrawal_requests', 'agent_commission', 20, 4),
+    ('withdrawal_requests', 'manager_commission', 20, 4),
+    ('withdrawal_requests', 'platform_profit', 20, 4),
+    ('workers', 'allowed_balance', 20, 4),
+    ('workers', 'available_balance', 20, 4),
+    ('profits', 'amount', 20, 4),
+    ('profits', 'transaction_amount', 20, 4),
+    ('currency_rates', 'rate_to_afriton', 20, 6),
+]
+
+def upgrade() -> None:
+    for table, column, precision, scale in MONEY_COLUMNS:
+        # Round existing float values while converting so no drift is carried over
+        op.alter_column(
+            table,
+            column,
+            type_=sa.Numeric(precision, scale),
+            existing_type=sa.Float(),
+            postgresql_using=f'ROUND("{column}"::numeric, {scale})'
+        )
+
+def downgrade() -> None:
+    for table, column, precision, scale in reversed(MONEY_COLUMNS):
+        op.alter_column(
+            table,
+            column,
+            type_=sa.Float(),
+            existing_type=sa.Numeric(precision, scale),
+            postgresql_using=f'"{column}"::double precision'
+        )
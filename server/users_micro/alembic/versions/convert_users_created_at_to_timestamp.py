@@ -0,0 +1,86 @@
+"""convert users.created_at from text to an indexed timestamp with time zone
+
+Revision ID: convert_users_created_at
+Revises: convert_done_by_to_user_fk
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'convert_users_created_at'
+down_revision = 'convert_done_by_to_user_fk'
+branch_labels = None
+depends_on = None
+
+# Rows converted per UPDATE, each batch commits on its own so locks stay short
+BATCH_SIZE = 10000
+
+INDEX_NAME = 'ix_users_created_at'
+
+# Existing values are str(datetime.utcnow()), naive UTC. Anything that doesn't look
+# like a date is left NULL rather than failing the cast
+TO_TIMESTAMP_SQL = (
+    "UPDATE users SET created_at_new = CASE "
+    "WHEN created_at ~ '^[0-9]{4}-[0-9]{2}-[0-9]{2}' THEN created_at::timestamptz END "
+    "WHERE id > :low AND id <= :high"
+)
+
+TO_TEXT_SQL = (
+    "UPDATE users SET created_at_new = to_char(created_at, 'YYYY-MM-DD HH24:MI:SS.US') "
+    "WHERE id > :low AND id <= :high"
+)
+
+
+def _backfill(bind, sql: str, low: int, high: int):
+    for start in range(low, high, BATCH_SIZE):
+        bind.execute(sa.text(sql), {"low": start, "high": min(start + BATCH_SIZE, high)})
+
+
+def _max_id(bind) -> int:
+    return bind.execute(sa.text('SELECT COALESCE(MAX(id), 0) FROM users')).scalar()
+
+
+def _convert(new_type, sql: str):
+    """Replace created_at with a new_type column, backfilled in batches before the swap"""
+    bind = op.get_bind()
+    op.add_column('users', sa.Column('created_at_new', new_type, nullable=True))
+
+    # created_at is only set on insert, so only rows added during the backfill need a second pass
+    with op.get_context().autocommit_block():
+        # Naive strings are read (and timestamps printed) as UTC whatever the server default
+        bind.execute(sa.text("SET TIME ZONE 'UTC'"))
+        high_water = _max_id(bind)
+        _backfill(bind, sql, 0, high_water)
+
+    op.execute("SET LOCAL TIME ZONE 'UTC'")
+    op.execute('LOCK TABLE users IN SHARE ROW EXCLUSIVE MODE')
+    _backfill(bind, sql, high_water, _max_id(bind))
+    op.drop_column('users', 'created_at')
+    op.alter_column('users', 'created_at_new', new_column_name='created_at')
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name != 'postgresql':
+        # SQLite keeps datetimes as text in the same format, only the declared type changes
+        with op.batch_alter_table('users') as batch_op:
+            batch_op.alter_column('created_at', type_=sa.DateTime(timezone=True), existing_type=sa.String(255))
+        op.create_index(INDEX_NAME, 'users', ['created_at'], unique=False)
+        return
+
+    _convert(sa.DateTime(timezone=True), TO_TIMESTAMP_SQL)
+    # Entering the block commits the swap
+    with op.get_context().autocommit_block():
+        op.create_index(INDEX_NAME, 'users', ['created_at'], unique=False, postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != 'postgresql':
+        op.drop_index(INDEX_NAME, table_name='users')
+        with op.batch_alter_table('users') as batch_op:
+            batch_op.alter_column('created_at', type_=sa.String(255), existing_type=sa.DateTime(timezone=True))
+        return
+
+    # Dropping the column drops its index too
+    _convert(sa.String(255), TO_TEXT_SQL)
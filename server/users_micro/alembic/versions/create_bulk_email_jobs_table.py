@@ -0,0 +1,46 @@
+"""create bulk email jobs table
+
+Revision ID: create_bulk_email_jobs
+Revises: create_email_outbox
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'create_bulk_email_jobs'
+down_revision = 'create_email_outbox'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    op.create_table(
+        'bulk_email_jobs',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('created_by', sa.Integer(), nullable=False),
+        sa.Column('subject', sa.String(255), nullable=False),
+        sa.Column('message', sa.Text(), nullable=False),
+        sa.Column('user_type', sa.String(50), nullable=False),
+        sa.Column('recipients', sa.Text(), nullable=True),
+        sa.Column('status', sa.String(20), nullable=True, server_default='queued'),
+        sa.Column('total_recipients', sa.Integer(), nullable=True, server_default='0'),
+        sa.Column('sent_count', sa.Integer(), nullable=True, server_default='0'),
+        sa.Column('failed_count', sa.Integer(), nullable=True, server_default='0'),
+        sa.Column('cursor', sa.Integer(), nullable=True, server_default='0'),
+        sa.Column('failed_recipients', sa.Text(), nullable=True),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True, server_default=sa.text('CURRENT_TIMESTAMP')),
+        sa.Column('started_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True, server_default=sa.text('CURRENT_TIMESTAMP')),
+        sa.Column('finished_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['created_by'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_bulk_email_jobs_id'), 'bulk_email_jobs', ['id'], unique=False)
+    op.create_index(op.f('ix_bulk_email_jobs_status'), 'bulk_email_jobs', ['status'], unique=False)
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_bulk_email_jobs_status'), table_name='bulk_email_jobs')
+    op.drop_index(op.f('ix_bulk_email_jobs_id'), table_name='bulk_email_jobs')
+    op.drop_table('bulk_email_jobs')
@@ -1,8 +1,32 @@
-from fastapi import Depends
+from fastapi import Depends, Request, Response
+from jose import jwt, JWTError
 from sqlalchemy.orm import Session
-from .database import engine, SessionLocal
-from typing import Annotated
+from sqlalchemy.ext.asyncio import AsyncSession
+from .database import engine, SessionLocal, AsyncSessionLocal, ReplicaSessionLocal
+from typing import Annotated, Optional
 from models.userModels import  Base
+from dotenv import load_dotenv
+import hashlib
+import hmac
+import math
+import os
+import time
+
+# Load environment variables from .env file
+load_dotenv()
+
+# Seconds after a caller's own write during which its reads stay on the primary,
+# keep it above the replica's usual lag
+READ_YOUR_WRITES_SECONDS = float(os.getenv("READ_YOUR_WRITES_SECONDS", "5"))
+
+SECRET_KEY = os.getenv("SECRET_KEY")
+ALGORITHM = os.getenv("ALGORITHM")
+
+# The write marker travels with the client (cookie, or echoed header) so every worker sees it
+READ_AFTER_WRITE_COOKIE = "read_after_write"
+READ_AFTER_WRITE_HEADER = "X-Read-After-Write"
+# Separate key so a marker can never pass for an access token
+_MARKER_KEY = hashlib.sha256(b"read-after-write:" + (SECRET_KEY or "").encode()).digest()
 
 Base.metadata.create_all(bind=engine)
 
@@ -14,4 +38,82 @@ def get_db():
         db.close()
 
 
-db_dependency = Annotated[Session, Depends(get_db)]
\ No newline at end of file
+db_dependency = Annotated[Session, Depends(get_db)]
+
+
+# Non-blocking session for async handlers, queries are awaited on the event loop
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+async_db_dependency = Annotated[AsyncSession, Depends(get_async_db)]
+
+
+def _bearer_user_id(request: Request) -> Optional[str]:
+    """User id from the request's access token, None when missing or invalid"""
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    try:
+        user_id = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM]).get("id")
+    except JWTError:
+        return None
+    return str(user_id) if user_id is not None else None
+
+
+def _sign(payload: str) -> str:
+    return hmac.new(_MARKER_KEY, payload.encode(), hashlib.sha256).hexdigest()
+
+
+def make_write_marker(user_id: str) -> str:
+    """Signed "user_id.expires.signature" marker, checkable by any worker sharing SECRET_KEY"""
+    payload = f"{user_id}.{math.ceil(time.time() + READ_YOUR_WRITES_SECONDS)}"
+    return f"{payload}.{_sign(payload)}"
+
+
+def marker_user_id(marker: Optional[str]) -> Optional[str]:
+    """User id of a valid, unexpired marker, otherwise None"""
+    try:
+        user_id, expires, signature = (marker or "").split(".")
+        if not hmac.compare_digest(signature, _sign(f"{user_id}.{expires}")):
+            return None
+        return user_id if int(expires) > time.time() else None
+    except ValueError:
+        return None
+
+
+# Dependency for routes that write: the caller's next reads stay on the primary.
+# Set on the temporary response, so it is dropped when the route raises an error
+def note_write(request: Request, response: Response):
+    user_id = _bearer_user_id(request)
+    if user_id is None:
+        return
+    marker = make_write_marker(user_id)
+    response.headers[READ_AFTER_WRITE_HEADER] = marker
+    response.set_cookie(
+        READ_AFTER_WRITE_COOKIE, marker,
+        max_age=math.ceil(READ_YOUR_WRITES_SECONDS), httponly=True, secure=True, samesite="none"
+    )
+
+
+def wrote_recently(request: Request) -> bool:
+    """Whether the marker sent back (cookie, or header for clients without cookies) belongs to this caller"""
+    marker = request.cookies.get(READ_AFTER_WRITE_COOKIE) or request.headers.get(READ_AFTER_WRITE_HEADER)
+    user_id = marker_user_id(marker)
+    return user_id is not None and user_id == _bearer_user_id(request)
+
+
+# Read-only session: the replica, or the primary right after the caller's own write
+def get_read_db(request: Request):
+    if wrote_recently(request):
+        db = SessionLocal()
+    else:
+        db = ReplicaSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+read_db_dependency = Annotated[Session, Depends(get_read_db)]
@@ -1,15 +1,60 @@
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 from dotenv import load_dotenv
+from db.pool import engine_options, instrument
 import os
 # Load environment variables from .env file
 load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL")
 
-engine = create_engine(DATABASE_URL.replace("postgres://", "postgresql://"))
+engine = instrument("primary", create_engine(
+    DATABASE_URL.replace("postgres://", "postgresql://"),
+    **engine_options(DATABASE_URL)
+))
 
 SessionLocal = sessionmaker(autocommit = False, autoflush = False, bind = engine)
 
-Base = declarative_base()
\ No newline at end of file
+# Optional streaming replica for dashboards and listings, reads use the primary when unset
+REPLICA_DATABASE_URL = os.getenv("REPLICA_DATABASE_URL")
+
+if REPLICA_DATABASE_URL:
+    replica_engine = instrument("replica", create_engine(
+        REPLICA_DATABASE_URL.replace("postgres://", "postgresql://"),
+        **engine_options(REPLICA_DATABASE_URL)
+    ))
+    ReplicaSessionLocal = sessionmaker(autocommit = False, autoflush = False, bind = replica_engine)
+else:
+    replica_engine = None
+    ReplicaSessionLocal = SessionLocal
+
+
+def to_async_url(url: str):
+    """Same database, asyncio driver: asyncpg for Postgres, aiosqlite for SQLite"""
+    url = make_url(url.replace("postgres://", "postgresql://"))
+    backend = url.get_backend_name()
+    if backend == "postgresql":
+        url = url.set(drivername="postgresql+asyncpg")
+        # asyncpg takes ssl=... instead of libpq's sslmode=...
+        if "sslmode" in url.query:
+            sslmode = url.query["sslmode"]
+            url = url.difference_update_query(["sslmode"]).update_query_dict({"ssl": sslmode})
+    elif backend == "sqlite":
+        url = url.set(drivername="sqlite+aiosqlite")
+    return url
+
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or to_async_url(DATABASE_URL)
+
+async_engine = instrument("primary_async", create_async_engine(
+    ASYNC_DATABASE_URL,
+    **engine_options(DATABASE_URL, is_async=True)
+))
+
+# Objects stay usable after commit: reloading expired attributes would need an await
+AsyncSessionLocal = async_sessionmaker(bind = async_engine, autoflush = False, expire_on_commit = False)
+
+Base = declarative_base()
@@ -0,0 +1,177 @@
+import os
+import threading
+import time
+from typing import Dict, List
+
+from sqlalchemy import exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from dotenv import load_dotenv
+
+# Load environment variables from .env file
+load_dotenv()
+
+# Size these so workers * (DB_POOL_SIZE + DB_MAX_OVERFLOW) * engines stays under Postgres max_connections
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+# Seconds a request waits for a free connection before failing
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+# Connections older than this are replaced, keep it under any server/proxy idle timeout
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+# Test connections on checkout so ones dropped by Postgres are replaced instead of failing a request
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+# Connections opened at startup so the first requests don't pay for connecting
+DB_POOL_WARMUP = int(os.getenv("DB_POOL_WARMUP", str(DB_POOL_SIZE)))
+
+# Upper bounds (ms) of the checkout wait histogram buckets, the last bucket is open ended
+WAIT_BUCKETS_MS = [1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000]
+
+
+class PoolStats:
+    """Checkout wait times for one pool, shared across pool re-creations"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.buckets = [0] * (len(WAIT_BUCKETS_MS) + 1)
+        self.checkouts = 0
+        self.timeouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def observe(self, seconds: float):
+        ms = seconds * 1000
+        index = len(WAIT_BUCKETS_MS)
+        for i, bound in enumerate(WAIT_BUCKETS_MS):
+            if ms <= bound:
+                index = i
+                break
+        with self._lock:
+            self.buckets[index] += 1
+            self.checkouts += 1
+            self.total_wait += seconds
+            self.max_wait = max(self.max_wait, seconds)
+
+    def record_timeout(self):
+        with self._lock:
+            self.timeouts += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            labels = [f"<={bound}ms" for bound in WAIT_BUCKETS_MS] + [f">{WAIT_BUCKETS_MS[-1]}ms"]
+            return {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "avg_wait_ms": round(self.total_wait / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+                "max_wait_ms": round(self.max_wait * 1000, 3),
+                "wait_histogram": dict(zip(labels, self.buckets))
+            }
+
+
+class _InstrumentedPool:
+    """Times how long each checkout waits for a connection"""
+
+    stats: PoolStats = None
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            if self.stats:
+                self.stats.record_timeout()
+            raise
+        if self.stats:
+            self.stats.observe(time.perf_counter() - start)
+        return connection
+
+    def recreate(self):
+        # engine.dispose() swaps in a new pool, keep counting into the same stats
+        pool = super().recreate()
+        pool.stats = self.stats
+        return pool
+
+
+class InstrumentedQueuePool(_InstrumentedPool, QueuePool):
+    pass
+
+
+class InstrumentedAsyncQueuePool(_InstrumentedPool, AsyncAdaptedQueuePool):
+    pass
+
+
+def engine_options(url: str, is_async: bool = False) -> dict:
+    """Pool keyword arguments for create_engine / create_async_engine"""
+    if make_url(url.replace("postgres://", "postgresql://")).get_backend_name() == "sqlite":
+        # SQLite has no server connections to size, keep SQLAlchemy's default pool
+        return {}
+    return {
+        "poolclass": InstrumentedAsyncQueuePool if is_async else InstrumentedQueuePool,
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }
+
+
+_instrumented_pools: Dict[str, object] = {}
+
+
+def instrument(name: str, engine):
+    """Attach wait-time stats to an engine's pool and list it in pool_metrics()"""
+    pool = getattr(engine, "sync_engine", engine).pool
+    if isinstance(pool, _InstrumentedPool):
+        pool.stats = PoolStats()
+    _instrumented_pools[name] = engine
+    return engine
+
+
+def _warm_up_count(engine, count: int) -> int:
+    # Never open more than the pool keeps, extra connections would just be closed again
+    pool = getattr(engine, "sync_engine", engine).pool
+    return min(count, pool.size()) if isinstance(pool, QueuePool) else 0
+
+
+def warm_up(engine, count: int = DB_POOL_WARMUP):
+    """Open `count` pooled connections and return them to the pool"""
+    connections = []
+    try:
+        for _ in range(_warm_up_count(engine, count)):
+            connections.append(engine.connect())
+    finally:
+        for connection in connections:
+            connection.close()
+
+
+async def warm_up_async(engine, count: int = DB_POOL_WARMUP):
+    """warm_up() for an async engine"""
+    connections = []
+    try:
+        for _ in range(_warm_up_count(engine, count)):
+            connections.append(await engine.connect())
+    finally:
+        for connection in connections:
+            await connection.close()
+
+
+def pool_metrics() -> List[dict]:
+    """Current state of every instrumented pool"""
+    metrics = []
+    for name, engine in _instrumented_pools.items():
+        pool = getattr(engine, "sync_engine", engine).pool
+        entry = {"engine": name, "pool_class": type(pool).__name__}
+        if isinstance(pool, QueuePool):
+            entry.update({
+                "size": pool.size(),
+                "checked_in": pool.checkedin(),
+                "checked_out": pool.checkedout(),
+                "overflow": pool.overflow(),
+                "timeout": pool.timeout(),
+            })
+        if isinstance(pool, _InstrumentedPool):
+            # Instrumented pools are only built from engine_options(), so this is their limit
+            entry["max_overflow"] = DB_MAX_OVERFLOW
+            if pool.stats:
+                entry.update(pool.stats.snapshot())
+        metrics.append(entry)
+    return metrics
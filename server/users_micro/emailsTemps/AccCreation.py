@@ -1,5 +1,6 @@
-def account_completion_email(names):
-    return f"""
+from emailsTemps.registry import RenderedEmail, register_template
+
+ACCOUNT_COMPLETION_HTML = """
 <!DOCTYPE html>
 <html lang="en">
 <head>
@@ -36,3 +37,25 @@ def account_completion_email(names):
 </body>
 </html>
 """
+
+ACCOUNT_COMPLETION_TEXT = """Hi {names},
+
+Congratulations on completing your AfriTon account setup!
+
+You're now ready to send and receive money across borders with ease. To ensure your account remains secure, please verify your email address as soon as possible.
+
+Start enjoying features like real-time conversion to Afritons, secure transactions, and seamless withdrawals in your preferred currency.
+
+If you have any questions or need assistance, our support team is available 24/7 to help you.
+
+Best regards,
+The AfriTon Team
+
+Visit our website: https://www.afriton.com/
+"""
+
+_template = register_template("account_completion", ACCOUNT_COMPLETION_HTML, ACCOUNT_COMPLETION_TEXT)
+
+
+def account_completion_email(names) -> RenderedEmail:
+    return _template.render(names=names)
@@ -0,0 +1,69 @@
+from emailsTemps.registry import Markup, RenderedEmail, register_template
+
+BROADCAST_HTML = """
+<!DOCTYPE html>
+<html>
+    <head>
+        <meta charset="utf-8">
+    </head>
+    <body style="font-family: Arial, sans-serif; line-height: 1.6; margin: 0; padding: 20px; background-color: #f4f4f4;">
+        <div style="max-width: 600px; margin: 0 auto; background-color: #ffffff; padding: 20px; border-radius: 5px; box-shadow: 0 2px 5px rgba(0,0,0,0.1);">
+            <h1 style="color: #333333; font-size: 24px; margin-bottom: 20px; padding-bottom: 10px; border-bottom: 2px solid #f0f0f0;">
+                {subject}
+            </h1>
+            <div style="color: #666666; padding: 20px 0;">
+                {message}
+            </div>
+            <div style="margin-top: 20px; padding-top: 20px; border-top: 2px solid #f0f0f0; font-size: 12px; color: #999999; text-align: center;">
+                This is an automated message from Afriton. Please do not reply to this email.
+            </div>
+        </div>
+    </body>
+</html>
+"""
+
+BROADCAST_TEXT = """{subject}
+
+{message}
+
+--
+This is an automated message from Afriton. Please do not reply to this email.
+"""
+
+MESSAGE_HTML = """
+<!DOCTYPE html>
+<html>
+    <head>
+        <meta charset="utf-8">
+    </head>
+    <body style="font-family: Arial, sans-serif; line-height: 1.6; margin: 0; padding: 20px; background-color: #f4f4f4;">
+        <div style="max-width: 600px; margin: 0 auto; background-color: #ffffff; padding: 20px; border-radius: 5px; box-shadow: 0 2px 5px rgba(0,0,0,0.1);">
+            <div style="color: #666666; padding: 20px 0;">
+                {message}
+            </div>
+            <div style="margin-top: 20px; padding-top: 20px; border-top: 2px solid #f0f0f0; font-size: 12px; color: #999999; text-align: center;">
+                This is an automated message from Afriton. Please do not reply to this email.
+            </div>
+        </div>
+    </body>
+</html>
+"""
+
+MESSAGE_TEXT = """{message}
+
+--
+This is an automated message from Afriton. Please do not reply to this email.
+"""
+
+_broadcast = register_template("broadcast", BROADCAST_HTML, BROADCAST_TEXT)
+_message = register_template("message", MESSAGE_HTML, MESSAGE_TEXT)
+
+
+def broadcast_email(subject, message) -> RenderedEmail:
+    """Admin broadcast, the subject is escaped and the admin's message kept as HTML"""
+    return _broadcast.render(subject=subject, message=Markup(message))
+
+
+def message_email(message) -> RenderedEmail:
+    """Plain Afriton layout around an HTML message"""
+    return _message.render(message=Markup(message))
@@ -1,5 +1,6 @@
-def custom_email(names, heading, msg):
-    return f"""
+from emailsTemps.registry import Markup, RenderedEmail, register_template
+
+CUSTOM_EMAIL_HTML = """
 <!DOCTYPE html>
 <html lang="en">
 <head>
@@ -33,3 +34,24 @@ def custom_email(names, heading, msg):
 </body>
 </html>
 """
+
+CUSTOM_EMAIL_TEXT = """Hi {names},
+
+{heading}
+
+{msg}
+
+If you have any questions or need assistance, our support team is available 24/7 to help you.
+
+Best regards,
+The AfriTon Team
+
+Visit our website: https://www.afriton.com/
+"""
+
+_template = register_template("custom_email", CUSTOM_EMAIL_HTML, CUSTOM_EMAIL_TEXT)
+
+
+def custom_email(names, heading, msg) -> RenderedEmail:
+    # names and heading are escaped, msg is HTML composed by our endpoints with user values escaped
+    return _template.render(names=names, heading=heading, msg=Markup(msg))
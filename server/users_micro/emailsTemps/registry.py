@@ -0,0 +1,108 @@
+import html
+import re
+from functools import lru_cache
+from string import Formatter
+from typing import Dict, List, Tuple
+
+
+class Markup(str):
+    """Trusted HTML, inserted into templates as is instead of being escaped"""
+
+
+class RenderedEmail(str):
+    """Rendered HTML body that also carries its plain-text alternative.
+
+    It is a str so it can be passed anywhere an HTML body was passed before.
+    """
+
+    def __new__(cls, html_body: str, text: str):
+        email = super().__new__(cls, html_body)
+        email.text = text
+        return email
+
+
+def escape(value) -> str:
+    """HTML-escape a value unless it is Markup"""
+    if isinstance(value, Markup):
+        return value
+    return html.escape(str(value), quote=True)
+
+
+_SKIPPED_BLOCKS = re.compile(r"<(head|style|script)\b.*?</\1>", re.IGNORECASE | re.DOTALL)
+_LINE_BREAKS = re.compile(r"<br\s*/?>|</(p|div|h[1-6]|li|ul|ol|tr)>", re.IGNORECASE)
+_LIST_ITEMS = re.compile(r"<li\b[^>]*>", re.IGNORECASE)
+_TAGS = re.compile(r"<[^>]+>")
+_BLANK_LINES = re.compile(r"\n{3,}")
+
+
+@lru_cache(maxsize=512)
+def html_to_text(value: str) -> str:
+    """Plain-text version of an HTML fragment or document"""
+    text = _SKIPPED_BLOCKS.sub("", value)
+    text = _LINE_BREAKS.sub("\n", text)
+    text = _LIST_ITEMS.sub("- ", text)
+    text = html.unescape(_TAGS.sub("", text))
+    lines = [" ".join(line.split()) for line in text.splitlines()]
+    return _BLANK_LINES.sub("\n\n", "\n".join(lines)).strip()
+
+
+class EmailTemplate:
+    """An email layout split once into static chunks and {field} slots.
+
+    Rendering only escapes the field values and joins them with the
+    precompiled chunks, the static shell is never re-parsed or re-built.
+    """
+
+    def __init__(self, name: str, html_source: str, text_source: str):
+        self.name = name
+        self._html = self._compile(html_source)
+        self._text = self._compile(text_source)
+
+    @staticmethod
+    def _compile(source: str) -> Tuple[List[str], List[Tuple[int, str]]]:
+        """Split a layout into its static chunks plus (position, field) slots"""
+        chunks = []
+        slots = []
+        for literal, field, _, _ in Formatter().parse(source):
+            if literal:
+                chunks.append(literal)
+            if field is not None:
+                slots.append((len(chunks), field))
+                chunks.append("")
+        return chunks, slots
+
+    @staticmethod
+    def _fill(compiled: Tuple[List[str], List[Tuple[int, str]]], values: Dict[str, str]) -> str:
+        chunks, slots = compiled
+        parts = chunks.copy()
+        for position, field in slots:
+            parts[position] = values[field]
+        return "".join(parts)
+
+    def render(self, **fields) -> RenderedEmail:
+        """Render both parts. Values are escaped unless wrapped in Markup"""
+        html_values = {name: escape(value) for name, value in fields.items()}
+        text_values = {
+            name: html_to_text(value) if isinstance(value, Markup) else str(value)
+            for name, value in fields.items()
+        }
+        return RenderedEmail(self._fill(self._html, html_values), self._fill(self._text, text_values))
+
+
+_templates: Dict[str, EmailTemplate] = {}
+
+
+def register_template(name: str, html_source: str, text_source: str) -> EmailTemplate:
+    """Compile a layout and make it available by name"""
+    template = EmailTemplate(name, html_source, text_source)
+    _templates[name] = template
+    return template
+
+
+def get_template(name: str) -> EmailTemplate:
+    return _templates[name]
+
+
+def render_email(name: str, **fields) -> RenderedEmail:
+    """Render a registered template"""
+    return _templates[name].render(**fields)
@@ -0,0 +1,211 @@
+import asyncio
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from db.database import ReplicaSessionLocal
+from functions.money import round_afriton
+from models.userModels import Users, Transaction_history, Wallet, Workers, Profit
+from dotenv import load_dotenv
+
+# Load environment variables from .env file
+load_dotenv()
+
+# How often the background task rebuilds the admin dashboard
+ADMIN_DASHBOARD_REFRESH_SECONDS = float(os.getenv("ADMIN_DASHBOARD_REFRESH_SECONDS", "30"))
+# A snapshot older than this (refresher disabled or failing) is rebuilt by the request instead
+ADMIN_DASHBOARD_MAX_AGE_SECONDS = float(os.getenv("ADMIN_DASHBOARD_MAX_AGE_SECONDS", "120"))
+
+
+def _amount(value) -> float:
+    # Exact Numeric sums have 4 decimals, rounding only drops float noise on SQLite
+    return float(round_afriton(value))
+
+
+def build_admin_dashboard(db: Session) -> dict:
+    """Compute the admin dashboard with a handful of aggregate queries"""
+    now = datetime.utcnow()
+    today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    this_month = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    last_month = (this_month - timedelta(days=1)).replace(day=1)
+    thirty_days_ago = now - timedelta(days=30)
+
+    # User statistics in one pass, Users.created_at is timezone aware
+    users = db.query(
+        func.count(Users.id).label("total"),
+        func.count(Users.id).filter(Users.user_type == "agent").label("agents"),
+        func.count(Users.id).filter(Users.user_type == "manager").label("managers"),
+        func.count(Users.id).filter(Users.acc_status == True).label("active"),
+        func.count(Users.id).filter(Users.created_at >= thirty_days_ago.replace(tzinfo=timezone.utc)).label("new_30_days"),
+        func.count(Users.id).filter(Users.created_at >= today.replace(tzinfo=timezone.utc)).label("new_today")
+    ).one()
+
+    # Transaction statistics in one pass over the period the dashboard looks at
+    last_30_days = Transaction_history.created_at >= thirty_days_ago
+    since_today = Transaction_history.created_at >= today
+    transactions = db.query(
+        func.coalesce(func.sum(func.abs(Transaction_history.amount)).filter(last_30_days), 0).label("volume"),
+        func.coalesce(func.sum(Transaction_history.amount).filter(
+            last_30_days,
+            Transaction_history.transaction_type == "deposit",
+            Transaction_history.amount > 0
+        ), 0).label("deposits"),
+        func.coalesce(func.sum(func.abs(Transaction_history.amount)).filter(
+            last_30_days,
+            Transaction_history.transaction_type == "withdrawal",
+            Transaction_history.amount < 0
+        ), 0).label("withdrawals"),
+        func.count(Transaction_history.id).filter(Transaction_history.created_at >= this_month).label("this_month"),
+        func.count(Transaction_history.id).filter(
+            Transaction_history.created_at >= last_month,
+            Transaction_history.created_at < this_month
+        ).label("last_month"),
+        func.count(Transaction_history.id).filter(since_today).label("today"),
+        func.coalesce(func.sum(Transaction_history.amount).filter(since_today), 0).label("today_volume")
+    ).filter(
+        Transaction_history.created_at >= min(thirty_days_ago, last_month)
+    ).one()
+
+    # Commission and profit totals
+    totals = db.query(
+        select(func.coalesce(func.sum(Wallet.balance), 0)).where(
+            Wallet.wallet_type.in_(["agent-wallet", "manager-wallet"])
+        ).scalar_subquery().label("commission"),
+        select(func.coalesce(func.sum(Profit.amount), 0)).scalar_subquery().label("profit")
+    ).one()
+
+    # Location statistics, volume is summed per worker first so each worker is counted once
+    worker_volume = db.query(
+        Transaction_history.done_by.label("user_id"),
+        func.sum(Transaction_history.amount).label("volume")
+    ).group_by(Transaction_history.done_by).subquery()
+    location_stats = db.query(
+        Workers.location,
+        func.count(Workers.id).label("agent_count"),
+        func.coalesce(func.sum(worker_volume.c.volume), 0).label("volume")
+    ).outerjoin(
+        worker_volume, worker_volume.c.user_id == Workers.user_id
+    ).group_by(Workers.location).all()
+
+    # Recent activities
+    recent_activities = db.query(
+        Transaction_history,
+        Users.fname,
+        Users.lname,
+        Users.email
+    ).join(
+        Users,
+        Users.id == Transaction_history.done_by
+    ).filter(
+        last_30_days
+    ).order_by(
+        Transaction_history.created_at.desc()
+    ).limit(10).all()
+
+    return {
+        "overview": {
+            "total_users": users.total,
+            "total_agents": users.agents,
+            "total_managers": users.managers,
+            "active_users": users.active,
+            "total_volume": _amount(transactions.volume),
+            "total_deposits": _amount(transactions.deposits),
+            "total_withdrawals": _amount(transactions.withdrawals),
+            "total_commission": _amount(totals.commission),
+            "total_profit": _amount(totals.profit)
+        },
+        "growth": {
+            "monthly_transaction_growth": (
+                ((transactions.this_month - transactions.last_month) / transactions.last_month * 100)
+                if transactions.last_month > 0 else 0
+            ),
+            "user_growth": users.new_30_days
+        },
+        "location_stats": [{
+            "location": stat.location,
+            "agent_count": stat.agent_count,
+            "volume": _amount(stat.volume)
+        } for stat in location_stats],
+        "recent_activities": [{
+            "id": activity.Transaction_history.id,
+            "type": activity.Transaction_history.transaction_type,
+            "amount": float(activity.Transaction_history.amount) if activity.Transaction_history.amount else 0,
+            "created_at": activity.Transaction_history.created_at,
+            "user": f"{activity.fname} {activity.lname}",
+            "email": activity.email
+        } for activity in recent_activities],
+        "daily_stats": {
+            "transactions": transactions.today,
+            "new_users": users.new_today,
+            "volume": _amount(transactions.today_volume)
+        },
+        "as_of": datetime.now(timezone.utc)
+    }
+
+
+class AdminDashboardCache:
+    """Latest admin dashboard, rebuilt in the background so admins never wait on it"""
+
+    def __init__(self, max_age: float = ADMIN_DASHBOARD_MAX_AGE_SECONDS):
+        self.max_age = max_age
+        self._snapshot: Optional[dict] = None
+        self._built_at = 0.0
+        self._lock = threading.Lock()
+
+    def _fresh(self) -> bool:
+        return self._snapshot is not None and time.monotonic() - self._built_at < self.max_age
+
+    def _store(self, snapshot: dict):
+        self._snapshot = snapshot
+        self._built_at = time.monotonic()
+
+    @staticmethod
+    def _build() -> dict:
+        """Build a snapshot on a session of its own"""
+        db = ReplicaSessionLocal()
+        try:
+            return build_admin_dashboard(db)
+        finally:
+            db.close()
+
+    def _rebuild_if_stale(self) -> dict:
+        with self._lock:
+            # Another request may have rebuilt it while we waited for the lock
+            if not self._fresh():
+                self._store(self._build())
+            return self._snapshot
+
+    async def get(self) -> dict:
+        """Return the snapshot, rebuilding it only when missing or too old.
+
+        The rebuild runs in a worker thread so the event loop keeps serving,
+        one request builds and concurrent ones wait for its result.
+        """
+        if self._fresh():
+            return self._snapshot
+        return await run_in_threadpool(self._rebuild_if_stale)
+
+    def refresh(self):
+        """Rebuild the snapshot, used by the background refresher"""
+        snapshot = self._build()
+        with self._lock:
+            self._store(snapshot)
+
+
+admin_dashboard_cache = AdminDashboardCache()
+
+
+async def run_admin_dashboard_refresher():
+    """Background loop that keeps the admin dashboard snapshot current until cancelled"""
+    while True:
+        try:
+            await asyncio.to_thread(admin_dashboard_cache.refresh)
+        except Exception as e:
+            print(f"Error refreshing admin dashboard: {str(e)}")
+        await asyncio.sleep(ADMIN_DASHBOARD_REFRESH_SECONDS)
@@ -0,0 +1,242 @@
+import asyncio
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from email.utils import formataddr
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import func, or_
+from sqlalchemy.orm import Session
+
+from db.database import SessionLocal
+from emailsTemps.broadcast_email import broadcast_email
+from functions.send_mulltiple import ADROIT_USERNAME, ADROIT_PASSWORD, ADROIT_SENDER_EMAIL
+from functions.smtp_pool import get_smtp_pool
+from models.userModels import BulkEmailJob, Users
+from dotenv import load_dotenv
+
+# Load environment variables from .env file
+load_dotenv()
+
+# Recipients loaded from the database per round-trip (and progress commit)
+BULK_EMAIL_CHUNK_SIZE = int(os.getenv("BULK_EMAIL_CHUNK_SIZE", "500"))
+# Messages sent in parallel, each over its own pooled SMTP connection
+BULK_EMAIL_WORKERS = int(os.getenv("BULK_EMAIL_WORKERS", "4"))
+# Upper bound on messages per second across all workers, 0 disables pacing
+BULK_EMAIL_RATE_PER_SECOND = float(os.getenv("BULK_EMAIL_RATE_PER_SECOND", "10"))
+# Recipients per message. 1 sends individual messages, more sends them as BCC
+BULK_EMAIL_BCC_SIZE = int(os.getenv("BULK_EMAIL_BCC_SIZE", "1"))
+BULK_EMAIL_POLL_SECONDS = float(os.getenv("BULK_EMAIL_POLL_SECONDS", "5"))
+# A running job refreshes its heartbeat this often, however long a chunk takes
+BULK_EMAIL_HEARTBEAT_SECONDS = float(os.getenv("BULK_EMAIL_HEARTBEAT_SECONDS", "30"))
+# A running job whose heartbeat is older than this lost its worker and is picked up again
+BULK_EMAIL_STALE_SECONDS = float(os.getenv("BULK_EMAIL_STALE_SECONDS", "300"))
+# Failed recipients kept on the job for reporting
+MAX_REPORTED_FAILURES = 100
+
+
+def _recipient_query(db: Session, user_type: str):
+    query = db.query(Users.id, Users.email).filter(Users.email.isnot(None), Users.email != "")
+    if user_type != "all":
+        query = query.filter(Users.user_type == user_type)
+    return query
+
+
+def count_recipients(db: Session, user_type: str, emails: Optional[List[str]] = None) -> int:
+    """Number of recipients a job would send to, without loading them"""
+    if emails:
+        return len(emails)
+    return _recipient_query(db, user_type).count()
+
+
+def _next_chunk(db: Session, job: BulkEmailJob) -> Tuple[List[str], int]:
+    """Return the next chunk of recipients after the job's cursor and the new cursor"""
+    cursor = job.cursor or 0
+    if job.recipients:
+        # Explicit list, the cursor is the list position
+        emails = json.loads(job.recipients)[cursor:cursor + BULK_EMAIL_CHUNK_SIZE]
+        return emails, cursor + len(emails)
+
+    # Keyset over Users.id so each chunk is an index range scan, however far in we are
+    rows = _recipient_query(db, job.user_type).filter(
+        Users.id > cursor
+    ).order_by(Users.id).limit(BULK_EMAIL_CHUNK_SIZE).all()
+    if not rows:
+        return [], cursor
+    return [row.email for row in rows], rows[-1].id
+
+
+class _RateLimiter:
+    """Spaces calls evenly so all workers together stay under a rate"""
+
+    def __init__(self, per_second: float):
+        self.interval = 1.0 / per_second if per_second > 0 else 0
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(self._next, now)
+            self._next = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+def _build_body(subject: str, message: str) -> str:
+    """Render and serialize the message once per job, only the To header differs per send"""
+    rendered = broadcast_email(subject, message)
+    msg = MIMEMultipart("alternative")
+    msg['From'] = formataddr(("Afriton", ADROIT_SENDER_EMAIL))
+    msg['Subject'] = subject
+    msg.attach(MIMEText(rendered.text, 'plain', 'utf-8'))
+    msg.attach(MIMEText(rendered, 'html', 'utf-8'))
+    return msg.as_string()
+
+
+def _build_message(recipients: List[str], body: str) -> str:
+    # Several recipients go in the envelope only (BCC) so nobody sees the others
+    to = recipients[0] if len(recipients) == 1 else "undisclosed-recipients:;"
+    return "To: " + to.replace("\r", "").replace("\n", "") + "\n" + body
+
+
+def _send_batch(recipients: List[str], body: str, limiter: _RateLimiter) -> Dict[str, str]:
+    """Send one message, returning the error for each recipient that didn't get it"""
+    limiter.wait()
+    try:
+        refused = get_smtp_pool(ADROIT_USERNAME, ADROIT_PASSWORD).send(
+            ADROIT_SENDER_EMAIL, recipients, _build_message(recipients, body)
+        )
+        # Part of a BCC batch can be refused while the rest is delivered
+        return {email: f"{code} {reply.decode(errors='replace')}" for email, (code, reply) in (refused or {}).items()}
+    except Exception as e:
+        return {email: str(e) for email in recipients}
+
+
+def _beat(job_id: int):
+    db = SessionLocal()
+    try:
+        db.query(BulkEmailJob).filter(
+            BulkEmailJob.id == job_id, BulkEmailJob.status == "running"
+        ).update({"heartbeat_at": datetime.utcnow()}, synchronize_session=False)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        print(f"Bulk email job {job_id} heartbeat failed: {str(e)}")
+    finally:
+        db.close()
+
+
+def _heartbeat(job_id: int, stop: threading.Event):
+    """Keep the job's heartbeat fresh until stopped, so a slow chunk isn't taken for a dead worker"""
+    while not stop.wait(BULK_EMAIL_HEARTBEAT_SECONDS):
+        _beat(job_id)
+
+
+def run_bulk_email_job(job_id: int):
+    """Send a job chunk by chunk, committing progress after each chunk so it can resume"""
+    db = SessionLocal()
+    limiter = _RateLimiter(BULK_EMAIL_RATE_PER_SECOND)
+    stop = threading.Event()
+    threading.Thread(target=_heartbeat, args=(job_id, stop), daemon=True).start()
+    try:
+        job = db.query(BulkEmailJob).filter(BulkEmailJob.id == job_id).first()
+        if not job:
+            return
+        # Plain values only in the worker threads, the session isn't thread safe
+        body = _build_body(job.subject, job.message)
+        failures = json.loads(job.failed_recipients or "[]")
+
+        with ThreadPoolExecutor(max_workers=BULK_EMAIL_WORKERS) as executor:
+            while True:
+                emails, cursor = _next_chunk(db, job)
+                # End the read transaction so the connection isn't left idle in it while SMTP runs
+                db.commit()
+                if not emails:
+                    break
+
+                batches = [emails[i:i + BULK_EMAIL_BCC_SIZE] for i in range(0, len(emails), BULK_EMAIL_BCC_SIZE)]
+                # Wait for the whole chunk before touching the job, which would start a new transaction
+                results = list(executor.map(lambda batch: _send_batch(batch, body, limiter), batches))
+                for batch, errors in zip(batches, results):
+                    job.sent_count += len(batch) - len(errors)
+                    job.failed_count += len(errors)
+                    for email, error in errors.items():
+                        job.last_error = error
+                        if len(failures) < MAX_REPORTED_FAILURES:
+                            failures.append({"email": email, "error": error})
+
+                job.cursor = cursor
+                job.failed_recipients = json.dumps(failures)
+                job.updated_at = datetime.utcnow()
+                job.heartbeat_at = job.updated_at
+                db.commit()
+
+        job.status = "completed"
+        job.finished_at = datetime.utcnow()
+        job.updated_at = job.finished_at
+        db.commit()
+        print(f"Bulk email job {job.id} done: {job.sent_count} sent, {job.failed_count} failed")
+    except Exception as e:
+        db.rollback()
+        print(f"Bulk email job {job_id} failed: {str(e)}")
+        job = db.query(BulkEmailJob).filter(BulkEmailJob.id == job_id).first()
+        if job:
+            job.status = "failed"
+            job.last_error = str(e)
+            job.finished_at = datetime.utcnow()
+            job.updated_at = job.finished_at
+            db.commit()
+    finally:
+        stop.set()
+        db.close()
+
+
+def claim_bulk_email_job() -> Optional[int]:
+    """Mark the oldest queued (or orphaned running) job as running and return its id.
+
+    An orphaned job resumes from the cursor of its last committed chunk.
+    """
+    db = SessionLocal()
+    try:
+        stale_before = datetime.utcnow() - timedelta(seconds=BULK_EMAIL_STALE_SECONDS)
+        job = db.query(BulkEmailJob).filter(
+            or_(
+                BulkEmailJob.status == "queued",
+                (BulkEmailJob.status == "running") & (
+                    func.coalesce(BulkEmailJob.heartbeat_at, BulkEmailJob.updated_at) < stale_before
+                )
+            )
+        ).order_by(BulkEmailJob.id).with_for_update(skip_locked=True).first()
+        if not job:
+            return None
+
+        job.status = "running"
+        job.started_at = job.started_at or datetime.utcnow()
+        job.updated_at = datetime.utcnow()
+        job.heartbeat_at = job.updated_at
+        db.commit()
+        return job.id
+    except Exception as e:
+        db.rollback()
+        print(f"Error claiming bulk email job: {str(e)}")
+        return None
+    finally:
+        db.close()
+
+
+async def run_bulk_email_worker():
+    """Background loop that runs queued bulk email jobs until cancelled"""
+    while True:
+        job_id = await asyncio.to_thread(claim_bulk_email_job)
+        if job_id is None:
+            await asyncio.sleep(BULK_EMAIL_POLL_SECONDS)
+            continue
+        await asyncio.to_thread(run_bulk_email_job, job_id)
@@ -0,0 +1,110 @@
+import asyncio
+import os
+from datetime import datetime, timedelta
+
+from sqlalchemy.orm import Session
+
+from db.database import SessionLocal
+from functions.send_mail import send_new_email
+from functions.smtp_pool import SMTPDeliveryUnknown
+from models.userModels import EmailOutbox
+from dotenv import load_dotenv
+
+# Load environment variables from .env file
+load_dotenv()
+
+EMAIL_OUTBOX_BATCH_SIZE = int(os.getenv("EMAIL_OUTBOX_BATCH_SIZE", "50"))
+EMAIL_OUTBOX_POLL_SECONDS = float(os.getenv("EMAIL_OUTBOX_POLL_SECONDS", "2"))
+EMAIL_OUTBOX_MAX_ATTEMPTS = int(os.getenv("EMAIL_OUTBOX_MAX_ATTEMPTS", "5"))
+# How long claimed emails stay reserved for the worker sending them, keep it above
+# the time a batch can take (EMAIL_OUTBOX_BATCH_SIZE x SMTP_TIMEOUT at worst)
+EMAIL_OUTBOX_LEASE_SECONDS = float(os.getenv("EMAIL_OUTBOX_LEASE_SECONDS", "1800"))
+
+
+def queue_email(db: Session, to_email: str, subject: str, body: str) -> EmailOutbox:
+    """Add an email to the outbox as part of the caller's transaction (no commit)"""
+    email = EmailOutbox(
+        to_email=to_email,
+        subject=subject,
+        body=body,
+        text_body=getattr(body, "text", None),
+        status="pending"
+    )
+    db.add(email)
+    return email
+
+
+def _claim_due_emails(db: Session, batch_size: int) -> list:
+    """Lease a batch of due emails to this worker and commit, so no lock is held while sending"""
+    now = datetime.utcnow()
+    # SKIP LOCKED lets several workers claim at once without taking the same row,
+    # "sending" rows are only due again once their lease ran out (the worker died)
+    emails = db.query(EmailOutbox).filter(
+        EmailOutbox.status.in_(["pending", "sending"]),
+        EmailOutbox.next_attempt_at <= now
+    ).order_by(EmailOutbox.id).limit(batch_size).with_for_update(skip_locked=True).all()
+
+    for email in emails:
+        email.status = "sending"
+        email.attempts = (email.attempts or 0) + 1
+        email.next_attempt_at = now + timedelta(seconds=EMAIL_OUTBOX_LEASE_SECONDS)
+
+    # Detached rows keep their values, reading them later doesn't reopen a transaction
+    db.flush()
+    db.expunge_all()
+    db.commit()
+    return emails
+
+
+def _after_failure(email: EmailOutbox, error: str) -> dict:
+    """Column values after a failed send: retry later, or give up after the last attempt"""
+    if email.attempts >= EMAIL_OUTBOX_MAX_ATTEMPTS:
+        return {"status": "failed", "last_error": error}
+    # Exponential backoff: 30s, 60s, 120s, ...
+    return {
+        "status": "pending",
+        "last_error": error,
+        "next_attempt_at": datetime.utcnow() + timedelta(seconds=30 * 2 ** (email.attempts - 1))
+    }
+
+
+def dispatch_pending_emails(batch_size: int = EMAIL_OUTBOX_BATCH_SIZE) -> int:
+    """Send one batch of due outbox emails and return how many were processed"""
+    db = SessionLocal()
+    try:
+        emails = _claim_due_emails(db, batch_size)
+
+        for email in emails:
+            try:
+                send_new_email(email.to_email, email.subject, email.body, email.text_body)
+                result = {"status": "sent", "sent_at": datetime.utcnow(), "last_error": None}
+            except SMTPDeliveryUnknown as e:
+                # The server may already have the message, retrying could deliver it twice
+                print(f"Outbox email {email.id} may not have been delivered: {str(e)}")
+                result = {
+                    "status": "unconfirmed",
+                    "last_error": f"Connection lost after the message was sent: {str(e)}"
+                }
+            except Exception as e:
+                error = getattr(e, "detail", None) or str(e)
+                print(f"Outbox email {email.id} failed: {error}")
+                result = _after_failure(email, str(error))
+            # Each result is recorded in its own short transaction
+            db.query(EmailOutbox).filter(EmailOutbox.id == email.id).update(result, synchronize_session=False)
+            db.commit()
+
+        return len(emails)
+    except Exception as e:
+        db.rollback()
+        print(f"Error dispatching outbox emails: {str(e)}")
+        return 0
+    finally:
+        db.close()
+
+
+async def run_outbox_dispatcher():
+    """Background loop that drains the outbox until cancelled"""
+    while True:
+        processed = await asyncio.to_thread(dispatch_pending_emails)
+        if processed == 0:
+            await asyncio.sleep(EMAIL_OUTBOX_POLL_SECONDS)
@@ -0,0 +1,137 @@
+import asyncio
+import hashlib
+import json
+import os
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import Optional, Tuple
+
+from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import delete, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from db.database import SessionLocal
+from models.userModels import IdempotencyKey
+from dotenv import load_dotenv
+
+# Load environment variables from .env file
+load_dotenv()
+
+# Keys are kept at least this long, a retry after that is treated as a new request
+IDEMPOTENCY_KEY_TTL_SECONDS = float(os.getenv("IDEMPOTENCY_KEY_TTL_SECONDS", str(24 * 3600)))
+# How often expired keys are deleted
+IDEMPOTENCY_PURGE_INTERVAL_SECONDS = float(os.getenv("IDEMPOTENCY_PURGE_INTERVAL_SECONDS", "3600"))
+# Rows deleted per transaction, so a large backlog doesn't hold one long lock
+IDEMPOTENCY_PURGE_BATCH_SIZE = 10000
+
+
+def request_fingerprint(**params) -> str:
+    """Hash of a request's parameters, amounts compared by value (10 == 10.00)"""
+    canonical = {
+        name: format(value.normalize(), "f") if isinstance(value, Decimal) else value
+        for name, value in params.items()
+    }
+    return hashlib.sha256(json.dumps(canonical, sort_keys=True, default=str).encode()).hexdigest()
+
+
+async def get_saved_response(
+    db: AsyncSession,
+    user_id: int,
+    key: str,
+    endpoint: str,
+    request_hash: str
+) -> Optional[dict]:
+    """Return the stored response for a user's Idempotency-Key, or None if the key is new"""
+    saved = await db.scalar(select(IdempotencyKey).where(
+        IdempotencyKey.user_id == user_id,
+        IdempotencyKey.idempotency_key == key
+    ).limit(1))
+
+    if not saved:
+        return None
+    if saved.endpoint != endpoint:
+        raise HTTPException(
+            status_code=409,
+            detail="Idempotency-Key was already used for a different request"
+        )
+    # Keys stored before hashes were kept have none to compare
+    if saved.request_hash and saved.request_hash != request_hash:
+        raise HTTPException(
+            status_code=422,
+            detail="Idempotency-Key was already used with different parameters"
+        )
+    return json.loads(saved.response_body)
+
+
+async def commit_with_response(
+    db: AsyncSession,
+    user_id: int,
+    key: Optional[str],
+    endpoint: str,
+    request_hash: str,
+    response: dict
+) -> Tuple[dict, bool]:
+    """Commit the pending work together with the response stored under the key.
+
+    Returns (response, True) when this call did the work, or the stored
+    response and False when a concurrent retry with the same key won.
+    """
+    if not key:
+        await db.commit()
+        return response, True
+
+    db.add(IdempotencyKey(
+        user_id=user_id,
+        idempotency_key=key,
+        endpoint=endpoint,
+        request_hash=request_hash,
+        response_body=json.dumps(jsonable_encoder(response))
+    ))
+    try:
+        await db.commit()
+    except IntegrityError:
+        # Same key committed by a parallel request, drop our work and replay theirs
+        await db.rollback()
+        saved = await get_saved_response(db, user_id, key, endpoint, request_hash)
+        if saved is None:
+            raise
+        return saved, False
+
+    return response, True
+
+
+def purge_expired_idempotency_keys() -> int:
+    """Delete keys older than IDEMPOTENCY_KEY_TTL_SECONDS and return how many were removed"""
+    cutoff = datetime.utcnow() - timedelta(seconds=IDEMPOTENCY_KEY_TTL_SECONDS)
+    db = SessionLocal()
+    removed = 0
+    try:
+        while True:
+            # Batches walk the created_at index
+            ids = select(IdempotencyKey.id).where(
+                IdempotencyKey.created_at < cutoff
+            ).limit(IDEMPOTENCY_PURGE_BATCH_SIZE).scalar_subquery()
+            deleted = db.execute(
+                delete(IdempotencyKey).where(IdempotencyKey.id.in_(ids)).execution_options(synchronize_session=False)
+            ).rowcount
+            db.commit()
+            removed += deleted
+            if deleted < IDEMPOTENCY_PURGE_BATCH_SIZE:
+                return removed
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+async def run_idempotency_key_purger():
+    """Background loop that deletes expired Idempotency-Key rows until cancelled"""
+    while True:
+        try:
+            await asyncio.to_thread(purge_expired_idempotency_keys)
+        except Exception as e:
+            print(f"Error purging idempotency keys: {str(e)}")
+        await asyncio.sleep(IDEMPOTENCY_PURGE_INTERVAL_SECONDS)
@@ -0,0 +1,57 @@
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Union
+
+# Afriton amounts are stored with 4 decimal places (Numeric(20, 4))
+AFRITON_DECIMALS = 4
+# Rates are stored with 6 decimal places (Numeric(20, 6))
+RATE_DECIMALS = 6
+
+# Minor units per ISO 4217 for currencies that don't use 2 decimals
+CURRENCY_DECIMALS = {
+    "AFT": AFRITON_DECIMALS,
+    "afriton": AFRITON_DECIMALS,
+    "RWF": 0,
+    "UGX": 0,
+    "JPY": 0,
+    "KRW": 0,
+    "TND": 3,
+}
+DEFAULT_CURRENCY_DECIMALS = 2
+
+# Fee rates applied by the wallet endpoints
+TOTAL_FEE_RATE = Decimal("0.05")       # 5% total fee
+AGENT_COMMISSION_RATE = Decimal("0.03")  # 3% agent commission on withdrawals
+PLATFORM_FEE_RATE = Decimal("0.02")    # 2% platform profit on withdrawals
+
+
+def to_decimal(value: Union[Decimal, float, int, str, None]) -> Decimal:
+    """Convert any numeric input to Decimal without picking up float noise"""
+    if value is None:
+        return Decimal("0")
+    if isinstance(value, Decimal):
+        return value
+    # str() first so 0.1 becomes Decimal("0.1") and not 0.1000000000000000055...
+    return Decimal(str(value))
+
+
+def currency_decimals(currency_code: str) -> int:
+    """Number of decimal places used for a currency"""
+    # AFT_XXX codes are Afriton quotes and keep the target currency's precision
+    code = currency_code.split("_", 1)[1] if currency_code.startswith("AFT_") else currency_code
+    return CURRENCY_DECIMALS.get(code, DEFAULT_CURRENCY_DECIMALS)
+
+
+def round_money(value: Union[Decimal, float, int, str, None], currency_code: str = "AFT") -> Decimal:
+    """Round an amount to the precision of its currency (half up)"""
+    exponent = Decimal(1).scaleb(-currency_decimals(currency_code))
+    return to_decimal(value).quantize(exponent, rounding=ROUND_HALF_UP)
+
+
+def round_afriton(value: Union[Decimal, float, int, str, None]) -> Decimal:
+    """Round an amount to Afriton precision"""
+    return round_money(value, "AFT")
+
+
+def fee(amount: Decimal, rate: Decimal) -> Decimal:
+    """Percentage fee on an Afriton amount, rounded to Afriton precision"""
+    return round_afriton(to_decimal(amount) * rate)
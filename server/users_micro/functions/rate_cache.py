@@ -0,0 +1,148 @@
+import hashlib
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from db.database import SessionLocal
+from models.userModels import CurrencyCategory, CurrencyRate
+from dotenv import load_dotenv
+
+# Load environment variables from .env file
+load_dotenv()
+
+# Seconds a worker keeps its rate table before reloading it from the database.
+# Writes on the same worker invalidate immediately, other workers converge within this window.
+RATE_CACHE_TTL = float(os.getenv("RATE_CACHE_TTL", "60"))
+
+
+class RateSnapshot:
+    """Immutable copy of the currency_rates table as loaded at one point in time"""
+
+    def __init__(self, categories: List[str], rates: List[dict], loaded_at: float):
+        self.categories = categories  # category names in id order
+        self.rates = rates  # active rates in id order
+        self.by_code: Dict[str, dict] = {rate["currency_code"]: rate for rate in rates}
+        self.loaded_at = loaded_at
+
+        # Version is derived from the content so every worker holding the same
+        # table reports the same value
+        digest = hashlib.sha1()
+        for name in categories:
+            digest.update(f"c:{name};".encode())
+        for rate in rates:
+            digest.update(
+                f"r:{rate['category']}:{rate['currency_name']}:{rate['currency_code']}:{rate['rate_to_afriton']};".encode()
+            )
+        self.version = digest.hexdigest()[:16]
+
+
+class RateCache:
+    """Process-wide cache of active currency rates keyed by currency_code"""
+
+    def __init__(self, ttl: float = RATE_CACHE_TTL):
+        self.ttl = ttl
+        self._snapshot: Optional[RateSnapshot] = None
+        self._lock = threading.Lock()
+
+    def _load(self, db: Session) -> RateSnapshot:
+        # One round-trip for categories and their active rates
+        rows = db.query(CurrencyCategory, CurrencyRate).outerjoin(
+            CurrencyRate,
+            (CurrencyRate.category_id == CurrencyCategory.id) & (CurrencyRate.is_active == True)
+        ).order_by(CurrencyCategory.id, CurrencyRate.id).all()
+
+        categories = []
+        rates = []
+        for category, rate in rows:
+            if category.name not in categories:
+                categories.append(category.name)
+            if rate is not None:
+                rates.append({
+                    "category": category.name,
+                    "currency_name": rate.currency_name,
+                    "currency_code": rate.currency_code,
+                    "rate_to_afriton": rate.rate_to_afriton
+                })
+
+        return RateSnapshot(categories, rates, time.monotonic())
+
+    def snapshot(self, db: Optional[Session] = None) -> RateSnapshot:
+        """Return the current snapshot, reloading it when missing or older than the TTL"""
+        current = self._snapshot
+        if current is not None and time.monotonic() - current.loaded_at < self.ttl:
+            return current
+
+        with self._lock:
+            # Another thread may have reloaded while we waited for the lock
+            current = self._snapshot
+            if current is not None and time.monotonic() - current.loaded_at < self.ttl:
+                return current
+
+            if db is not None:
+                self._snapshot = self._load(db)
+            else:
+                session = SessionLocal()
+                try:
+                    self._snapshot = self._load(session)
+                finally:
+                    session.close()
+            return self._snapshot
+
+    def get_rate(self, currency_code: str, db: Optional[Session] = None) -> Optional[dict]:
+        """Return the cached rate entry for a currency code or None if unsupported"""
+        return self.snapshot(db).by_code.get(currency_code)
+
+    async def snapshot_async(self, db: AsyncSession) -> RateSnapshot:
+        """snapshot() for async handlers, the reload runs on the async session"""
+        current = self._snapshot
+        if current is not None and time.monotonic() - current.loaded_at < self.ttl:
+            return current
+
+        # Concurrent reloads are harmless, they read the same table
+        loaded = await db.run_sync(self._load)
+        with self._lock:
+            self._snapshot = loaded
+        return loaded
+
+    async def get_rate_async(self, currency_code: str, db: AsyncSession) -> Optional[dict]:
+        """get_rate() for async handlers"""
+        return (await self.snapshot_async(db)).by_code.get(currency_code)
+
+    def invalidate(self):
+        """Drop the cached table so the next read reloads it"""
+        with self._lock:
+            self._snapshot = None
+
+
+rate_cache = RateCache()
+
+
+# Cross-rate matrix for the latest rate version, rebuilt only when rates change
+_cross_rates = {"version": None, "currencies": [], "index": {}, "matrix": []}
+
+
+def cross_rate_matrix(snapshot: RateSnapshot) -> dict:
+    """Return every pairwise rate for a snapshot.
+
+    matrix[i][j] is how much of currencies[j] one unit of currencies[i] buys,
+    pivoting through Afriton (which is included as "afriton").
+    """
+    global _cross_rates
+    table = _cross_rates
+    if table["version"] != snapshot.version:
+        currencies = ["afriton"] + [rate["currency_code"] for rate in snapshot.rates]
+        to_afriton = [1.0] + [float(rate["rate_to_afriton"]) for rate in snapshot.rates]
+
+        # Swap in a complete table so concurrent readers never see a half-built one
+        table = {
+            "version": snapshot.version,
+            "currencies": currencies,
+            "index": {code: i for i, code in enumerate(currencies)},
+            "matrix": [[target / base for target in to_afriton] for base in to_afriton]
+        }
+        _cross_rates = table
+    return table
@@ -1,8 +1,9 @@
 from fastapi import HTTPException
-import smtplib
+from functions.smtp_pool import get_smtp_pool, SMTPDeliveryUnknown
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from email.utils import formataddr
+from emailsTemps.registry import html_to_text
 from dotenv import load_dotenv
 import os
 
@@ -13,19 +14,24 @@ AFRITON_USERNAME = os.getenv("AFRITON_USERNAME")
 AFRITON_PASSWORD = os.getenv("AFRITON_PASSWORD")  # Replace with App Password
 AFRITON_SENDER_EMAIL = os.getenv("AFRITON_SENDER_EMAIL")
 
-def send_new_email(Email_to, Email_sub, Email_msg):
+def send_new_email(Email_to, Email_sub, Email_msg, Email_text=None):
     msg = MIMEMultipart("alternative")
     msg['From'] = formataddr(("Afriton CrossBorder", AFRITON_SENDER_EMAIL))
     msg['To'] = Email_to
     msg['Subject'] = Email_sub
-    full_message = Email_msg
-    msg.attach(MIMEText(full_message, 'html', 'utf-8'))  # Specify UTF-8 encoding
+    # Rendered templates carry their own plain-text part, otherwise derive one
+    text_message = Email_text or getattr(Email_msg, "text", None) or html_to_text(Email_msg)
+    msg.attach(MIMEText(text_message, 'plain', 'utf-8'))
+    msg.attach(MIMEText(Email_msg, 'html', 'utf-8'))  # Specify UTF-8 encoding
 
     try:
-        with smtplib.SMTP('smtp.gmail.com', 587) as server:
-            server.starttls()
-            server.login(AFRITON_USERNAME, AFRITON_PASSWORD)
-            server.sendmail(AFRITON_SENDER_EMAIL, Email_to, msg.as_string())
+        # Reuse a pooled, already authenticated connection
+        get_smtp_pool(AFRITON_USERNAME, AFRITON_PASSWORD).send(
+            AFRITON_SENDER_EMAIL, Email_to, msg.as_string()
+        )
+    except SMTPDeliveryUnknown:
+        # Kept as is so the outbox knows not to send it again
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
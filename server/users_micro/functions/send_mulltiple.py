@@ -1,8 +1,10 @@
 from fastapi import HTTPException
-import smtplib
+from functions.smtp_pool import get_smtp_pool
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from email.utils import formataddr
+from emailsTemps.broadcast_email import message_email
+from emailsTemps.registry import RenderedEmail
 from dotenv import load_dotenv
 import os
 
@@ -13,26 +15,9 @@ ADROIT_USERNAME = os.getenv("ADROIT_USERNAME")
 ADROIT_PASSWORD = os.getenv("ADROIT_PASSWORD")
 ADROIT_SENDER_EMAIL = os.getenv("ADROIT_SENDER_EMAIL")
 
-def create_html_message(message_content: str) -> str:
+def create_html_message(message_content: str) -> RenderedEmail:
     """Create a properly formatted HTML email message"""
-    return f"""
-    <!DOCTYPE html>
-    <html>
-        <head>
-            <meta charset="utf-8">
-        </head>
-        <body style="font-family: Arial, sans-serif; line-height: 1.6; margin: 0; padding: 20px; background-color: #f4f4f4;">
-            <div style="max-width: 600px; margin: 0 auto; background-color: #ffffff; padding: 20px; border-radius: 5px; box-shadow: 0 2px 5px rgba(0,0,0,0.1);">
-                <div style="color: #666666; padding: 20px 0;">
-                    {message_content}
-                </div>
-                <div style="margin-top: 20px; padding-top: 20px; border-top: 2px solid #f0f0f0; font-size: 12px; color: #999999; text-align: center;">
-                    This is an automated message from Afriton. Please do not reply to this email.
-                </div>
-            </div>
-        </body>
-    </html>
-    """
+    return message_email(message_content)
 
 def send_new_multi_email(Email_to_list, Email_sub, Email_msg):
     """Send emails to multiple recipients with proper validation and error handling"""
@@ -54,24 +39,22 @@ def send_new_multi_email(Email_to_list, Email_sub, Email_msg):
         print(f"Message length: {len(html_message)}")
 
         # Create message container
-        msg = MIMEMultipart()
+        msg = MIMEMultipart("alternative")
         msg['From'] = formataddr(("Afriton", ADROIT_SENDER_EMAIL))
         msg['To'] = ", ".join(Email_to_list)
         msg['Subject'] = Email_sub
 
-        # Attach HTML part
+        # Plain-text part first, clients show the last part they support
+        msg.attach(MIMEText(html_message.text, 'plain', 'utf-8'))
         html_part = MIMEText(html_message, 'html', 'utf-8')
         msg.attach(html_part)
 
-        # Send email
-        with smtplib.SMTP('smtp.gmail.com', 587) as server:
-            server.starttls()
-            server.login(ADROIT_USERNAME, ADROIT_PASSWORD)
-            server.sendmail(
-                ADROIT_SENDER_EMAIL,
-                Email_to_list,
-                msg.as_string()
-            )
+        # Send email over a pooled, already authenticated connection
+        get_smtp_pool(ADROIT_USERNAME, ADROIT_PASSWORD).send(
+            ADROIT_SENDER_EMAIL,
+            Email_to_list,
+            msg.as_string()
+        )
 
         print("Email sent successfully!")
         return True
@@ -0,0 +1,183 @@
+import os
+import queue
+import smtplib
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Union
+
+from dotenv import load_dotenv
+
+# Load environment variables from .env file
+load_dotenv()
+
+# SMTP server, point these at a local stand-in (e.g. aiosmtpd) for testing
+SMTP_HOST = os.getenv("SMTP_HOST", "smtp.gmail.com")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "587"))
+SMTP_USE_TLS = os.getenv("SMTP_USE_TLS", "true").lower() == "true"
+SMTP_TIMEOUT = float(os.getenv("SMTP_TIMEOUT", "30"))
+# Authenticated connections kept open per account
+SMTP_POOL_SIZE = int(os.getenv("SMTP_POOL_SIZE", "4"))
+# Connections idle longer than this are checked with NOOP before reuse
+SMTP_NOOP_AFTER_SECONDS = float(os.getenv("SMTP_NOOP_AFTER_SECONDS", "30"))
+# Connections idle longer than this are closed instead of reused
+SMTP_MAX_IDLE_SECONDS = float(os.getenv("SMTP_MAX_IDLE_SECONDS", "240"))
+
+
+class SMTPDeliveryUnknown(smtplib.SMTPException):
+    """The connection failed after the message was handed over, so it may have been delivered"""
+
+
+def _is_connection_error(error: Exception) -> bool:
+    """True when the error means the connection itself is unusable"""
+    if isinstance(error, smtplib.SMTPServerDisconnected):
+        return True
+    # Server replies (refused recipient, bad data, ...) leave the session usable
+    if isinstance(error, (smtplib.SMTPResponseException, smtplib.SMTPRecipientsRefused)):
+        return False
+    return True
+
+
+class SMTPPool:
+    """Bounded pool of logged-in SMTP connections for one account"""
+
+    def __init__(self, username: Optional[str], password: Optional[str], size: int = SMTP_POOL_SIZE):
+        self.username = username
+        self.password = password
+        self.size = size
+        self._idle = queue.LifoQueue()  # (connection, last_used) pairs
+        self._slots = threading.BoundedSemaphore(size)
+
+    def _connect(self) -> smtplib.SMTP:
+        conn = smtplib.SMTP(SMTP_HOST, SMTP_PORT, timeout=SMTP_TIMEOUT)
+        if SMTP_USE_TLS:
+            conn.starttls()
+        if self.username:
+            conn.login(self.username, self.password)
+        return conn
+
+    @staticmethod
+    def _close(conn: smtplib.SMTP):
+        try:
+            conn.quit()
+        except Exception:
+            conn.close()
+
+    def _checkout(self) -> smtplib.SMTP:
+        """Reuse an idle connection that is still alive, or open a new one"""
+        while True:
+            try:
+                conn, last_used = self._idle.get_nowait()
+            except queue.Empty:
+                return self._connect()
+
+            idle_for = time.monotonic() - last_used
+            if idle_for > SMTP_MAX_IDLE_SECONDS:
+                self._close(conn)
+                continue
+            if idle_for > SMTP_NOOP_AFTER_SECONDS:
+                try:
+                    if conn.noop()[0] != 250:
+                        raise smtplib.SMTPServerDisconnected("NOOP failed")
+                except Exception:
+                    self._close(conn)
+                    continue
+            return conn
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection, returning it to the pool unless it broke"""
+        with self._slots:
+            conn = self._checkout()
+            try:
+                yield conn
+            except Exception as e:
+                if _is_connection_error(e):
+                    self._close(conn)
+                else:
+                    self._idle.put((conn, time.monotonic()))
+                raise
+            else:
+                self._idle.put((conn, time.monotonic()))
+
+    @staticmethod
+    def _address(conn: smtplib.SMTP, from_addr: str, to_addrs: List[str]) -> Dict[str, tuple]:
+        """MAIL FROM and RCPT TO, the part of sendmail that is safe to repeat.
+
+        Returns the refused recipients, raising like sendmail when the sender
+        or every recipient is refused.
+        """
+        conn.ehlo_or_helo_if_needed()
+        code, resp = conn.mail(from_addr)
+        if code != 250:
+            conn.rset()
+            raise smtplib.SMTPSenderRefused(code, resp, from_addr)
+        refused = {}
+        for addr in to_addrs:
+            code, resp = conn.rcpt(addr)
+            if code not in (250, 251):
+                refused[addr] = (code, resp)
+        if len(refused) == len(to_addrs):
+            conn.rset()
+            raise smtplib.SMTPRecipientsRefused(refused)
+        return refused
+
+    def send(self, from_addr: str, to_addrs: Union[str, List[str]], message: str):
+        """Send one message, reconnecting once if the pooled connection was dropped.
+
+        Only failures before DATA (connect, NOOP, MAIL FROM, RCPT TO) are
+        retried. Once the message is handed over, a dropped connection may
+        still mean it was delivered, so it raises SMTPDeliveryUnknown and
+        callers must not send it again.
+        Returns the recipients the server refused (empty when all were accepted).
+        """
+        if isinstance(to_addrs, str):
+            to_addrs = [to_addrs]
+        for attempt in range(2):
+            handed_over = False
+            try:
+                with self.connection() as conn:
+                    refused = self._address(conn, from_addr, to_addrs)
+                    handed_over = True
+                    code, resp = conn.data(message)
+                    if code != 250:
+                        conn.rset()
+                        raise smtplib.SMTPDataError(code, resp)
+                    return refused
+            except Exception as e:
+                if handed_over and _is_connection_error(e):
+                    raise SMTPDeliveryUnknown(str(e)) from e
+                if handed_over or attempt or not _is_connection_error(e):
+                    raise
+                # Idle connections were probably dropped too, start fresh
+                self.clear()
+
+    def clear(self):
+        """Close all idle connections"""
+        while True:
+            try:
+                conn, _ = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            self._close(conn)
+
+
+_pools: Dict[Optional[str], SMTPPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_smtp_pool(username: Optional[str], password: Optional[str]) -> SMTPPool:
+    """Return the shared pool for an SMTP account, creating it on first use"""
+    with _pools_lock:
+        pool = _pools.get(username)
+        if pool is None:
+            pool = SMTPPool(username, password)
+            _pools[username] = pool
+        return pool
+
+
+def close_smtp_pools():
+    """Close every pooled connection, used on shutdown"""
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.clear()
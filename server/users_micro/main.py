@@ -1,18 +1,85 @@
 from enum import Enum
+from contextlib import asynccontextmanager
+import asyncio
+import os
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from typing import Optional
-from Endpoints import auth,otp,wallet,conversionRate,counts
+from Endpoints import auth,otp,wallet,conversionRate,counts,metrics
 from fastapi.responses import HTMLResponse
-from db.database import Base, engine
+from db.database import Base, engine, SessionLocal, async_engine, replica_engine
+from db.pool import warm_up, warm_up_async
+from db.connection import READ_AFTER_WRITE_HEADER
+from seed_rates import seed_default_rates
+from functions.rate_cache import rate_cache
+from functions.email_outbox import run_outbox_dispatcher
+from functions.smtp_pool import close_smtp_pools
+from functions.bulk_email import run_bulk_email_worker
+from functions.admin_dashboard import run_admin_dashboard_refresher
+from functions.idempotency import run_idempotency_key_purger
 
 # Create all tables
 # Base.metadata.drop_all(bind=engine)  # Comment this out after first run
 Base.metadata.create_all(bind=engine)  # This will only create missing tables
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Open pooled connections up front so the first requests don't wait on connects
+    try:
+        await asyncio.to_thread(warm_up, engine)
+        if replica_engine is not None:
+            await asyncio.to_thread(warm_up, replica_engine)
+        await warm_up_async(async_engine)
+    except Exception as e:
+        print(f"Error warming up database pools: {str(e)}")
+
+    # Seed default currency rates once per startup instead of inside requests
+    db = SessionLocal()
+    try:
+        seed_default_rates(db)
+        rate_cache.invalidate()
+    except Exception as e:
+        print(f"Error seeding currency rates: {str(e)}")
+    finally:
+        db.close()
+
+    # Drain queued emails in the background so requests never wait on SMTP
+    dispatcher = None
+    if os.getenv("EMAIL_OUTBOX_DISPATCHER", "true").lower() == "true":
+        dispatcher = asyncio.create_task(run_outbox_dispatcher())
+
+    # Run queued bulk email jobs (POST /auth/send-emails) off the request path
+    bulk_worker = None
+    if os.getenv("BULK_EMAIL_WORKER", "true").lower() == "true":
+        bulk_worker = asyncio.create_task(run_bulk_email_worker())
+
+    # Keep the admin dashboard snapshot current so admins never wait on its aggregates
+    dashboard_refresher = None
+    if os.getenv("ADMIN_DASHBOARD_REFRESHER", "true").lower() == "true":
+        dashboard_refresher = asyncio.create_task(run_admin_dashboard_refresher())
+
+    # Delete Idempotency-Key rows past their retention so the table doesn't grow forever
+    idempotency_purger = None
+    if os.getenv("IDEMPOTENCY_KEY_PURGER", "true").lower() == "true":
+        idempotency_purger = asyncio.create_task(run_idempotency_key_purger())
+
+    yield
+
+    if dispatcher:
+        dispatcher.cancel()
+    if bulk_worker:
+        bulk_worker.cancel()
+    if dashboard_refresher:
+        dashboard_refresher.cancel()
+    if idempotency_purger:
+        idempotency_purger.cancel()
+    close_smtp_pools()
+    await async_engine.dispose()
+
 app = FastAPI(
     title="Users Afriton Api Documentation.",  # Replace with your desired title
     description="Afriton. ",
+    lifespan=lifespan,
 )
 
 # Configure CORS 
@@ -22,6 +89,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],  # Adjust this to the specific methods you want to allow (e.g., ["GET", "POST"])
     allow_headers=["*"],  # Adjust this to the specific headers you want to allow (e.g., ["Content-Type", "Authorization"])
+    expose_headers=[READ_AFTER_WRITE_HEADER],  # Clients without cookies echo it back after a write
 )
 
 # Include the routers from auth, apis, and otp
@@ -31,6 +99,7 @@ app.include_router(auth.router)
 app.include_router(conversionRate.router)
 app.include_router(otp.router)
 app.include_router(wallet.router)
+app.include_router(metrics.router)
 @app.get("/", response_class=HTMLResponse)
 async def read_root():
     html_content = """
@@ -1,7 +1,7 @@
-from sqlalchemy import Column, Integer, String,Text, Boolean, Float, Date, ForeignKey,DateTime,ARRAY, UniqueConstraint
+from sqlalchemy import Column, Integer, String,Text, Boolean, Float, Numeric, Date, ForeignKey,DateTime,ARRAY, UniqueConstraint, Index
 from db.database import Base
 from datetime import date
-from datetime import datetime
+from datetime import datetime, timezone
 from sqlalchemy.orm import relationship
 
 class Users(Base):
@@ -21,7 +21,7 @@ class Users(Base):
     user_type = Column(String(50), default="citizen")  # citizen, admin, manager, agent
     acc_status = Column(Boolean, default=False)  # For email verification
     is_wallet_active = Column(Boolean, default=False)
-    created_at = Column(String(255), default=datetime.utcnow)
+    created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc), index=True)
 
 
 class OTP(Base):
@@ -39,64 +39,88 @@ class Wallet(Base):
     __tablename__ = "wallets"
     id = Column(Integer, primary_key=True, index=True)
     account_id = Column(String, index=True)
-    balance = Column(Float, default=0.0)
+    balance = Column(Numeric(20, 4), default=0)
     wallet_status = Column(Boolean, default=True)
     wallet_type = Column(String, default="savings")  # savings, goal, business, family, emergency, agent-wallet, manager-wallet
     created_at = Column(DateTime, default=datetime.utcnow, index=True)
-    
+
+    __table_args__ = (
+        # One wallet of each type per account
+        UniqueConstraint('account_id', 'wallet_type', name='unique_wallet_account_type'),
+    )
+
 # history table
 class Transaction_history(Base):
     __tablename__ = "Transaction_history"
     id = Column(Integer, primary_key=True, index=True)
     account_id = Column(String, index=True)
     transaction_type = Column(String, index=True)
-    amount = Column(Float, default=0.0)
-    original_amount = Column(Float, nullable=True)  # Original amount before conversion
+    amount = Column(Numeric(20, 4), default=0)
+    original_amount = Column(Numeric(20, 4), nullable=True)  # Original amount before conversion
     original_currency = Column(String(50), nullable=True)  # Original currency code
     wallet_type = Column(String(50), nullable=True)  # Add wallet type field
-    done_by = Column(String, index=True)
+    done_by = Column(Integer, ForeignKey("users.id"), index=True)  # user who processed it
     status = Column(Boolean, default=True)
     created_at = Column(DateTime, default=datetime.utcnow, index=True)
 
+    __table_args__ = (
+        # Wallet statements and last transaction per wallet
+        Index('ix_transaction_history_account_wallet_created', 'account_id', 'wallet_type', 'created_at'),
+        # Account statements across wallets
+        Index('ix_transaction_history_account_created', 'account_id', 'created_at'),
+        # Agent/manager dashboards, by who processed it over a date range
+        Index('ix_transaction_history_done_by_created', 'done_by', 'created_at'),
+    )
+
 #withdrawal table request
 class Withdrawal_request(Base):
     __tablename__ = "withdrawal_requests"
     
     id = Column(Integer, primary_key=True, index=True)
     account_id = Column(String)
-    amount = Column(Float)  # Base amount in Afriton
-    withdrawal_amount = Column(Float)  # Amount in withdrawal currency
+    amount = Column(Numeric(20, 4))  # Base amount in Afriton
+    withdrawal_amount = Column(Numeric(20, 4))  # Amount in withdrawal currency
     withdrawal_currency = Column(String)
     wallet_type = Column(String)
     status = Column(String, default="Pending")
     request_to = Column(String, default="agent")
     processed_at = Column(DateTime, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
-    done_by = Column(String, nullable=True)
-    total_amount = Column(Float)  # Total amount including fees in Afriton
-    charges = Column(Float)  # Fees in Afriton
-    agent_commission = Column(Float, nullable=True)
-    manager_commission = Column(Float, nullable=True)
-    platform_profit = Column(Float, nullable=True)
+    done_by = Column(Integer, ForeignKey("users.id"), nullable=True)
+    total_amount = Column(Numeric(20, 4))  # Total amount including fees in Afriton
+    charges = Column(Numeric(20, 4))  # Fees in Afriton
+    agent_commission = Column(Numeric(20, 4), nullable=True)
+    manager_commission = Column(Numeric(20, 4), nullable=True)
+    platform_profit = Column(Numeric(20, 4), nullable=True)
+
+    __table_args__ = (
+        Index('ix_withdrawal_requests_account_created', 'account_id', 'created_at'),
+        Index('ix_withdrawal_requests_done_by_status_created', 'done_by', 'status', 'created_at'),
+    )
 
 class Workers(Base):
     __tablename__ = "workers"
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
-    allowed_balance = Column(Float, default=0.0)
-    available_balance = Column(Float, default=0.0)
+    allowed_balance = Column(Numeric(20, 4), default=0)
+    available_balance = Column(Numeric(20, 4), default=0)
     location = Column(String(255), nullable=False)
     worker_type = Column(String(50), nullable=False)  # manager or agent
     managed_by = Column(Integer, ForeignKey("users.id"), nullable=True)  # For agents, references their manager
     created_at = Column(DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        Index('ix_workers_user_id', 'user_id'),
+        Index('ix_workers_managed_by', 'managed_by'),
+    )
+
 class Profit(Base):
     __tablename__ = "profits"
 
     id = Column(Integer, primary_key=True, index=True)
-    amount = Column(Float, nullable=False)  # System profit amount
+    amount = Column(Numeric(20, 4), nullable=False)  # System profit amount
     fee_type = Column(String, nullable=False)  # withdrawal or deposit
-    transaction_amount = Column(Float, nullable=False)  # Original transaction amount
+    transaction_amount = Column(Numeric(20, 4), nullable=False)  # Original transaction amount
     transaction_date = Column(DateTime, default=datetime.utcnow)
 
 class CurrencyCategory(Base):
@@ -112,7 +136,7 @@ class CurrencyRate(Base):
     category_id = Column(Integer, ForeignKey("currency_categories.id"), nullable=False)
     currency_name = Column(String(100), nullable=False)  # e.g. "rwandan_franc"
     currency_code = Column(String(10), nullable=False)   # e.g. "RWF"
-    rate_to_afriton = Column(Float, nullable=False)      # e.g. 12000 (means 12000 RWF = 1 Afriton)
+    rate_to_afriton = Column(Numeric(20, 6), nullable=False)      # e.g. 12000 (means 12000 RWF = 1 Afriton)
     is_active = Column(Boolean, default=True)
     last_updated = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     created_at = Column(DateTime, default=datetime.utcnow)
@@ -120,3 +144,52 @@ class CurrencyRate(Base):
     __table_args__ = (
         UniqueConstraint('currency_code', name='unique_currency_code'),
     )
+
+class IdempotencyKey(Base):
+    __tablename__ = "idempotency_keys"
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, nullable=False)
+    idempotency_key = Column(String(255), nullable=False)  # value of the Idempotency-Key header
+    endpoint = Column(String(100), nullable=False)  # e.g. "transfer"
+    request_hash = Column(String(64), nullable=True)  # hash of the request parameters
+    response_body = Column(Text, nullable=False)  # JSON of the original response
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)  # purged after IDEMPOTENCY_KEY_TTL_SECONDS
+
+    __table_args__ = (
+        UniqueConstraint('user_id', 'idempotency_key', name='unique_user_idempotency_key'),
+    )
+
+class EmailOutbox(Base):
+    __tablename__ = "email_outbox"
+    id = Column(Integer, primary_key=True, index=True)
+    to_email = Column(String(255), nullable=False)
+    subject = Column(String(255), nullable=False)
+    body = Column(Text, nullable=False)  # HTML message
+    text_body = Column(Text, nullable=True)  # plain-text alternative
+    status = Column(String(20), default="pending", index=True)  # pending, sending, sent, failed, unconfirmed
+    attempts = Column(Integer, default=0)
+    last_error = Column(Text, nullable=True)
+    next_attempt_at = Column(DateTime, default=datetime.utcnow, index=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    sent_at = Column(DateTime, nullable=True)
+
+class BulkEmailJob(Base):
+    __tablename__ = "bulk_email_jobs"
+    id = Column(Integer, primary_key=True, index=True)
+    created_by = Column(Integer, ForeignKey("users.id"), nullable=False)
+    subject = Column(String(255), nullable=False)
+    message = Column(Text, nullable=False)
+    user_type = Column(String(50), nullable=False)  # all, citizen, agent, manager, admin
+    recipients = Column(Text, nullable=True)  # JSON list when specific emails were given
+    status = Column(String(20), default="queued", index=True)  # queued, running, completed, failed
+    total_recipients = Column(Integer, default=0)
+    sent_count = Column(Integer, default=0)
+    failed_count = Column(Integer, default=0)
+    cursor = Column(Integer, default=0)  # last Users.id (or list position) processed
+    failed_recipients = Column(Text, nullable=True)  # JSON list of {email, error}, capped
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+    heartbeat_at = Column(DateTime, nullable=True)  # refreshed while a worker runs the job
+    finished_at = Column(DateTime, nullable=True)
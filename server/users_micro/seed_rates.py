@@ -0,0 +1,133 @@
+from sqlalchemy.orm import Session
+from db.database import SessionLocal
+from models.userModels import CurrencyCategory, CurrencyRate
+
+# Default currency categories (name -> description)
+DEFAULT_CATEGORIES = {
+    "african_currencies": "African Currencies",
+    "european_currencies": "European Currencies",
+    "other_global_currencies": "Other Global Currencies",
+    "afriton": "Afriton Conversion Rates"
+}
+
+# Default rates as (currency_name, currency_code, rate_to_afriton, category)
+DEFAULT_RATES = [
+    # African Currencies
+    ("rwandan_franc", "RWF", 12000, "african_currencies"),
+    ("nigerian_naira", "NGN", 7500, "african_currencies"),
+    ("south_african_rand", "ZAR", 180, "african_currencies"),
+    ("ghanaian_cedi", "GHS", 110, "african_currencies"),
+    ("kenyan_shilling", "KES", 1480, "african_currencies"),
+    ("ugandan_shilling", "UGX", 37000, "african_currencies"),
+    ("egyptian_pound", "EGP", 310, "african_currencies"),
+    ("moroccan_dirham", "MAD", 100, "african_currencies"),
+    ("tanzanian_shilling", "TZS", 25000, "african_currencies"),
+    ("zambian_kwacha", "ZMW", 220, "african_currencies"),
+    ("ethiopian_birr", "ETB", 550, "african_currencies"),
+    ("angolan_kwanza", "AOA", 8330, "african_currencies"),
+    ("congolese_franc", "CDF", 25000, "african_currencies"),
+    ("malawian_kwacha", "MWK", 16500, "african_currencies"),
+    ("mozambican_metical", "MZN", 630, "african_currencies"),
+    ("namibian_dollar", "NAD", 180, "african_currencies"),
+    ("seychellois_rupee", "SCR", 130, "african_currencies"),
+    ("somali_shilling", "SOS", 57000, "african_currencies"),
+    ("sudanese_pound", "SDG", 6000, "african_currencies"),
+    ("tunisian_dinar", "TND", 31, "african_currencies"),
+    
+    # European Currencies
+    ("euro", "EUR", 9.3, "european_currencies"),
+    ("british_pound", "GBP", 7.7, "european_currencies"),
+    ("swiss_franc", "CHF", 8.8, "european_currencies"),
+    ("norwegian_krone", "NOK", 108, "european_currencies"),
+    ("swedish_krona", "SEK", 105, "european_currencies"),
+    ("danish_krone", "DKK", 69.6, "european_currencies"),
+    ("polish_zloty", "PLN", 42, "european_currencies"),
+    ("hungarian_forint", "HUF", 3610, "european_currencies"),
+    ("czech_koruna", "CZK", 230, "european_currencies"),
+    ("romanian_leu", "RON", 46, "european_currencies"),
+    ("bulgarian_lev", "BGN", 18.2, "european_currencies"),
+    ("croatian_kuna", "HRK", 70, "european_currencies"),
+    
+    # Other Global Currencies
+    ("us_dollar", "USD", 10, "other_global_currencies"),  # Base rate: 1 Afriton = 10 USD
+    ("canadian_dollar", "CAD", 13.6, "other_global_currencies"),
+    ("australian_dollar", "AUD", 15.3, "other_global_currencies"),
+    ("chinese_yuan", "CNY", 72, "other_global_currencies"),
+    ("japanese_yen", "JPY", 1500, "other_global_currencies"),
+    ("indian_rupee", "INR", 830, "other_global_currencies"),
+    ("brazilian_real", "BRL", 52, "other_global_currencies"),
+    ("mexican_peso", "MXN", 170, "other_global_currencies"),
+    ("turkish_lira", "TRY", 280, "other_global_currencies"),
+    ("pakistani_rupee", "PKR", 3000, "other_global_currencies"),
+    ("bangladeshi_taka", "BDT", 1100, "other_global_currencies"),
+    ("russian_ruble", "RUB", 920, "other_global_currencies"),
+    ("indonesian_rupiah", "IDR", 156000, "other_global_currencies"),
+    ("malaysian_ringgit", "MYR", 47, "other_global_currencies"),
+    ("singapore_dollar", "SGD", 13.5, "other_global_currencies"),
+    ("thai_baht", "THB", 360, "other_global_currencies"),
+    ("south_korean_won", "KRW", 13000, "other_global_currencies"),
+    ("new_zealand_dollar", "NZD", 16.5, "other_global_currencies"),
+    ("hong_kong_dollar", "HKD", 78, "other_global_currencies"),
+    ("taiwanese_dollar", "TWD", 320, "other_global_currencies"),
+    
+    # Afriton conversions with unique codes
+    ("afriton_to_dollar", "AFT_USD", 10, "afriton"),
+    ("afriton_to_rwandan_franc", "AFT_RWF", 12000, "afriton"),
+    ("afriton_to_nigerian_naira", "AFT_NGN", 7500, "afriton"),
+    ("afriton_to_south_african_rand", "AFT_ZAR", 180, "afriton"),
+    ("afriton_to_ghanaian_cedi", "AFT_GHS", 110, "afriton"),
+    ("afriton_to_kenyan_shilling", "AFT_KES", 1480, "afriton"),
+    ("afriton_to_ugandan_shilling", "AFT_UGX", 37000, "afriton"),
+    ("afriton_to_euro", "AFT_EUR", 9.3, "afriton"),
+]
+
+
+def seed_default_rates(db: Session) -> dict:
+    """Insert the default categories and rates in a single transaction.
+
+    Only runs while the rates table is empty, so defaults an admin
+    deleted don't come back on a restart.
+    """
+    try:
+        if db.query(CurrencyRate.id).first() is not None:
+            return {"categories_added": 0, "rates_added": 0}
+
+        existing_categories = {
+            name: cat_id for cat_id, name in db.query(CurrencyCategory.id, CurrencyCategory.name).all()
+        }
+
+        new_categories = [
+            CurrencyCategory(name=name, description=description)
+            for name, description in DEFAULT_CATEGORIES.items()
+            if name not in existing_categories
+        ]
+        if new_categories:
+            db.add_all(new_categories)
+            db.flush()  # assign ids without committing
+            existing_categories.update({cat.name: cat.id for cat in new_categories})
+
+        new_rates = [
+            CurrencyRate(
+                category_id=existing_categories[category],
+                currency_name=name,
+                currency_code=code,
+                rate_to_afriton=rate_afriton
+            )
+            for name, code, rate_afriton, category in DEFAULT_RATES
+        ]
+        db.add_all(new_rates)
+        db.commit()
+
+        return {"categories_added": len(new_categories), "rates_added": len(new_rates)}
+    except Exception:
+        db.rollback()
+        raise
+
+
+if __name__ == "__main__":
+    session = SessionLocal()
+    try:
+        result = seed_default_rates(session)
+        print(f"Seeded {result['categories_added']} categories and {result['rates_added']} rates")
+    finally:
+        session.close()
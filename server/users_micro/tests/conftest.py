@@ -0,0 +1,48 @@
+# users_micro/tests/conftest.py
+
+import os
+import tempfile
+
+# Point the app at a throwaway SQLite database before anything imports db.database
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "test.db")
+os.environ.pop("ASYNC_DATABASE_URL", None)
+os.environ.pop("REPLICA_DATABASE_URL", None)
+os.environ.setdefault("SECRET_KEY", "test-secret-key")
+os.environ.setdefault("ALGORITHM", "HS256")
+os.environ.setdefault("SECRET_KEY_DATA", "test-secret-key-data")
+# Tests run the background jobs themselves
+os.environ["EMAIL_OUTBOX_DISPATCHER"] = "false"
+os.environ["BULK_EMAIL_WORKER"] = "false"
+os.environ["ADMIN_DASHBOARD_REFRESHER"] = "false"
+os.environ["IDEMPOTENCY_KEY_PURGER"] = "false"
+
+import pytest
+from fastapi.testclient import TestClient
+
+from db.database import Base, engine, SessionLocal
+from functions.admin_dashboard import admin_dashboard_cache
+from functions.rate_cache import rate_cache
+from main import app
+
+
+@pytest.fixture(autouse=True)
+def clean_database():
+    """Every test starts from empty tables and empty caches"""
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    rate_cache.invalidate()
+    admin_dashboard_cache._snapshot = None
+    yield
+
+
+@pytest.fixture
+def db():
+    session = SessionLocal()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def client():
+    with TestClient(app) as test_client:
+        yield test_client
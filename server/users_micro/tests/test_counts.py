@@ -0,0 +1,29 @@
+# users_micro/tests/test_counts.py
+
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from Endpoints.auth import create_access_token
+from models.userModels import Transaction_history, Users
+
+
+def test_admin_commission_stats_count_this_month_only(client, db):
+    admin = Users(account_id="ADMIN01", fname="Ada", lname="Admin", email="admin@example.com",
+                  password_hash="x", user_type="admin")
+    db.add(admin)
+    db.commit()
+    this_month = datetime.utcnow().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    for amount, created_at in (("2.5", this_month + timedelta(minutes=1)), ("4", this_month - timedelta(days=2))):
+        db.add(Transaction_history(
+            account_id="AGENT01", transaction_type="commission", amount=Decimal(amount),
+            wallet_type="agent-wallet", done_by=admin.id, created_at=created_at
+        ))
+    db.commit()
+
+    token = create_access_token(admin.email, admin.id, admin.user_type, timedelta(minutes=5))
+    response = client.get("/counts/admin-commission-stats", headers={"Authorization": f"Bearer {token}"})
+
+    assert response.status_code == 200
+    assert response.json()["monthly_commission"] == 2.5
+    # Users.created_at is a real timestamp now
+    assert isinstance(db.query(Users.created_at).scalar(), datetime)
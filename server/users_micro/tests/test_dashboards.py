@@ -0,0 +1,135 @@
+# users_micro/tests/test_dashboards.py
+
+import asyncio
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import pytest
+
+import functions.admin_dashboard as admin_dashboard
+from Endpoints.auth import create_access_token
+from functions.admin_dashboard import admin_dashboard_cache
+from models.userModels import Transaction_history, Users, Wallet
+
+TODAY = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+
+# (type, amount, created_at) handled by the agent
+AGENT_TRANSACTIONS = [
+    ("deposit", "100.1", TODAY + timedelta(hours=3)),
+    ("deposit", "0.2", TODAY + timedelta(hours=3, minutes=30)),
+    ("withdrawal", "-40.05", TODAY + timedelta(hours=15)),
+    # Reversal rows with the other sign are not deposits or withdrawals
+    ("deposit", "-5", TODAY + timedelta(hours=15)),
+    ("withdrawal", "7", TODAY + timedelta(hours=15)),
+    ("transfer_sent", "-3", TODAY + timedelta(hours=16)),
+    ("deposit", "1000", TODAY - timedelta(days=1)),
+]
+
+
+def bearer(user: Users) -> dict:
+    token = create_access_token(user.email, user.id, user.user_type, timedelta(minutes=5))
+    return {"Authorization": f"Bearer {token}"}
+
+
+@pytest.fixture
+def agent(client, db):
+    user = Users(account_id="AGENT01", fname="Agnes", lname="Agent", email="agent01@example.com",
+                 password_hash="x", user_type="agent")
+    db.add(user)
+    db.add(Wallet(account_id="AGENT01", wallet_type="agent-wallet", balance=Decimal("12.5")))
+    db.commit()
+    for transaction_type, amount, created_at in AGENT_TRANSACTIONS:
+        db.add(Transaction_history(
+            account_id="CUSTOMER01",
+            transaction_type=transaction_type,
+            amount=Decimal(amount),
+            wallet_type="savings",
+            done_by=user.id,
+            created_at=created_at
+        ))
+    db.commit()
+    return user
+
+
+def test_agent_metrics_match_the_rows(client, agent):
+    deposits = sum(Decimal(a) for t, a, _ in AGENT_TRANSACTIONS if t == "deposit" and Decimal(a) > 0)
+    withdrawals = sum(-Decimal(a) for t, a, _ in AGENT_TRANSACTIONS if t == "withdrawal" and Decimal(a) < 0)
+
+    response = client.get("/counts/agent-dashboard-metrics", headers=bearer(agent))
+    assert response.status_code == 200
+    metrics = response.json()["metrics"]
+    assert metrics["deposits"]["total"] == float(deposits)
+    assert metrics["withdrawals"]["total"] == float(withdrawals)
+    assert metrics["transactions"]["total"] == len(AGENT_TRANSACTIONS)
+    assert metrics["commission"]["total"] == 12.5
+
+
+def test_agent_daily_transactions_by_hour(client, agent):
+    response = client.get("/counts/agent-daily-transactions", headers=bearer(agent))
+    assert response.status_code == 200
+    hours = response.json()["daily_transactions"]
+
+    assert len(hours) == 24
+    assert hours[3] == {"hour": "03:00", "deposits": 100.3, "withdrawals": 0.0}
+    assert hours[15] == {"hour": "15:00", "deposits": 0.0, "withdrawals": 40.05}
+    assert sum(h["deposits"] + h["withdrawals"] for i, h in enumerate(hours) if i not in (3, 15)) == 0
+
+
+def test_agent_weekly_activity_by_day(client, agent):
+    response = client.get("/counts/agent-weekly-activity", headers=bearer(agent))
+    assert response.status_code == 200
+    days = {day["day"]: day for day in response.json()["weekly_activity"]}
+
+    yesterday = (TODAY - timedelta(days=1)).strftime("%a")
+    assert days[yesterday] == {"day": yesterday, "deposits": 1000.0, "withdrawals": 0.0, "commission": 0.0, "wallet": 12.5}
+    quiet = (TODAY - timedelta(days=3)).strftime("%a")
+    assert days[quiet] == {"day": quiet, "deposits": 0.0, "withdrawals": 0.0, "commission": 0.0, "wallet": 0.0}
+
+
+
+def test_admin_dashboard_is_served_from_the_snapshot(client, db, agent):
+    admin = Users(account_id="ADMIN01", fname="Ada", lname="Admin", email="admin01@example.com",
+                  password_hash="x", user_type="admin")
+    db.add(admin)
+    db.commit()
+
+    response = client.get("/counts/admin-dashboard-stats", headers=bearer(admin))
+    assert response.status_code == 200
+    stats = response.json()
+    assert stats["overview"]["total_users"] == 2
+    assert stats["overview"]["total_agents"] == 1
+    assert stats["overview"]["total_deposits"] == 1100.3
+    assert stats["overview"]["total_withdrawals"] == 40.05
+    assert stats["overview"]["total_commission"] == 12.5
+
+    # Served from the snapshot until it goes stale
+    db.add(Transaction_history(account_id="CUSTOMER01", transaction_type="deposit", amount=1, done_by=agent.id))
+    db.commit()
+    assert client.get("/counts/admin-dashboard-stats", headers=bearer(admin)).json() == stats
+
+    admin_dashboard_cache._built_at -= admin_dashboard_cache.max_age
+    rebuilt = client.get("/counts/admin-dashboard-stats", headers=bearer(admin)).json()
+    assert rebuilt["as_of"] != stats["as_of"]
+    assert rebuilt["overview"]["total_deposits"] == 1101.3
+
+
+def test_admin_dashboard_is_for_admins(client, agent):
+    assert client.get("/counts/admin-dashboard-stats", headers=bearer(agent)).status_code == 403
+
+
+def test_concurrent_misses_build_the_snapshot_once(monkeypatch):
+    builds = []
+
+    def build(db):
+        builds.append(db)
+        time.sleep(0.05)
+        return {"as_of": len(builds)}
+
+    monkeypatch.setattr(admin_dashboard, "build_admin_dashboard", build)
+
+    async def many_requests():
+        return await asyncio.gather(*(admin_dashboard_cache.get() for _ in range(5)))
+
+    assert asyncio.run(many_requests()) == [{"as_of": 1}] * 5
+    assert len(builds) == 1
@@ -0,0 +1,13 @@
+# users_micro/tests/test_database.py
+
+from db.database import to_async_url
+
+
+def test_async_url_uses_an_asyncio_driver():
+    assert to_async_url("sqlite:///app.db").render_as_string() == "sqlite+aiosqlite:///app.db"
+    assert to_async_url("postgres://u:p@host/app").render_as_string(hide_password=False) == (
+        "postgresql+asyncpg://u:p@host/app"
+    )
+    assert to_async_url("postgresql://u:p@host/app?sslmode=require").render_as_string(hide_password=False) == (
+        "postgresql+asyncpg://u:p@host/app?ssl=require"
+    )
@@ -0,0 +1,241 @@
+# users_micro/tests/test_email.py
+
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+import functions.bulk_email as bulk_email
+import functions.email_outbox as email_outbox
+import functions.send_mail as send_mail
+from Endpoints.auth import create_access_token
+from db.database import SessionLocal
+from functions.smtp_pool import SMTPDeliveryUnknown
+from models.userModels import BulkEmailJob, EmailOutbox, Users
+
+
+def outbox_row(email_id: int) -> EmailOutbox:
+    db = SessionLocal()
+    try:
+        return db.query(EmailOutbox).filter(EmailOutbox.id == email_id).one()
+    finally:
+        db.close()
+
+
+def make_due(db):
+    db.query(EmailOutbox).update({"next_attempt_at": datetime.utcnow()})
+    db.commit()
+
+
+@pytest.fixture
+def queued(db):
+    email = email_outbox.queue_email(db, "someone@example.com", "Hello", "<p>Hi</p>")
+    db.commit()
+    return email.id
+
+
+def test_outbox_sends_queued_emails_once(queued, monkeypatch):
+    sent = []
+    monkeypatch.setattr(email_outbox, "send_new_email", lambda *args: sent.append(args))
+
+    assert email_outbox.dispatch_pending_emails() == 1
+    assert email_outbox.dispatch_pending_emails() == 0
+
+    email = outbox_row(queued)
+    assert sent == [("someone@example.com", "Hello", "<p>Hi</p>", None)]
+    assert (email.status, email.attempts, email.last_error) == ("sent", 1, None)
+    assert email.sent_at is not None
+
+
+def test_outbox_backs_off_then_gives_up(db, queued, monkeypatch):
+    def send(*args):
+        raise RuntimeError("mailbox unavailable")
+
+    monkeypatch.setattr(email_outbox, "send_new_email", send)
+    monkeypatch.setattr(email_outbox, "EMAIL_OUTBOX_MAX_ATTEMPTS", 2)
+
+    before = datetime.utcnow()
+    assert email_outbox.dispatch_pending_emails() == 1
+    email = outbox_row(queued)
+    assert (email.status, email.attempts, email.last_error) == ("pending", 1, "mailbox unavailable")
+    assert email.next_attempt_at >= before + timedelta(seconds=30)
+    # Not due again until the backoff has passed
+    assert email_outbox.dispatch_pending_emails() == 0
+
+    make_due(db)
+    assert email_outbox.dispatch_pending_emails() == 1
+    assert (outbox_row(queued).status, outbox_row(queued).attempts) == ("failed", 2)
+
+    make_due(db)
+    assert email_outbox.dispatch_pending_emails() == 0
+
+
+
+
+def test_outbox_does_not_resend_an_email_that_may_have_been_delivered(db, queued, monkeypatch):
+    class DroppingPool:
+        def send(self, from_addr, to_addrs, message):
+            raise SMTPDeliveryUnknown("dropped at data")
+
+    # Through send_new_email, which must not turn it into an ordinary failure
+    monkeypatch.setattr(send_mail, "get_smtp_pool", lambda username, password: DroppingPool())
+    monkeypatch.setattr(send_mail, "AFRITON_SENDER_EMAIL", "noreply@example.com")
+    assert email_outbox.dispatch_pending_emails() == 1
+
+    email = outbox_row(queued)
+    assert (email.status, email.attempts) == ("unconfirmed", 1)
+    assert "dropped at data" in email.last_error
+    make_due(db)
+    assert email_outbox.dispatch_pending_emails() == 0
+
+def test_outbox_claims_emails_before_sending(queued, monkeypatch):
+    seen = []
+    # The claim is committed, so another session sees the row as taken during the send
+    monkeypatch.setattr(email_outbox, "send_new_email", lambda *args: seen.append(outbox_row(queued).status))
+
+    assert email_outbox.dispatch_pending_emails() == 1
+    assert seen == ["sending"]
+    assert outbox_row(queued).status == "sent"
+
+
+def test_outbox_reclaims_only_expired_leases(db, queued, monkeypatch):
+    sent = []
+    monkeypatch.setattr(email_outbox, "send_new_email", lambda *args: sent.append(args[0]))
+
+    # A worker claimed the email and is still within its lease
+    db.query(EmailOutbox).update({
+        "status": "sending", "attempts": 1, "next_attempt_at": datetime.utcnow() + timedelta(minutes=5)
+    })
+    db.commit()
+    assert email_outbox.dispatch_pending_emails() == 0
+
+    # The worker died and the lease ran out
+    make_due(db)
+    assert email_outbox.dispatch_pending_emails() == 1
+    assert sent == ["someone@example.com"]
+    assert (outbox_row(queued).status, outbox_row(queued).attempts) == ("sent", 2)
+
+class FakePool:
+    """Stands in for the SMTP pool, refusing the given addresses"""
+
+    def __init__(self, refuse=()):
+        self.refuse = set(refuse)
+        self.sent = []
+
+    def send(self, from_addr, to_addrs, message):
+        self.sent.extend(to_addrs)
+        return {email: (550, b"no such user") for email in to_addrs if email in self.refuse}
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    pool = FakePool()
+    monkeypatch.setattr(bulk_email, "get_smtp_pool", lambda username, password: pool)
+    monkeypatch.setattr(bulk_email, "ADROIT_SENDER_EMAIL", "news@example.com")
+    monkeypatch.setattr(bulk_email, "BULK_EMAIL_RATE_PER_SECOND", 0)
+    monkeypatch.setattr(bulk_email, "BULK_EMAIL_CHUNK_SIZE", 2)
+    return pool
+
+
+@pytest.fixture
+def citizens(db):
+    """Five citizens and an agent, in id order"""
+    users = [
+        Users(account_id=f"USER0{i}", fname="Test", lname="User", email=f"user{i}@example.com",
+              password_hash="x", user_type="agent" if i == 3 else "citizen")
+        for i in range(6)
+    ]
+    db.add_all(users)
+    db.commit()
+    return [user for user in users if user.user_type == "citizen"]
+
+
+def add_job(db, **fields) -> int:
+    job = BulkEmailJob(created_by=1, subject="News", message="Hello", user_type="citizen", **fields)
+    db.add(job)
+    db.commit()
+    return job.id
+
+
+def test_bulk_email_job_sends_every_chunk(db, pool, citizens):
+    job_id = add_job(db)
+    assert bulk_email.claim_bulk_email_job() == job_id
+    bulk_email.run_bulk_email_job(job_id)
+
+    job = db.query(BulkEmailJob).filter(BulkEmailJob.id == job_id).one()
+    assert sorted(pool.sent) == sorted(user.email for user in citizens)
+    assert (job.status, job.sent_count, job.failed_count) == ("completed", 5, 0)
+    assert job.cursor == citizens[-1].id
+    assert bulk_email.claim_bulk_email_job() is None
+
+
+
+def test_bulk_email_sends_outside_a_transaction(db, pool, citizens, monkeypatch):
+    sessions = []
+
+    def session_local():
+        sessions.append(SessionLocal())
+        return sessions[-1]
+
+    def send(from_addr, to_addrs, message):
+        # No session may sit idle in a transaction while SMTP runs
+        assert not any(session.in_transaction() for session in sessions)
+        return FakePool.send(pool, from_addr, to_addrs, message)
+
+    monkeypatch.setattr(bulk_email, "SessionLocal", session_local)
+    monkeypatch.setattr(pool, "send", send)
+    bulk_email.run_bulk_email_job(add_job(db))
+
+    assert sorted(pool.sent) == sorted(user.email for user in citizens)
+
+def test_orphaned_bulk_email_job_resumes_from_its_cursor(db, pool, citizens):
+    long_ago = datetime.utcnow() - timedelta(seconds=bulk_email.BULK_EMAIL_STALE_SECONDS + 60)
+    # A slow chunk: no progress for a while, but the heartbeat is fresh
+    job_id = add_job(
+        db, status="running", cursor=citizens[1].id, sent_count=2,
+        updated_at=long_ago, heartbeat_at=datetime.utcnow()
+    )
+    assert bulk_email.claim_bulk_email_job() is None
+
+    # The worker died and the heartbeat stopped too
+    db.query(BulkEmailJob).update({"heartbeat_at": long_ago})
+    db.commit()
+    assert bulk_email.claim_bulk_email_job() == job_id
+    bulk_email.run_bulk_email_job(job_id)
+
+    db.expire_all()
+    job = db.query(BulkEmailJob).filter(BulkEmailJob.id == job_id).one()
+    assert pool.sent == [user.email for user in citizens[2:]]
+    assert (job.status, job.sent_count) == ("completed", 5)
+
+
+def test_bulk_email_reports_refused_recipients(db, pool, monkeypatch):
+    monkeypatch.setattr(bulk_email, "BULK_EMAIL_BCC_SIZE", 2)
+    pool.refuse = {"b@example.com"}
+    job_id = add_job(db, recipients=json.dumps(["a@example.com", "b@example.com", "c@example.com"]))
+    bulk_email.run_bulk_email_job(job_id)
+
+    job = db.query(BulkEmailJob).filter(BulkEmailJob.id == job_id).one()
+    assert (job.sent_count, job.failed_count, job.cursor) == (2, 1, 3)
+    assert json.loads(job.failed_recipients) == [{"email": "b@example.com", "error": "550 no such user"}]
+
+
+def test_send_emails_only_queues_a_job(client, db, pool, citizens):
+    admin = Users(account_id="ADMIN01", fname="Ada", lname="Admin", email="admin@example.com",
+                  password_hash="x", user_type="admin")
+    db.add(admin)
+    db.commit()
+    token = create_access_token(admin.email, admin.id, admin.user_type, timedelta(minutes=5))
+    headers = {"Authorization": f"Bearer {token}"}
+
+    response = client.post("/auth/send-emails", json={
+        "subject": "News", "message": "Hello", "user_type": "citizen"
+    }, headers=headers)
+    assert response.status_code == 202
+    details = response.json()["details"]
+    assert (details["status"], details["recipient_count"]) == ("queued", 5)
+    assert pool.sent == []
+
+    bulk_email.run_bulk_email_job(bulk_email.claim_bulk_email_job())
+    progress = client.get(f"/auth/send-emails/{details['job_id']}", headers=headers).json()
+    assert (progress["status"], progress["sent_count"], progress["pending_count"]) == ("completed", 5, 0)
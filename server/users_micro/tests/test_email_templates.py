@@ -0,0 +1,52 @@
+# users_micro/tests/test_email_templates.py
+
+import email
+
+import functions.send_mail as send_mail
+from emailsTemps.custom_email_send import custom_email
+from emailsTemps.registry import Markup, html_to_text, register_template
+from functions.email_outbox import queue_email
+
+
+def test_template_escapes_fields_but_not_markup():
+    template = register_template("test_greeting", "<p>Hi {name}</p>{body}", "Hi {name}\n{body}")
+    rendered = template.render(name="<Tom & Jerry>", body=Markup("<b>Welcome</b>"))
+
+    assert rendered == "<p>Hi &lt;Tom &amp; Jerry&gt;</p><b>Welcome</b>"
+    assert rendered.text == "Hi <Tom & Jerry>\nWelcome"
+
+
+def test_html_to_text():
+    assert html_to_text(
+        "<head><style>p {}</style></head><p>Hello&nbsp;there</p><ul><li>One</li><li>Two</li></ul>"
+    ) == "Hello there\n- One\n- Two"
+
+
+def test_custom_email_has_a_text_part():
+    rendered = custom_email("Ann", "Deposit", "<p>You received <b>5 AFT</b></p>")
+
+    assert "Hi Ann," in rendered
+    assert "<b>5 AFT</b>" in rendered
+    assert rendered.text.startswith("Hi Ann,\n\nDeposit\n\nYou received 5 AFT")
+    assert "<" not in rendered.text
+
+
+def test_queued_email_keeps_the_text_part(db):
+    rendered = custom_email("Ann", "Deposit", "<p>Done</p>")
+    queued = queue_email(db, "ann@example.com", "Deposit", rendered)
+    assert queued.body == rendered
+    assert queued.text_body == rendered.text
+
+
+def test_sent_email_is_multipart(monkeypatch):
+    class Pool:
+        def send(self, from_addr, to_addrs, message):
+            self.message = email.message_from_string(message)
+
+    pool = Pool()
+    monkeypatch.setattr(send_mail, "get_smtp_pool", lambda username, password: pool)
+    monkeypatch.setattr(send_mail, "AFRITON_SENDER_EMAIL", "noreply@example.com")
+    send_mail.send_new_email("ann@example.com", "Hello", "<p>Hi <b>Ann</b></p>")
+
+    parts = {part.get_content_type(): part.get_payload(decode=True).decode() for part in pool.message.get_payload()}
+    assert parts == {"text/plain": "Hi Ann", "text/html": "<p>Hi <b>Ann</b></p>"}
@@ -0,0 +1,58 @@
+# users_micro/tests/test_idempotency.py
+
+import asyncio
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import functions.idempotency as idempotency
+from db.database import AsyncSessionLocal, SessionLocal
+from functions.idempotency import commit_with_response, purge_expired_idempotency_keys, request_fingerprint
+from models.userModels import IdempotencyKey, Wallet
+
+
+def commit_wallet(key, response):
+    async def run():
+        async with AsyncSessionLocal() as session:
+            session.add(Wallet(account_id="A1", balance=Decimal("5")))
+            return await commit_with_response(session, 1, key, "transfer", request_fingerprint(amount=5), response)
+
+    return asyncio.run(run())
+
+
+def test_losing_a_race_for_the_key_replays_the_winner(db):
+    # The parallel request with the same key committed first
+    other = SessionLocal()
+    other.add(IdempotencyKey(user_id=1, idempotency_key="k", endpoint="transfer", response_body='{"winner": true}'))
+    other.commit()
+    other.close()
+
+    assert commit_wallet("k", {"winner": False}) == ({"winner": True}, False)
+    # Our own work was rolled back with the losing key
+    assert db.query(Wallet).count() == 0
+
+
+def test_without_a_key_the_work_is_just_committed(db):
+    assert commit_wallet(None, {"ok": True}) == ({"ok": True}, True)
+    assert db.query(Wallet).count() == 1
+    assert db.query(IdempotencyKey).count() == 0
+
+
+def test_amounts_are_fingerprinted_by_value():
+    assert request_fingerprint(amount=Decimal("10"), currency="AFT") == request_fingerprint(
+        currency="AFT", amount=Decimal("10.00")
+    )
+    assert request_fingerprint(amount=Decimal("10")) != request_fingerprint(amount=Decimal("10.01"))
+
+
+def test_expired_keys_are_purged(db, monkeypatch):
+    now = datetime.utcnow()
+    for key, age in (("old", timedelta(days=2)), ("older", timedelta(days=3)), ("fresh", timedelta(hours=1))):
+        db.add(IdempotencyKey(
+            user_id=1, idempotency_key=key, endpoint="transfer", response_body="{}", created_at=now - age
+        ))
+    db.commit()
+
+    # Small batches still remove every expired key
+    monkeypatch.setattr(idempotency, "IDEMPOTENCY_PURGE_BATCH_SIZE", 1)
+    assert purge_expired_idempotency_keys() == 2
+    assert [key for key, in db.query(IdempotencyKey.idempotency_key)] == ["fresh"]
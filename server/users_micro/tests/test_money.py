@@ -0,0 +1,18 @@
+# users_micro/tests/test_money.py
+
+from decimal import Decimal
+from functions.money import round_money, round_afriton, fee, TOTAL_FEE_RATE, AGENT_COMMISSION_RATE
+
+def test_round_money_uses_currency_precision():
+    assert round_money("1234.5", "RWF") == Decimal("1235")
+    assert round_money("10.005", "USD") == Decimal("10.01")
+    assert round_money("1.2345", "TND") == Decimal("1.235")
+    assert round_money("7400.126", "AFT_KES") == Decimal("7400.13")
+    assert round_afriton(0.1 + 0.2) == Decimal("0.3000")
+
+def test_fee_split_adds_up():
+    amount = Decimal("3.3333")
+    total_fee = fee(amount, TOTAL_FEE_RATE)
+    agent_commission = fee(amount, AGENT_COMMISSION_RATE)
+    assert total_fee == Decimal("0.1667")
+    assert agent_commission + (total_fee - agent_commission) == total_fee
@@ -0,0 +1,158 @@
+# users_micro/tests/test_pagination.py
+
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import event
+
+from db.database import engine
+from Endpoints.auth import create_access_token
+from functions.pagination import decode_cursor, encode_cursor
+from models.userModels import Transaction_history, Users, Withdrawal_request
+
+START = datetime(2025, 1, 1, 12, 0, 0)
+
+
+@pytest.fixture
+def account(client, db):
+    user = Users(account_id="PAGED01", fname="Paula", lname="Pager", email="paged01@example.com", password_hash="x")
+    db.add(user)
+    db.commit()
+    # Pairs of rows share a timestamp so ties have to be broken by id
+    for i in range(9):
+        db.add(Transaction_history(
+            account_id="PAGED01",
+            transaction_type="deposit",
+            amount=i + 1,
+            wallet_type="savings" if i % 3 else "agent-wallet",
+            done_by=user.id,
+            created_at=START + timedelta(minutes=i // 2)
+        ))
+    db.commit()
+    token = create_access_token(user.email, user.id, user.user_type, timedelta(minutes=5))
+    return {"Authorization": f"Bearer {token}"}
+
+
+def list_transactions(client, account, **params):
+    return client.get(
+        "/wallet/transactions/all", params={"account_id": "PAGED01", **params}, headers=account
+    ).json()
+
+
+def test_cursor_pages_match_offset_order(client, account):
+    offset_ids = [tx["id"] for tx in list_transactions(client, account, per_page=100)["transactions"]]
+    assert len(offset_ids) == 9
+
+    cursor_ids, cursor = [], None
+    while True:
+        params = {"per_page": 2, "pagination": "cursor"}
+        if cursor:
+            params["cursor"] = cursor
+        page = list_transactions(client, account, **params)
+        cursor_ids += [tx["id"] for tx in page["transactions"]]
+        assert page["pagination"]["total_items"] is None
+        cursor = page["pagination"]["next_cursor"]
+        assert (cursor is None) == (not page["pagination"]["has_next"])
+        if cursor is None:
+            break
+
+    assert cursor_ids == offset_ids
+
+
+
+def test_rows_without_a_date_come_last(client, db, account):
+    undated = Transaction_history(account_id="PAGED01", transaction_type="deposit", amount=1, wallet_type="savings")
+    db.add(undated)
+    db.commit()
+    db.query(Transaction_history).filter(Transaction_history.id == undated.id).update({"created_at": None})
+    db.commit()
+
+    offset_ids = [tx["id"] for tx in list_transactions(client, account, per_page=100)["transactions"]]
+    assert offset_ids[-1] == undated.id
+
+    cursor_ids, cursor = [], None
+    while True:
+        params = {"per_page": 4, "pagination": "cursor"}
+        if cursor:
+            params["cursor"] = cursor
+        page = list_transactions(client, account, **params)
+        cursor_ids += [tx["id"] for tx in page["transactions"]]
+        cursor = page["pagination"]["next_cursor"]
+        if cursor is None:
+            break
+    # A cursor can't point past a NULL, so cursor mode leaves these rows out
+    assert cursor_ids == offset_ids[:-1]
+
+def test_offset_pages_count_by_default(client, account):
+    pagination = list_transactions(client, account, per_page=4, page=3)["pagination"]
+    assert (pagination["total_items"], pagination["total_pages"], pagination["has_next"]) == (9, 3, False)
+
+    pagination = list_transactions(client, account, pagination="cursor", with_total=True)["pagination"]
+    assert pagination["total_items"] == 9
+
+
+def test_invalid_cursor_is_rejected(client, account):
+    response = client.get(
+        "/wallet/transactions/all", params={"pagination": "cursor", "cursor": "not-a-cursor"}, headers=account
+    )
+    assert response.status_code == 400
+
+    assert decode_cursor(encode_cursor(START, 42)) == (START, 42)
+    with pytest.raises(HTTPException):
+        decode_cursor(encode_cursor(START, 1)[:-4])
+
+
+def test_withdrawal_requests_count_by_default(client, db, account):
+    for _ in range(3):
+        db.add(Withdrawal_request(account_id="PAGED01", amount=1, wallet_type="savings", created_at=START))
+    db.commit()
+
+    response = client.get("/wallet/my-withdrawal-requests", params={"limit": 2}, headers=account).json()
+    assert (response["total_requests"], response["total_items"], response["has_next"]) == (2, 3, True)
+
+    response = client.get(
+        "/wallet/my-withdrawal-requests", params={"pagination": "cursor"}, headers=account
+    ).json()
+    assert (response["total_requests"], response["total_items"]) == (3, None)
+
+def test_listing_joins_names_instead_of_querying_per_row(client, account):
+    statements = []
+
+    def count(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", count)
+    try:
+        small = list_transactions(client, account, per_page=2)["transactions"]
+        queries_for_small = len(statements)
+        large = list_transactions(client, account, per_page=9)["transactions"]
+    finally:
+        event.remove(engine, "before_cursor_execute", count)
+
+    assert len(statements) - queries_for_small == queries_for_small
+    assert {(tx["user_name"], tx["agent_name"]) for tx in small + large} == {("Paula Pager", "Paula Pager")}
+
+
+def test_last_transaction_per_wallet(client, db, account):
+    # Two newest savings rows at the same time, the later id wins
+    for amount in (10, 11):
+        db.add(Transaction_history(
+            account_id="PAGED01", transaction_type="deposit", amount=amount,
+            wallet_type="savings", created_at=START + timedelta(hours=1)
+        ))
+    db.commit()
+
+    newest = {}
+    for tx in db.query(Transaction_history).order_by(Transaction_history.created_at, Transaction_history.id):
+        newest[tx.wallet_type] = tx.id
+
+    def last_ids(**params):
+        response = client.get(
+            "/wallet/transactions/last-transaction", params={"account_id": "PAGED01", **params}, headers=account
+        )
+        assert response.status_code == 200
+        return {wallet: tx["id"] for wallet, tx in response.json()["transactions"].items()}
+
+    assert last_ids() == newest
+    assert last_ids(wallet_type="savings") == {"savings": newest["savings"]}
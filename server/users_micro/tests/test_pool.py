@@ -0,0 +1,42 @@
+# users_micro/tests/test_pool.py
+
+from sqlalchemy import create_engine
+
+import db.pool as pool
+from db.pool import InstrumentedQueuePool, PoolStats, engine_options, instrument, pool_metrics, warm_up
+
+
+def test_wait_histogram_buckets():
+    stats = PoolStats()
+    stats.observe(0.0005)
+    stats.observe(0.003)
+    stats.observe(10)
+    stats.record_timeout()
+
+    snapshot = stats.snapshot()
+    assert (snapshot["checkouts"], snapshot["timeouts"], snapshot["max_wait_ms"]) == (3, 1, 10000.0)
+    assert snapshot["wait_histogram"]["<=1ms"] == 1
+    assert snapshot["wait_histogram"]["<=5ms"] == 1
+    assert snapshot["wait_histogram"][">5000ms"] == 1
+
+
+def test_sqlite_keeps_the_default_pool():
+    assert engine_options("sqlite:///app.db") == {}
+    assert engine_options("postgres://u:p@host/app")["poolclass"] is InstrumentedQueuePool
+
+
+def test_pool_stats_survive_dispose(tmp_path, monkeypatch):
+    monkeypatch.setattr(pool, "_instrumented_pools", {})
+    engine = instrument("test", create_engine(
+        f"sqlite:///{tmp_path / 'pool.db'}", poolclass=InstrumentedQueuePool, pool_size=2, max_overflow=pool.DB_MAX_OVERFLOW
+    ))
+    warm_up(engine, count=5)
+    engine.dispose()
+    engine.connect().close()
+
+    [metrics] = pool_metrics()
+    # Warm-up is capped at the pool size
+    assert metrics["checkouts"] == 3
+    assert metrics["size"] == 2
+    assert metrics["checked_in"] == 1
+    assert metrics["max_overflow"] == pool.DB_MAX_OVERFLOW
@@ -0,0 +1,176 @@
+# users_micro/tests/test_rates.py
+
+import pytest
+
+import Endpoints.conversionRate as conversion_rate
+from functions.rate_cache import RateCache, cross_rate_matrix, rate_cache
+from models.userModels import CurrencyCategory, CurrencyRate
+from seed_rates import DEFAULT_CATEGORIES, DEFAULT_RATES, seed_default_rates
+
+
+@pytest.fixture
+def rates(db):
+    african = CurrencyCategory(name="african_currencies")
+    european = CurrencyCategory(name="european_currencies")
+    db.add_all([african, european])
+    db.flush()
+    db.add_all([
+        CurrencyRate(category_id=african.id, currency_name="rwandan_franc", currency_code="RWF", rate_to_afriton=12000),
+        CurrencyRate(category_id=european.id, currency_name="euro", currency_code="EUR", rate_to_afriton=9.3),
+        CurrencyRate(category_id=european.id, currency_name="old_franc", currency_code="FRF", rate_to_afriton=60, is_active=False),
+    ])
+    db.commit()
+
+
+def set_rate(db, code, rate):
+    db.query(CurrencyRate).filter(CurrencyRate.currency_code == code).update({"rate_to_afriton": rate})
+    db.commit()
+
+
+def test_rate_cache_keeps_active_rates_by_code(db, rates):
+    snapshot = RateCache().snapshot(db)
+    assert snapshot.categories == ["african_currencies", "european_currencies"]
+    assert sorted(snapshot.by_code) == ["EUR", "RWF"]
+    assert snapshot.by_code["RWF"]["rate_to_afriton"] == 12000
+    assert snapshot.by_code["EUR"]["category"] == "european_currencies"
+
+
+def test_rate_cache_reloads_only_when_invalidated(db, rates):
+    cache = RateCache()
+    first = cache.snapshot(db)
+    assert cache.snapshot(db) is first
+
+    set_rate(db, "RWF", 13000)
+    assert cache.get_rate("RWF", db)["rate_to_afriton"] == 12000
+
+    cache.invalidate()
+    assert cache.get_rate("RWF", db)["rate_to_afriton"] == 13000
+    assert cache.snapshot(db).version != first.version
+
+
+def test_rate_cache_expires_after_ttl(db, rates):
+    cache = RateCache(ttl=0)
+    assert cache.snapshot(db) is not cache.snapshot(db)
+
+
+def test_rate_cache_version_follows_content(db, rates):
+    version = RateCache().snapshot(db).version
+    assert RateCache().snapshot(db).version == version
+
+    set_rate(db, "EUR", 9.4)
+    assert RateCache().snapshot(db).version != version
+
+
+def test_conversion_rates_etag(client, db):
+    response = client.get("/rate/conversion-rates")
+    assert response.status_code == 200
+    etag = response.headers["ETag"]
+    assert response.json()["african_currencies"]["rwandan_franc"] == "1 afriton = 12000 RWF"
+
+    for if_none_match in (etag, f"W/{etag}", f'"other", {etag}'):
+        not_modified = client.get("/rate/conversion-rates", headers={"If-None-Match": if_none_match})
+        assert not_modified.status_code == 304
+        assert not_modified.content == b""
+        assert not_modified.headers["ETag"] == etag
+
+    set_rate(db, "RWF", 13000)
+    rate_cache.invalidate()
+    changed = client.get("/rate/conversion-rates", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+    assert changed.json()["african_currencies"]["rwandan_franc"] == "1 afriton = 13000 RWF"
+
+
+def test_startup_seeds_the_default_rates(client, db):
+    assert db.query(CurrencyCategory).count() == len(DEFAULT_CATEGORIES)
+    assert db.query(CurrencyRate).count() == len(DEFAULT_RATES)
+
+
+def test_seed_runs_only_on_an_empty_rates_table(db):
+    assert seed_default_rates(db) == {"categories_added": len(DEFAULT_CATEGORIES), "rates_added": len(DEFAULT_RATES)}
+    assert seed_default_rates(db) == {"categories_added": 0, "rates_added": 0}
+
+    # A default an admin deleted stays deleted, and changed rates are left alone
+    set_rate(db, "EUR", 9.5)
+    db.query(CurrencyRate).filter(CurrencyRate.currency_code == "RWF").delete()
+    db.commit()
+    assert seed_default_rates(db) == {"categories_added": 0, "rates_added": 0}
+    assert db.query(CurrencyRate).filter(CurrencyRate.currency_code == "RWF").count() == 0
+    assert db.query(CurrencyRate.rate_to_afriton).filter(CurrencyRate.currency_code == "EUR").scalar() == 9.5
+
+
+def test_batch_conversion_matches_single_conversions(client):
+    conversions = [
+        {"amount": 1000, "from_currency": "RWF", "to_currency": "afriton"},
+        {"amount": 5, "from_currency": "afriton", "to_currency": "KES"},
+        {"amount": 100, "from_currency": "EUR", "to_currency": "NGN"},
+    ]
+    response = client.post("/rate/convert/batch", json=conversions)
+    assert response.status_code == 200
+
+    results = response.json()
+    assert len(results) == len(conversions)
+    for item, result in zip(conversions, results):
+        single = client.get(f"/rate/convert/{item['amount']}/{item['from_currency']}/to/{item['to_currency']}")
+        assert result == single.json()
+
+
+def test_batch_conversion_rejects_unsupported_currencies(client):
+    response = client.post("/rate/convert/batch", json=[
+        {"amount": 1, "from_currency": "RWF", "to_currency": "XXX"},
+        {"amount": 1, "from_currency": "AAA", "to_currency": "afriton"},
+    ])
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Unsupported currency: AAA, XXX"
+
+
+
+def test_batch_conversion_rejects_what_the_single_endpoint_rejects(client, db):
+    assert client.get("/rate/convert/5/afriton/to/afriton").status_code == 400
+    item = {"amount": 5, "from_currency": "afriton", "to_currency": "afriton"}
+    response = client.post("/rate/convert/batch", json=[item])
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Unsupported currency: afriton"
+
+    # A zero rate can't be converted from, but converting to it still works
+    set_rate(db, "EUR", 0)
+    rate_cache.invalidate()
+    assert client.get("/rate/convert/5/EUR/to/afriton").status_code == 400
+    assert client.get("/rate/convert/5/EUR/to/RWF").status_code == 400
+    response = client.post("/rate/convert/batch", json=[{**item, "from_currency": "EUR", "to_currency": "RWF"}])
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Unsupported currency: EUR"
+    response = client.post("/rate/convert/batch", json=[{**item, "to_currency": "EUR"}])
+    assert response.status_code == 200
+    assert response.json()[0] == client.get("/rate/convert/5/afriton/to/EUR").json()
+
+def test_batch_conversion_is_capped(client, monkeypatch):
+    monkeypatch.setattr(conversion_rate, "MAX_BATCH_CONVERSIONS", 2)
+    item = {"amount": 1, "from_currency": "RWF", "to_currency": "afriton"}
+    assert client.post("/rate/convert/batch", json=[item] * 2).status_code == 200
+    assert client.post("/rate/convert/batch", json=[item] * 3).status_code == 400
+
+
+def test_cross_rate_matrix(db, rates):
+    snapshot = RateCache().snapshot(db)
+    table = cross_rate_matrix(snapshot)
+
+    assert table["currencies"] == ["afriton", "RWF", "EUR"]
+    assert table["matrix"][0] == [1.0, 12000.0, 9.3]
+    assert table["matrix"][2][1] == pytest.approx(12000 / 9.3)
+    assert table["matrix"][1][2] == pytest.approx(9.3 / 12000)
+    # Built once per rate version
+    assert cross_rate_matrix(snapshot) is table
+
+
+def test_cross_rates_endpoint(client):
+    table = client.get("/rate/cross-rates").json()
+    currencies, matrix = table["currencies"], table["rates"]
+    assert all(matrix[i][i] == pytest.approx(1) for i in range(len(currencies)))
+
+    row = client.get("/rate/cross-rates", params={"base": "EUR"}).json()
+    assert row["base"] == "EUR"
+    assert row["rates"] == matrix[currencies.index("EUR")]
+    assert row["version"] == table["version"]
+
+    assert client.get("/rate/cross-rates", params={"base": "XXX"}).status_code == 400
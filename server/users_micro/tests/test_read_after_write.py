@@ -0,0 +1,89 @@
+# users_micro/tests/test_read_after_write.py
+
+from datetime import timedelta
+from decimal import Decimal
+
+import pytest
+from starlette.requests import Request
+
+import db.connection as connection
+import Endpoints.wallet as wallet_endpoints
+from Endpoints.auth import create_access_token
+from db.connection import (
+    READ_AFTER_WRITE_COOKIE, READ_AFTER_WRITE_HEADER, make_write_marker, marker_user_id, wrote_recently
+)
+from models.userModels import Users, Wallet
+
+
+def bearer(user: Users) -> dict:
+    token = create_access_token(user.email, user.id, user.user_type, timedelta(minutes=5))
+    return {"Authorization": f"Bearer {token}"}
+
+
+def request_with(headers: dict) -> Request:
+    return Request({
+        "type": "http",
+        "headers": [(name.lower().encode(), value.encode()) for name, value in headers.items()]
+    })
+
+
+@pytest.fixture
+def users(client, db, monkeypatch):
+    monkeypatch.setattr(wallet_endpoints, "send_new_email", lambda *args: True)
+    created = []
+    for account_id in ("SENDER01", "OTHER01"):
+        user = Users(account_id=account_id, fname="Test", lname="User", email=f"{account_id.lower()}@example.com",
+                     password_hash="x", acc_status=True, is_wallet_active=True)
+        db.add(user)
+        db.add(Wallet(account_id=account_id, wallet_type="savings", balance=Decimal("10")))
+        created.append(user)
+    db.commit()
+    return created
+
+
+def transfer(client, sender, amount):
+    return client.post("/wallet/transfer", params={
+        "recipient_account_id": "OTHER01", "amount": amount, "currency": "AFT", "from_wallet_type": "savings"
+    }, headers=bearer(sender))
+
+
+def test_write_routes_hand_out_a_marker(client, users):
+    sender, _ = users
+    response = transfer(client, sender, "1")
+
+    assert response.status_code == 200
+    marker = response.headers[READ_AFTER_WRITE_HEADER]
+    assert marker_user_id(marker) == str(sender.id)
+    assert response.cookies[READ_AFTER_WRITE_COOKIE] == marker
+
+
+def test_failed_writes_hand_out_no_marker(client, users):
+    sender, _ = users
+    response = transfer(client, sender, "100")
+
+    assert response.status_code == 400
+    assert READ_AFTER_WRITE_HEADER not in response.headers
+    assert READ_AFTER_WRITE_COOKIE not in response.cookies
+
+
+def test_marker_counts_only_for_its_own_user(users):
+    sender, other = users
+    marker = make_write_marker(str(sender.id))
+
+    assert wrote_recently(request_with({**bearer(sender), READ_AFTER_WRITE_HEADER: marker}))
+    assert wrote_recently(request_with({**bearer(sender), "Cookie": f"{READ_AFTER_WRITE_COOKIE}={marker}"}))
+    assert not wrote_recently(request_with({**bearer(other), READ_AFTER_WRITE_HEADER: marker}))
+    assert not wrote_recently(request_with({READ_AFTER_WRITE_HEADER: marker}))
+    assert not wrote_recently(request_with(bearer(sender)))
+
+
+def test_forged_or_expired_markers_are_ignored(monkeypatch):
+    user_id, expires, signature = make_write_marker("7").split(".")
+
+    assert marker_user_id(f"8.{expires}.{signature}") is None
+    assert marker_user_id(f"7.{int(expires) + 60}.{signature}") is None
+    assert marker_user_id("garbage") is None
+    assert marker_user_id(None) is None
+
+    monkeypatch.setattr(connection, "READ_YOUR_WRITES_SECONDS", -10)
+    assert marker_user_id(make_write_marker("7")) is None
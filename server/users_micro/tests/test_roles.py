@@ -0,0 +1,43 @@
+# users_micro/tests/test_roles.py
+
+from datetime import timedelta
+from decimal import Decimal
+
+import pytest
+from sqlalchemy.exc import IntegrityError
+
+import Endpoints.otp as otp_endpoints
+from Endpoints.auth import create_access_token
+from models.userModels import Users, Wallet, Workers
+
+
+def test_returning_agent_keeps_their_commission_wallet(client, db, monkeypatch):
+    monkeypatch.setattr(otp_endpoints, "send_new_email", lambda *args: True)
+    admin = Users(account_id="ADMIN01", fname="Ada", lname="Admin", email="admin@example.com",
+                  password_hash="x", user_type="admin")
+    # A former agent, demoted back to citizen with commission still in the wallet
+    former = Users(account_id="FORMER01", fname="Fred", lname="Agent", email="former@example.com",
+                   password_hash="x", user_type="citizen")
+    db.add_all([admin, former, Wallet(account_id="FORMER01", wallet_type="agent-wallet", balance=Decimal("3.5"))])
+    db.commit()
+
+    token = create_access_token(admin.email, admin.id, admin.user_type, timedelta(minutes=5))
+    response = client.post(
+        "/auth/change-user-type",
+        json={"user_id": former.id, "user_type": "agent", "location": "Kigali"},
+        headers={"Authorization": f"Bearer {token}"}
+    )
+
+    assert response.status_code == 200
+    wallets = db.query(Wallet.wallet_type, Wallet.balance).filter(Wallet.account_id == "FORMER01").all()
+    assert sorted(wallets) == [("agent-wallet", Decimal("3.5")), ("savings", Decimal("0"))]
+    assert db.query(Workers).filter(Workers.user_id == former.id).count() == 1
+
+
+def test_an_account_has_one_wallet_per_type(db):
+    db.add(Wallet(account_id="ANN01", wallet_type="savings", balance=Decimal("1")))
+    db.commit()
+
+    db.add(Wallet(account_id="ANN01", wallet_type="savings", balance=Decimal("2")))
+    with pytest.raises(IntegrityError):
+        db.commit()
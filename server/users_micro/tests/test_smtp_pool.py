@@ -0,0 +1,124 @@
+# users_micro/tests/test_smtp_pool.py
+
+import smtplib
+
+import pytest
+
+import functions.smtp_pool as smtp_pool
+from functions.smtp_pool import SMTPDeliveryUnknown, SMTPPool
+
+
+class FakeConnection:
+    """SMTP session that drops at `drop_at` and refuses the pool's `refuse` recipients"""
+
+    def __init__(self, pool, drop_at=None):
+        self.pool = pool
+        self.drop_at = drop_at
+        self.closed = False
+
+    def _command(self, name, *args):
+        self.pool.log.append((name, *args))
+        if name == self.drop_at:
+            raise smtplib.SMTPServerDisconnected(f"dropped at {name}")
+        return 250, b"OK"
+
+    def ehlo_or_helo_if_needed(self):
+        pass
+
+    def mail(self, from_addr):
+        return self._command("mail")
+
+    def rcpt(self, addr):
+        if addr in self.pool.refuse:
+            return 550, b"no such user"
+        return self._command("rcpt", addr)
+
+    def data(self, message):
+        return self._command("data")
+
+    def rset(self):
+        return self._command("rset")
+
+    def noop(self):
+        return (250, b"OK") if not self.closed else (421, b"closed")
+
+    def quit(self):
+        self.closed = True
+
+    def close(self):
+        self.closed = True
+
+
+class FakePool(SMTPPool):
+    def __init__(self, *drops, refuse=()):
+        super().__init__("user", "password", size=2)
+        self.drops = list(drops)
+        self.refuse = set(refuse)
+        self.connections = []
+        self.log = []
+
+    def _connect(self):
+        conn = FakeConnection(self, self.drops.pop(0) if self.drops else None)
+        self.connections.append(conn)
+        return conn
+
+    def delivered(self):
+        return [args[0] for name, *args in self.log if name == "rcpt"]
+
+
+def test_pool_reuses_its_connection():
+    pool = FakePool()
+    pool.send("from@example.com", "a@example.com", "message")
+    pool.send("from@example.com", "b@example.com", "message")
+
+    assert len(pool.connections) == 1
+    assert pool.delivered() == ["a@example.com", "b@example.com"]
+
+
+def test_pool_reconnects_once_after_a_drop_before_data():
+    pool = FakePool("mail")
+    assert pool.send("from@example.com", "a@example.com", "message") == {}
+
+    assert len(pool.connections) == 2
+    assert pool.connections[0].closed
+    assert [name for name, *_ in pool.log] == ["mail", "mail", "rcpt", "data"]
+
+
+def test_pool_gives_up_after_a_second_drop():
+    pool = FakePool("mail", "rcpt")
+    with pytest.raises(smtplib.SMTPServerDisconnected):
+        pool.send("from@example.com", "a@example.com", "message")
+    assert len(pool.connections) == 2
+
+
+def test_pool_does_not_resend_after_data():
+    # The server may have accepted the message before the connection dropped
+    pool = FakePool("data")
+    with pytest.raises(SMTPDeliveryUnknown):
+        pool.send("from@example.com", "a@example.com", "message")
+
+    assert len(pool.connections) == 1
+    assert [name for name, *_ in pool.log].count("data") == 1
+
+
+def test_refused_recipients_keep_the_connection():
+    pool = FakePool(refuse={"a@example.com"})
+    with pytest.raises(smtplib.SMTPRecipientsRefused):
+        pool.send("from@example.com", "a@example.com", "message")
+
+    # Not retried, and the session goes back to the pool for the next send
+    assert pool.send("from@example.com", ["a@example.com", "b@example.com"], "message") == {
+        "a@example.com": (550, b"no such user")
+    }
+    assert len(pool.connections) == 1
+    assert pool.delivered() == ["b@example.com"]
+
+
+def test_idle_connections_are_replaced(monkeypatch):
+    pool = FakePool()
+    pool.send("from@example.com", "a@example.com", "message")
+
+    monkeypatch.setattr(smtp_pool, "SMTP_MAX_IDLE_SECONDS", -1)
+    pool.send("from@example.com", "b@example.com", "message")
+    assert len(pool.connections) == 2
+    assert pool.connections[0].closed
@@ -0,0 +1,222 @@
+# users_micro/tests/test_wallet.py
+
+from datetime import timedelta
+from decimal import Decimal
+
+import pytest
+
+import Endpoints.wallet as wallet_endpoints
+from Endpoints.auth import create_access_token
+from db.database import SessionLocal
+from models.userModels import EmailOutbox, IdempotencyKey, Profit, Transaction_history, Users, Wallet, Withdrawal_request
+
+
+@pytest.fixture(autouse=True)
+def sent_emails(monkeypatch):
+    sent = []
+    monkeypatch.setattr(wallet_endpoints, "send_new_email", lambda *args: sent.append(args))
+    return sent
+
+
+@pytest.fixture
+def sender(client, db):
+    """A citizen with 10 AFT in savings, and a recipient with 1 AFT"""
+    for account_id, fname, balance in (("SENDER01", "Alice", "10"), ("RECIPIENT1", "Bob", "1")):
+        db.add(Users(
+            account_id=account_id, fname=fname, lname="Tester", email=f"{account_id.lower()}@example.com",
+            password_hash="x", acc_status=True, is_wallet_active=True
+        ))
+        db.add(Wallet(account_id=account_id, wallet_type="savings", balance=Decimal(balance)))
+    db.commit()
+    return db.query(Users).filter(Users.account_id == "SENDER01").one()
+
+
+def auth(user: Users) -> dict:
+    token = create_access_token(user.email, user.id, user.user_type, timedelta(minutes=5))
+    return {"Authorization": f"Bearer {token}"}
+
+
+def balance(account_id: str) -> Decimal:
+    db = SessionLocal()
+    try:
+        return db.query(Wallet.balance).filter(
+            Wallet.account_id == account_id, Wallet.wallet_type == "savings"
+        ).scalar()
+    finally:
+        db.close()
+
+
+def transfer(client, user, amount, currency="AFT", **headers):
+    return client.post("/wallet/transfer", params={
+        "recipient_account_id": "RECIPIENT1",
+        "amount": amount,
+        "currency": currency,
+        "from_wallet_type": "savings"
+    }, headers={**auth(user), **headers})
+
+
+def test_transfer_moves_exact_amounts(client, db, sender):
+    # 0.1 + 0.2 style amounts must not drift
+    for amount in ("0.1", "0.2"):
+        assert transfer(client, sender, amount).status_code == 200
+
+    assert balance("SENDER01") == Decimal("9.7")
+    assert balance("RECIPIENT1") == Decimal("1.3")
+    assert [row.amount for row in db.query(Transaction_history).order_by(Transaction_history.id)] == [
+        Decimal("-0.1"), Decimal("0.1"), Decimal("-0.2"), Decimal("0.2")
+    ]
+
+
+def test_transfer_converts_at_afriton_precision(client, db, sender):
+    assert transfer(client, sender, "1000", currency="RWF").status_code == 200
+
+    sent = db.query(Transaction_history).filter(Transaction_history.transaction_type == "transfer_sent").one()
+    assert sent.amount == Decimal("-0.0833")
+    assert sent.original_amount == Decimal("-1000")
+    assert balance("SENDER01") == Decimal("9.9167")
+
+
+def test_transfer_rejects_insufficient_balance(client, db, sender):
+    assert transfer(client, sender, "10.0001").status_code == 400
+
+    assert balance("SENDER01") == Decimal("10")
+    assert balance("RECIPIENT1") == Decimal("1")
+    assert db.query(Transaction_history).count() == 0
+    assert db.query(EmailOutbox).count() == 0
+
+
+def test_transfer_queues_its_emails(client, db, sender, sent_emails):
+    assert transfer(client, sender, "1").status_code == 200
+
+    # Queued with the transfer, sent later by the dispatcher
+    assert sent_emails == []
+    assert sorted(email.to_email for email in db.query(EmailOutbox)) == [
+        "recipient1@example.com", "sender01@example.com"
+    ]
+
+
+
+def test_amounts_must_be_positive(client, db, sender):
+    # A negative transfer would pull money from the recipient
+    assert transfer(client, sender, "-5").status_code == 400
+    assert transfer(client, sender, "0").status_code == 400
+
+    for path, params in (
+        ("/wallet/create-deposit-request", {"currency": "AFT"}),
+        ("/wallet/create-withdrawal-request", {"withdrawal_currency": "RWF"}),
+    ):
+        response = client.post(path, params={
+            "amount": "-5", "account_id": "RECIPIENT1", "wallet_type": "savings", **params
+        }, headers=auth(sender))
+        assert response.status_code == 400
+        assert response.json()["detail"] == "Amount must be greater than zero"
+
+    assert balance("SENDER01") == Decimal("10")
+    assert balance("RECIPIENT1") == Decimal("1")
+    assert db.query(Transaction_history).count() == 0
+
+def test_transfer_debit_is_checked_at_update_time(client, db, sender, monkeypatch):
+    convert = wallet_endpoints.convert_to_afriton_async
+
+    async def convert_while_spent_elsewhere(amount, currency, session):
+        # A concurrent request spends most of the balance after it was read
+        other = SessionLocal()
+        other.query(Wallet).filter(Wallet.account_id == "SENDER01").update({"balance": Decimal("1")})
+        other.commit()
+        other.close()
+        return await convert(amount, currency, session)
+
+    monkeypatch.setattr(wallet_endpoints, "convert_to_afriton_async", convert_while_spent_elsewhere)
+    assert transfer(client, sender, "24000", currency="RWF").status_code == 400
+
+    assert balance("SENDER01") == Decimal("1")
+    assert balance("RECIPIENT1") == Decimal("1")
+    assert db.query(Transaction_history).count() == 0
+
+
+def test_retried_transfer_is_replayed_not_repeated(client, db, sender):
+    first = transfer(client, sender, "2.50", **{"Idempotency-Key": "retry-1"})
+    # The same amount written differently is still the same request
+    second = transfer(client, sender, "2.5", **{"Idempotency-Key": "retry-1"})
+
+    assert first.status_code == second.status_code == 200
+    assert second.json() == first.json()
+    assert balance("SENDER01") == Decimal("7.5")
+    assert db.query(Transaction_history).count() == 2
+    assert db.query(IdempotencyKey).count() == 1
+
+    # A new key is a new transfer
+    assert transfer(client, sender, "2.5", **{"Idempotency-Key": "retry-2"}).status_code == 200
+    assert balance("SENDER01") == Decimal("5")
+
+
+def test_idempotency_key_is_tied_to_its_request(client, sender):
+    assert transfer(client, sender, "1", **{"Idempotency-Key": "retry-1"}).status_code == 200
+    assert transfer(client, sender, "2", **{"Idempotency-Key": "retry-1"}).status_code == 422
+
+    response = client.post("/wallet/create-withdrawal-request", params={
+        "amount": "1", "account_id": "RECIPIENT1", "withdrawal_currency": "RWF", "wallet_type": "savings"
+    }, headers={**auth(sender), "Idempotency-Key": "retry-1"})
+    assert response.status_code == 409
+    assert balance("SENDER01") == Decimal("9")
+
+
+@pytest.fixture
+def agent(db, sender):
+    user = Users(
+        account_id="AGENT01", fname="Agnes", lname="Agent", email="agent01@example.com",
+        password_hash="x", user_type="agent", acc_status=True, is_wallet_active=True
+    )
+    db.add(user)
+    db.commit()
+    return user
+
+
+def request_withdrawal(client, agent, amount="5"):
+    return client.post("/wallet/create-withdrawal-request", params={
+        "amount": amount, "account_id": "SENDER01", "withdrawal_currency": "RWF", "wallet_type": "savings"
+    }, headers=auth(agent))
+
+
+def test_withdrawal_fees_are_split_exactly(client, db, agent):
+    assert request_withdrawal(client, agent).status_code == 200
+
+    request = db.query(Withdrawal_request).one()
+    assert (request.charges, request.agent_commission, request.platform_profit) == (
+        Decimal("0.25"), Decimal("0.15"), Decimal("0.1")
+    )
+    assert db.query(Wallet.balance).filter(Wallet.account_id == "AGENT01").scalar() == Decimal("0.15")
+    assert db.query(Profit.amount).scalar() == Decimal("0.1")
+
+
+def test_fees_roll_back_with_a_failed_withdrawal(client, db, agent, monkeypatch):
+    def fail(*args):
+        raise RuntimeError("database went away")
+
+    monkeypatch.setattr(wallet_endpoints, "commit_with_response", fail)
+    assert request_withdrawal(client, agent).status_code == 500
+
+    # No commission or profit without the withdrawal it belongs to
+    assert db.query(Withdrawal_request).count() == 0
+    assert db.query(Profit).count() == 0
+    assert db.query(Wallet).filter(Wallet.account_id == "AGENT01").count() == 0
+    assert db.query(Transaction_history).count() == 0
+
+
+def test_history_records_who_did_it_by_user_id(client, db, sender):
+    assert transfer(client, sender, "1").status_code == 200
+
+    history = db.query(Transaction_history).all()
+    assert {row.done_by for row in history} == {sender.id}
+    assert db.query(Transaction_history).join(Users, Users.id == Transaction_history.done_by).count() == 2
+
+
+def test_transfer_emails_escape_names(client, db, sender):
+    sender.fname = "<i>Alice</i>"
+    db.commit()
+    assert transfer(client, sender, "1").status_code == 200
+
+    email = db.query(EmailOutbox).filter(EmailOutbox.to_email == "recipient1@example.com").one()
+    assert "<i>Alice</i>" not in email.body
+    assert "&lt;i&gt;Alice&lt;/i&gt;" in email.body
+    assert "<i>Alice</i>" in email.text_body